@@ -1,5 +1,7 @@
 from django.contrib import admin
 from .models import OcrDocument
+from .blob_store import get_blob_store
+import os
 import json
 from django.utils.safestring import mark_safe
 from pygments import highlight
@@ -17,7 +19,10 @@ class OcrDocumentAdmin(admin.ModelAdmin):
     search_fields = ('original_pdf_path', 'id')
     # --- 核心改动：修正了字段名 ---
     readonly_fields = ('id', 'created_at', 'original_pdf_path', 'mineru_json_path', 
+                       'raw_ocr_ref', 'corrected_json_ref',
                        'pretty_raw_ocr_json', 'pretty_corrected_label_studio_json')
+    # 超过该大小 (压缩后字节数) 的 JSON 不在详情页渲染, 请通过下载接口获取
+    JSON_PREVIEW_MAX_BYTES = 512 * 1024
 
     fieldsets = (
         (None, {
@@ -30,7 +35,8 @@ class OcrDocumentAdmin(admin.ModelAdmin):
         ('Stored JSON Data (Read-only)', {
             'classes': ('collapse',),
             # --- 核心改动：修正了字段名 ---
-            'fields': ('pretty_raw_ocr_json', 'pretty_corrected_label_studio_json'),
+            'fields': ('raw_ocr_ref', 'corrected_json_ref',
+                       'pretty_raw_ocr_json', 'pretty_corrected_label_studio_json'),
         }),
     )
 
@@ -51,11 +57,22 @@ class OcrDocumentAdmin(admin.ModelAdmin):
             return mark_safe(style + highlighted_json)
         return "No data available."
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('raw_ocr_json', 'corrected_label_studio_json')
+
+    def _format_blob(self, ref, loader):
+        """blob 过大时只显示大小, 避免在后台页面中渲染数 MB 的 JSON"""
+        if ref:
+            size = get_blob_store().size(ref)
+            if size > self.JSON_PREVIEW_MAX_BYTES:
+                return f"JSON 过大 (压缩后 {size / 1024 / 1024:.1f} MB), 请通过 API 下载查看。"
+        return self._format_json(loader())
+
     def pretty_raw_ocr_json(self, obj):
-        return self._format_json(obj.raw_ocr_json)
+        return self._format_blob(obj.raw_ocr_ref, obj.load_raw_ocr_json)
     pretty_raw_ocr_json.short_description = 'Raw OCR JSON'
 
     # --- 核心改动：修正了整个方法 ---
     def pretty_corrected_label_studio_json(self, obj):
-        return self._format_json(obj.corrected_label_studio_json)
+        return self._format_blob(obj.corrected_json_ref, obj.load_corrected_json)
     pretty_corrected_label_studio_json.short_description = 'Corrected Label Studio JSON'
@@ -0,0 +1,158 @@
+"""
+JSON 大对象存储
+OCR / 校对 JSON 压缩后按内容哈希存储, 数据库只保存引用 (ref), 相同内容只存一份
+ref 形如 "<sha256>.json.zst" 或 "<sha256>.json.gz", 后缀决定解压方式 (见 compression.py)
+默认使用本地文件系统, 可通过 BLOB_STORE_BACKEND=minio 切换到 S3/MinIO (见 minio_utils.py)
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import logging
+from pathlib import Path
+from django.conf import settings
+from . import json_codec
+from .compression import get_codec, codec_suffix, codec_for_name, compress_bytes, open_decompressed
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def encode_json_blob(data, codec=None):
+    """
+    序列化并压缩 JSON
+
+    Returns:
+        tuple: (ref, compressed_bytes), ref 为 "<sha256>.json<压缩后缀>"
+    """
+    codec = codec or get_codec()
+    raw = json_codec.dumps(data)
+    digest = hashlib.sha256(raw).hexdigest()
+    return f'{digest}.json{codec_suffix(codec)}', compress_bytes(raw, codec)
+
+
+class BlobStore:
+    """Blob 存储基类, 子类实现按 ref 读写压缩后的字节"""
+
+    def exists(self, ref):
+        raise NotImplementedError
+
+    def put_bytes(self, ref, data):
+        raise NotImplementedError
+
+    def open(self, ref):
+        """返回压缩内容的二进制只读文件对象, 调用方负责关闭"""
+        raise NotImplementedError
+
+    def open_range(self, ref, start):
+        """从压缩内容的第 start 字节开始读取, 用于 Range 请求; 子类可覆盖为更高效的实现"""
+        fileobj = self.open(ref)
+        remaining = start
+        while remaining > 0:
+            skipped = len(fileobj.read(min(remaining, READ_CHUNK_SIZE)))
+            if not skipped:
+                break
+            remaining -= skipped
+        return fileobj
+
+    def size(self, ref):
+        """压缩后的字节数"""
+        raise NotImplementedError
+
+    def delete(self, ref):
+        raise NotImplementedError
+
+    def iter_refs(self):
+        raise NotImplementedError
+
+    def put_json(self, data, codec=None):
+        """存储 JSON 数据, 内容已存在时不重复写入, 返回 ref"""
+        ref, compressed = encode_json_blob(data, codec)
+        if not self.exists(ref):
+            self.put_bytes(ref, compressed)
+        return ref
+
+    def get_json(self, ref):
+        with self.open(ref) as fileobj, open_decompressed(fileobj, codec_for_name(ref)) as stream:
+            return json_codec.load(stream)
+
+    def iter_decompressed(self, ref, chunk_size=READ_CHUNK_SIZE):
+        """逐块读取解压后的 JSON 字节, 用于流式响应"""
+        with self.open(ref) as fileobj, open_decompressed(fileobj, codec_for_name(ref)) as stream:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+
+class LocalBlobStore(BlobStore):
+    """本地文件系统存储, 路径为 <root>/<ref[:2]>/<ref[2:4]>/<ref>"""
+
+    def __init__(self, root=None):
+        self.root = Path(root or settings.BLOB_STORE_ROOT)
+
+    def _path(self, ref):
+        return self.root / ref[:2] / ref[2:4] / ref
+
+    def exists(self, ref):
+        return self._path(ref).exists()
+
+    def put_bytes(self, ref, data):
+        path = self._path(ref)
+        os.makedirs(path.parent, exist_ok=True)
+        # 先写临时文件再原子替换, 并发写入同一内容时不会读到半个文件
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def open(self, ref):
+        return open(self._path(ref), 'rb')
+
+    def open_range(self, ref, start):
+        fileobj = self.open(ref)
+        fileobj.seek(start)
+        return fileobj
+
+    def size(self, ref):
+        return self._path(ref).stat().st_size
+
+    def delete(self, ref):
+        path = self._path(ref)
+        if path.exists():
+            path.unlink()
+
+    def iter_refs(self):
+        if not self.root.exists():
+            return
+        for path in self.root.glob('*/*/*'):
+            if path.is_file() and not path.name.endswith('.tmp'):
+                yield path.name
+
+    def local_path(self, ref):
+        return self._path(ref)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_blob_store():
+    """获取当前配置的 blob 存储 (进程内单例)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if settings.BLOB_STORE_BACKEND == 'minio':
+                    from .minio_utils import MinioBlobStore
+                    _store = MinioBlobStore()
+                else:
+                    _store = LocalBlobStore()
+    return _store
@@ -0,0 +1,101 @@
+"""
+OCR JSON 压缩编解码
+优先使用 zstd (需安装 zstandard), 否则使用 gzip; 读取时按文件后缀自动识别格式
+"""
+import gzip
+import os
+import shutil
+from pathlib import Path
+from django.conf import settings
+from . import json_codec
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - 可选依赖
+    zstandard = None
+
+GZIP_SUFFIX = '.gz'
+ZSTD_SUFFIX = '.zst'
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 6
+
+
+def get_codec():
+    """当前使用的压缩格式: zstd 或 gzip"""
+    codec = settings.OCR_JSON_COMPRESSION
+    if codec == 'auto':
+        return 'zstd' if zstandard is not None else 'gzip'
+    if codec == 'zstd' and zstandard is None:
+        raise RuntimeError("OCR_JSON_COMPRESSION=zstd 需要安装 zstandard")
+    return codec
+
+
+def codec_suffix(codec=None):
+    return ZSTD_SUFFIX if (codec or get_codec()) == 'zstd' else GZIP_SUFFIX
+
+
+def codec_for_name(name):
+    """根据文件名 / blob ref 的后缀判断压缩格式, 未压缩返回 None"""
+    name = str(name)
+    if name.endswith(ZSTD_SUFFIX):
+        return 'zstd'
+    if name.endswith(GZIP_SUFFIX):
+        return 'gzip'
+    return None
+
+
+def compress_bytes(data, codec=None):
+    codec = codec or get_codec()
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def open_decompressed(fileobj, codec):
+    """将压缩的二进制文件对象包装为解压后的只读流"""
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("读取 .zst 文件需要安装 zstandard")
+        return zstandard.ZstdDecompressor().stream_reader(fileobj, closefd=False)
+    if codec == 'gzip':
+        return gzip.GzipFile(fileobj=fileobj, mode='rb')
+    return fileobj
+
+
+def load_ocr_json(path):
+    """读取 OCR JSON 文件, 支持 .json / .json.gz / .json.zst"""
+    with open(path, 'rb') as f, open_decompressed(f, codec_for_name(path)) as stream:
+        return json_codec.load(stream)
+
+
+def dump_ocr_json(data, path, codec=None):
+    """
+    压缩写入 OCR JSON, 返回实际写入的路径 (path 末尾追加压缩后缀)
+    """
+    path = Path(str(path) + codec_suffix(codec))
+    raw = json_codec.dumps(data)
+    with open(path, 'wb') as f:
+        f.write(compress_bytes(raw, codec))
+    return path
+
+
+def compress_file(path, codec=None, remove_source=True):
+    """
+    压缩已有的 JSON 文件, 返回压缩后的路径; 已压缩的文件原样返回
+    """
+    path = Path(path)
+    if codec_for_name(path):
+        return path
+    codec = codec or get_codec()
+    target = Path(str(path) + codec_suffix(codec))
+    tmp_target = target.with_name(target.name + '.tmp')
+    with open(path, 'rb') as src, open(tmp_target, 'wb') as dst:
+        if codec == 'zstd':
+            zstandard.ZstdCompressor(level=ZSTD_LEVEL).copy_stream(src, dst)
+        else:
+            with gzip.GzipFile(fileobj=dst, mode='wb', compresslevel=GZIP_LEVEL) as gz:
+                shutil.copyfileobj(src, gz)
+    os.replace(tmp_target, target)
+    if remove_source:
+        path.unlink()
+    return target
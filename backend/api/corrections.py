@@ -0,0 +1,130 @@
+"""
+按页保存的校对结果
+Label Studio 标注 (webhook 推送、定时拉取或手动上传) 写入 OcrPage, 只有比已保存版本更新的标注才会写入,
+RAGFlow 分块按页读取 (见 ragflow_chunker), 单页变化不需要重新遍历整个文档的任务列表
+"""
+import logging
+from django.db.models import Count, Max
+from .models import OcrDocument, OcrPage
+from .payload_cache import cache_key
+
+logger = logging.getLogger(__name__)
+
+
+def result_texts(result):
+    """标注结果中的识别文本 (textarea), 按原有顺序"""
+    texts = []
+    for item in result or ():
+        if item.get('type') == 'textarea':
+            text_list = item.get('value', {}).get('text', [])
+            if text_list:
+                texts.append(text_list[0])
+    return texts
+
+
+def annotation_text(annotation):
+    return "\n".join(result_texts(annotation.get('result', [])))
+
+
+def latest_annotation(task):
+    """任务中最近一次提交且未被取消的标注, 没有时返回 None"""
+    annotations = [annotation for annotation in task.get('annotations') or ()
+                   if not annotation.get('was_cancelled')]
+    if not annotations:
+        return None
+    return max(annotations, key=annotation_version)
+
+
+def annotation_version(annotation):
+    """用于比较新旧的标注版本: (更新时间, 标注 ID)"""
+    return (annotation.get('updated_at') or annotation.get('created_at') or '', annotation.get('id') or 0)
+
+
+def save_page_annotations(doc, entries, overwrite=False):
+    """
+    按页保存标注, 已保存版本不早于新标注的页面保持不变
+
+    Args:
+        doc (OcrDocument): 文档
+        entries (iterable): (page_num, task, annotation), task 为 Label Studio 任务 (含 id 和 data)
+        overwrite (bool): 不比较版本直接覆盖 (用户手动上传的校对结果)
+
+    Returns:
+        list: 实际写入的页码
+    """
+    entries = list(entries)
+    if not entries:
+        return []
+    existing, task_ids = {}, {}
+    for page_num, updated_at, annotation_id, task_id in OcrPage.objects.filter(
+        document=doc, page_num__in=[entry[0] for entry in entries]
+    ).values_list('page_num', 'annotation_updated_at', 'annotation_id', 'label_studio_task_id'):
+        existing[page_num] = (updated_at, annotation_id or 0)
+        task_ids[page_num] = task_id
+
+    rows = {}
+    for page_num, task, annotation in entries:
+        version = annotation_version(annotation)
+        if not overwrite and page_num in existing and existing[page_num] >= version:
+            continue
+        existing[page_num] = version
+        rows[page_num] = OcrPage(
+            document=doc,
+            page_num=page_num,
+            label_studio_task_id=task.get('id') or task_ids.get(page_num),
+            annotation_id=annotation.get('id') if isinstance(annotation.get('id'), int) else None,
+            annotation_updated_at=version[0],
+            corrected_annotation={'id': task.get('id'), 'data': task.get('data', {}), 'annotations': [annotation]},
+            corrected_text=annotation_text(annotation),
+        )
+    if not rows:
+        return []
+
+    OcrPage.objects.bulk_create(
+        rows.values(), update_conflicts=True, unique_fields=['document', 'page_num'], batch_size=500,
+        update_fields=['label_studio_task_id', 'annotation_id', 'annotation_updated_at',
+                       'corrected_annotation', 'corrected_text', 'updated_at'],
+    )
+    OcrDocument.objects.filter(id=doc.id, status='processed').update(status='corrected')
+    return sorted(rows)
+
+
+def save_uploaded_corrections(doc, tasks):
+    """
+    保存用户上传的 Label Studio 导出结果 (任务列表), 每个有标注的任务按页写入
+
+    Returns:
+        list: 写入的页码
+    """
+    entries = []
+    for i, task in enumerate(tasks):
+        # Label Studio 导出的数据可能使用 'annotations' 或 'completions'
+        annotations = task.get('annotations') or task.get('completions')
+        if not annotations:
+            continue
+        page_num = task.get('data', {}).get('page_num', i + 1)
+        entries.append((int(page_num), task, annotations[0]))
+    return save_page_annotations(doc, entries, overwrite=True)
+
+
+def has_corrections(doc):
+    return doc.pages.filter(corrected_annotation__isnull=False).exists() or doc.has_corrected_json()
+
+
+def correction_version(doc):
+    """
+    校对结果的版本标识, 任意一页的校对结果写入后都会改变, 用作派生文件 (RAGFlow payload) 的缓存键
+    按页结果只查询行数和最近更新时间, 不读取标注内容
+
+    Returns:
+        list: 没有任何校对结果时返回 None
+    """
+    pages = doc.pages.filter(corrected_annotation__isnull=False).aggregate(count=Count('id'), updated_at=Max('updated_at'))
+    legacy = doc.corrected_json_ref
+    if legacy is None and doc.corrected_label_studio_json is not None:
+        # 尚未迁移到 blob 存储的旧数据没有内容哈希, 现算一次
+        legacy = cache_key(doc.corrected_label_studio_json)
+    if not pages['count'] and legacy is None:
+        return None
+    updated_at = pages['updated_at'].isoformat() if pages['updated_at'] else None
+    return [pages['count'], updated_at, legacy]
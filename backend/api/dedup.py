@@ -0,0 +1,187 @@
+"""
+PDF 内容去重
+上传时边写入磁盘边计算 SHA-256 (content_hash), 处理任务发现内容相同且已处理完成的文档时,
+直接复用其 OCR 结果 (blob 引用)、页面图片 (输出目录) 和 Label Studio 任务, 不再运行 MinerU
+
+Label Studio 任务只有一个所有者: 重复文档通过 duplicate_of 指向原文档, 推送只由原文档执行,
+之后任务映射复制给各重复文档 (share_label_studio_tasks); 重复文档本身从不创建、更新或删除任务
+"""
+import hashlib
+from django.core.files import File
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db.models import F, Q
+from .models import OcrDocument, OcrPage
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# 处于这些状态的文档已有完整的 OCR 结果, 可以被复用
+REUSABLE_STATUSES = ('processed', 'corrected', 'ingested')
+# 从被复用文档复制的页面字段
+# 不复制指纹: 重复文档不推送任务, 接管任务后 (release_duplicates) 的首次推送会按自己的 doc_id 重写任务
+PAGE_COPY_FIELDS = (
+    'image_path', 'prediction', 'label_studio_task_id',
+    'annotation_id', 'annotation_updated_at', 'corrected_annotation', 'corrected_text',
+)
+# 原文档推送后复制给重复文档的页面字段
+PAGE_SHARE_FIELDS = ('image_path', 'prediction', 'label_studio_task_id')
+
+
+def file_sha256(path):
+    """计算磁盘上文件的 SHA-256 (目录导入的文件没有在上传时计算)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """上传的文件写入临时文件的同时计算 SHA-256, 结果保存在文件对象的 content_hash 属性上"""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file_obj = super().file_complete(file_size)
+        file_obj.content_hash = self.sha256.hexdigest()
+        return file_obj
+
+
+class HashingFile(File):
+    """保存到 Storage 时按块读取内容, 同时计算 SHA-256 (内存中的上传文件和 ZIP 成员)"""
+
+    def __init__(self, file, name=None):
+        super().__init__(file, name)
+        self.sha256 = hashlib.sha256()
+
+    def chunks(self, chunk_size=None):
+        for chunk in super().chunks(chunk_size):
+            self.sha256.update(chunk)
+            yield chunk
+
+    @property
+    def content_hash(self):
+        return self.sha256.hexdigest()
+
+
+def find_reusable_document(doc):
+    """
+    查找内容与 doc 相同、已处理完成的文档, 优先任务的所有者 (非重复文档), 其次已推送到 Label Studio 的、最早创建的
+
+    Returns:
+        OcrDocument | None
+    """
+    if not doc.content_hash:
+        return None
+    return (
+        OcrDocument.objects.filter(content_hash=doc.content_hash, status__in=REUSABLE_STATUSES,
+                                   mineru_json_path__isnull=False)
+        .filter(Q(raw_ocr_ref__isnull=False) | Q(raw_ocr_json__isnull=False))
+        .exclude(id=doc.id)
+        .defer('raw_ocr_json')
+        .order_by(F('duplicate_of').asc(nulls_first=True), '-label_studio_synced', 'id')
+        .first()
+    )
+
+
+def copy_document_results(doc, source):
+    """
+    复用 source 的处理结果: OCR JSON 引用、输出目录 (MinerU 结果和页面图片)、Label Studio 任务映射和已有的校对结果
+    doc 记为任务所有者 (source 或 source 复用的原文档) 的重复文档, 任务上的标注同步到所有文档 (见 LabelStudioWebhookView)
+
+    Returns:
+        int: 复制的已校对页数
+    """
+    if source.raw_ocr_ref:
+        doc.raw_ocr_ref, doc.raw_ocr_json = source.raw_ocr_ref, None
+    else:
+        # 尚未迁移到 blob 存储的旧文档
+        doc.store_raw_ocr_json(source.load_raw_ocr_json())
+    doc.corrected_json_ref = source.corrected_json_ref
+    doc.corrected_label_studio_json = source.corrected_label_studio_json
+    doc.mineru_json_path = source.mineru_json_path
+    doc.duplicate_of_id = source.duplicate_of_id or source.id
+    doc.label_studio_synced = source.label_studio_synced
+    doc.label_studio_task_ids = source.label_studio_task_ids
+    doc.label_studio_sync_time = source.label_studio_sync_time
+    if source.label_studio_synced:
+        doc.label_studio_push_status = 'done'
+
+    corrected, rows = 0, []
+    for page in source.pages.iterator(chunk_size=500):
+        rows.append(OcrPage(document=doc, page_num=page.page_num,
+                            **{field: getattr(page, field) for field in PAGE_COPY_FIELDS}))
+        if page.corrected_annotation is not None:
+            corrected += 1
+        if len(rows) >= 500:
+            _save_pages(rows)
+            rows = []
+    _save_pages(rows)
+
+    doc.status = 'corrected' if corrected or source.has_corrected_json() else 'processed'
+    doc.save(update_fields=[
+        'raw_ocr_ref', 'raw_ocr_json', 'corrected_json_ref', 'corrected_label_studio_json', 'mineru_json_path',
+        'duplicate_of', 'label_studio_synced', 'label_studio_task_ids', 'label_studio_sync_time', 'label_studio_push_status', 'status',
+    ])
+    return corrected
+
+
+def share_label_studio_tasks(owner):
+    """
+    原文档推送完成后, 把任务映射 (任务 ID 和页面数据) 复制给复用它的重复文档
+    原文档已删除任务的页面在重复文档上也清空任务 ID
+
+    Returns:
+        int: 更新的重复文档数
+    """
+    duplicate_ids = list(owner.duplicates.values_list('id', flat=True))
+    if not duplicate_ids:
+        return 0
+    OcrDocument.objects.filter(id__in=duplicate_ids).update(
+        label_studio_synced=owner.label_studio_synced,
+        label_studio_task_ids=owner.label_studio_task_ids,
+        label_studio_sync_time=owner.label_studio_sync_time,
+        label_studio_push_status='done', label_studio_push_error='',
+    )
+
+    page_nums, rows = [], []
+    for page in owner.pages.only('page_num', *PAGE_SHARE_FIELDS).iterator(chunk_size=500):
+        page_nums.append(page.page_num)
+        rows.extend(OcrPage(document_id=duplicate_id, page_num=page.page_num,
+                            **{field: getattr(page, field) for field in PAGE_SHARE_FIELDS})
+                    for duplicate_id in duplicate_ids)
+        if len(rows) >= 500:
+            _save_pages(rows, PAGE_SHARE_FIELDS)
+            rows = []
+    _save_pages(rows, PAGE_SHARE_FIELDS)
+    (OcrPage.objects.filter(document_id__in=duplicate_ids, label_studio_task_id__isnull=False)
+     .exclude(page_num__in=page_nums).update(label_studio_task_id=None))
+    return len(duplicate_ids)
+
+
+def release_duplicates(doc):
+    """
+    删除原文档前调用: 最早的重复文档接管 Label Studio 任务, 其余重复文档改为复用它
+
+    Returns:
+        int | None: 新的任务所有者 ID
+    """
+    duplicate_ids = list(doc.duplicates.order_by('id').values_list('id', flat=True))
+    if not duplicate_ids:
+        return None
+    new_owner_id = duplicate_ids[0]
+    OcrDocument.objects.filter(id=new_owner_id).update(duplicate_of=None)
+    OcrDocument.objects.filter(id__in=duplicate_ids[1:]).update(duplicate_of=new_owner_id)
+    return new_owner_id
+
+
+def _save_pages(rows, fields=PAGE_COPY_FIELDS):
+    if rows:
+        OcrPage.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['document', 'page_num'],
+            update_fields=list(fields) + ['updated_at'],
+        )
@@ -0,0 +1,52 @@
+"""
+文档处理事件
+Celery 任务通过 Redis pub/sub 发布日志行、状态变化和进度, 供 SSE / 长轮询端点推送给前端
+"""
+import threading
+import logging
+import redis
+from django.conf import settings
+from . import json_codec
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ('processed', 'failed', 'corrected', 'ingested')
+
+_redis_client = None
+_redis_lock = threading.Lock()
+
+
+def get_redis():
+    """进程内共享的 Redis 客户端 (自带连接池)"""
+    global _redis_client
+    if _redis_client is None:
+        with _redis_lock:
+            if _redis_client is None:
+                _redis_client = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=2)
+    return _redis_client
+
+
+def channel_name(doc_id):
+    return f'ocr:document:{doc_id}:events'
+
+
+def publish_event(doc_id, event, data):
+    """
+    发布文档事件, 失败时只记录日志, 不影响处理流程
+
+    Args:
+        event (str): 事件类型, log / status / progress
+        data (dict): 事件数据
+    """
+    try:
+        get_redis().publish(channel_name(doc_id), json_codec.dumps({'event': event, 'data': data}))
+    except Exception as e:
+        logger.debug(f"发布文档 {doc_id} 的 {event} 事件失败: {e}")
+
+
+def publish_status(doc_id, status):
+    publish_event(doc_id, 'status', {'status': status})
+
+
+def publish_progress(doc_id, stage, done, total):
+    publish_event(doc_id, 'progress', {'stage': stage, 'done': done, 'total': total})
@@ -0,0 +1,64 @@
+"""
+共享 HTTP 连接池
+每个进程按服务名复用一个 requests.Session (keep-alive + 连接池), 多线程共用,
+幂等请求在连接错误和 502/503/504 时由 urllib3 自动重试
+"""
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_POOL_SIZE = 16
+DEFAULT_RETRIES = 3
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_STATUS = (502, 503, 504)
+# POST 不自动重试 (导入接口有自己的重试逻辑); PATCH 在这里只用于整体覆盖任务字段, 重复执行结果相同
+RETRY_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE', 'PATCH'})
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _build_session(pool_size, retries):
+    retry = Retry(
+        total=retries,
+        backoff_factor=RETRY_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS,
+        allowed_methods=RETRY_METHODS,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session(name, pool_size=DEFAULT_POOL_SIZE, retries=DEFAULT_RETRIES):
+    """
+    获取进程内共享的 Session
+
+    Args:
+        name (str): 服务名, 不同服务使用独立的连接池
+        pool_size (int): 每个主机的最大连接数, 应不小于并发请求的线程数
+        retries (int): 幂等请求的自动重试次数
+    """
+    session = _sessions.get(name)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(name)
+            if session is None:
+                session = _sessions[name] = _build_session(pool_size, retries)
+    return session
+
+
+def _reset_after_fork():
+    # Celery prefork 等场景下子进程不能复用父进程的 socket
+    global _sessions_lock
+    _sessions.clear()
+    _sessions_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,184 @@
+"""
+批量导入 PDF
+上传接口 (单个 / 多个文件 / ZIP) 和 ingest_pdfs 管理命令共用: 文件先落盘到 PDF_UPLOAD_DIR (管理命令直接引用目录中的文件),
+落盘时同时计算内容哈希 (见 dedup), 文档行按批 bulk_create 写入, 每批的处理任务以一个 Celery group 分派
+"""
+import os
+import time
+import uuid
+import shutil
+import zipfile
+import logging
+from pathlib import Path
+from celery import group
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.text import get_valid_filename
+import unidecode
+from .models import OcrDocument
+from .tasks import process_pdf_with_mineru
+from .dedup import HashingFile
+
+logger = logging.getLogger(__name__)
+
+PDF_UPLOAD_DIR = settings.DATA_ROOT_PATH / 'data' / 'pdfs_to_process'
+# 每批写入的文档行数 / 一个 group 分派的任务数
+INGEST_BATCH_SIZE = 500
+# ZIP 解压的暂存目录 (位于 PDF_UPLOAD_DIR 下, 与目标在同一文件系统, 移动时只需改名)
+STAGING_DIR_NAME = '.incoming'
+
+
+def is_pdf_name(name):
+    return name.lower().endswith('.pdf')
+
+
+def is_zip_name(name):
+    return name.lower().endswith('.zip')
+
+
+def safe_filename(name):
+    """只保留文件名部分, 转为 ASCII 安全文件名 (与单文件上传一致)"""
+    return get_valid_filename(unidecode.unidecode(Path(name.replace('\\', '/')).name))
+
+
+def _storage(directory):
+    os.makedirs(directory, exist_ok=True)
+    return FileSystemStorage(location=str(directory))
+
+
+def store_upload(file_obj, directory=PDF_UPLOAD_DIR):
+    """
+    保存上传的文件, 重名时自动改名; 文件已由 HashingUploadHandler 写入临时文件并计算了哈希, 这里直接移动,
+    不经过内存; 其他文件对象 (内存中的小文件等) 在保存时计算哈希
+
+    Returns:
+        tuple: (保存后的绝对路径, 内容 SHA-256)
+    """
+    fs = _storage(directory)
+    content_hash = getattr(file_obj, 'content_hash', None)
+    if content_hash is None:
+        file_obj = HashingFile(file_obj, name=file_obj.name)
+    path = fs.path(fs.save(safe_filename(file_obj.name), file_obj))
+    return path, content_hash or file_obj.content_hash
+
+
+def create_documents(pdf_files, reuse=None):
+    """
+    为 PDF 批量创建文档并分派处理任务: 每批一次 bulk_create, 任务以一个 group 一次性发送到队列
+
+    Args:
+        pdf_files (iterable): (路径, 内容 SHA-256), 哈希为 None 时由处理任务计算
+        reuse (bool | None): 是否复用内容相同的已处理文档的结果, None 表示按 OCR_REUSE_DUPLICATES
+
+    Returns:
+        list: 创建的文档 (与 pdf_files 顺序一致)
+    """
+    documents = []
+    pdf_files = list(pdf_files)
+    for start in range(0, len(pdf_files), INGEST_BATCH_SIZE):
+        batch = OcrDocument.objects.bulk_create([
+            OcrDocument(original_pdf_path=str(path), content_hash=content_hash, status='pending')
+            for path, content_hash in pdf_files[start:start + INGEST_BATCH_SIZE]
+        ])
+        group(process_pdf_with_mineru.s(doc.id, reuse=reuse) for doc in batch).apply_async()
+        documents += batch
+    if documents:
+        logger.info(f"已创建 {len(documents)} 个文档并分派处理任务")
+    return documents
+
+
+def _publish(staged_path, directory):
+    """把暂存的文件移动到目录中, 重名时改名; os.link 在目标已存在时失败, 不会覆盖并发写入的同名文件"""
+    fs = FileSystemStorage(location=str(directory))
+    name = os.path.basename(staged_path)
+    while True:
+        target = fs.path(fs.get_available_name(name))
+        try:
+            os.link(staged_path, target)
+        except FileExistsError:
+            continue
+        except OSError:
+            # 不支持硬链接的文件系统
+            if os.path.exists(target):
+                continue
+            os.replace(staged_path, target)
+            return target
+        os.remove(staged_path)
+        return target
+
+
+def ingest_zip(file_obj, directory=PDF_UPLOAD_DIR, reuse=None):
+    """
+    导入 ZIP 中的所有 PDF: 逐个成员流式解压到暂存目录 (目录结构被忽略, 非 PDF 成员跳过, 解压时计算哈希),
+    再按批移动到 directory 并创建文档; 暂存目录以 . 开头, 目录监视 (ingest_pdfs --watch) 不会提前导入解压中的文件
+
+    Args:
+        file_obj: 上传的 ZIP (临时文件或内存文件)
+        reuse: 见 create_documents
+
+    Returns:
+        tuple: (创建的文档列表, 跳过的成员名列表)
+    """
+    source = file_obj.temporary_file_path() if hasattr(file_obj, 'temporary_file_path') else file_obj
+    staging_dir = Path(directory) / STAGING_DIR_NAME / uuid.uuid4().hex
+    staging = _storage(staging_dir)
+    staged, skipped = [], []
+    try:
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                name = Path(info.filename).name
+                # 非 PDF 成员和 macOS 压缩包中的资源文件
+                if not is_pdf_name(name) or name.startswith('._') or '__MACOSX/' in info.filename:
+                    skipped.append(info.filename)
+                    continue
+                with archive.open(info) as member:
+                    member_file = HashingFile(member, name=name)
+                    path = staging.path(staging.save(safe_filename(name), member_file))
+                    staged.append((path, member_file.content_hash))
+
+        documents = []
+        for start in range(0, len(staged), INGEST_BATCH_SIZE):
+            pdf_files = [(_publish(path, directory), content_hash)
+                         for path, content_hash in staged[start:start + INGEST_BATCH_SIZE]]
+            documents += create_documents(pdf_files, reuse=reuse)
+        return documents, skipped
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def find_new_pdfs(directory, known, min_age=0):
+    """
+    列出目录 (含子目录) 中还没有对应文档的 PDF
+
+    Args:
+        known (set): 已确认有文档的路径, 调用方在多次扫描之间复用, 只有不在其中的文件才查询数据库
+        min_age (float): 修改时间距今不足该秒数的文件视为仍在写入 (或刚由上传接口保存), 暂不导入
+
+    Returns:
+        list: 路径 (按路径排序)
+    """
+    # 与 FileSystemStorage.path 一样使用 abspath, 上传接口保存的文件路径可以直接比较
+    directory = os.path.abspath(directory)
+    deadline = time.time() - min_age
+    candidates = []
+    for root, dirs, files in os.walk(directory):
+        # 跳过 . 开头的目录 (ZIP 解压的暂存目录等)
+        dirs[:] = [name for name in dirs if not name.startswith('.')]
+        for name in files:
+            path = os.path.join(root, name)
+            if not is_pdf_name(name) or path in known:
+                continue
+            try:
+                if os.stat(path).st_mtime > deadline:
+                    continue
+            except FileNotFoundError:
+                continue
+            candidates.append(path)
+
+    for start in range(0, len(candidates), INGEST_BATCH_SIZE):
+        known.update(OcrDocument.objects.filter(
+            original_pdf_path__in=candidates[start:start + INGEST_BATCH_SIZE]
+        ).values_list('original_pdf_path', flat=True))
+    return sorted(path for path in candidates if path not in known)
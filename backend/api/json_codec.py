@@ -0,0 +1,54 @@
+"""
+JSON 编解码
+安装了 orjson 时使用 orjson (大 OCR JSON 的序列化/解析快数倍), 否则回退到标准库 json
+统一以 UTF-8 bytes 作为序列化结果, 中文不做转义
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 可选依赖
+    orjson = None
+
+# orjson.JSONDecodeError 是 json.JSONDecodeError 的子类, 调用方统一捕获这个即可
+JSONDecodeError = json.JSONDecodeError
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+def dumps(data, indent=False, default=None):
+    """
+    序列化为 UTF-8 bytes
+
+    Args:
+        indent (bool): 是否缩进 (2 个空格), 用于下载给人看的文件
+        default (callable): 无法序列化的对象的转换函数
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(data, default=default, option=option)
+        except orjson.JSONEncodeError:
+            # orjson 不支持超过 64 位的整数等少数情况, 交给标准库处理
+            pass
+    if indent:
+        return json.dumps(data, ensure_ascii=False, indent=2, default=default).encode('utf-8')
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=default).encode('utf-8')
+
+
+def dumps_str(data, indent=False, default=None):
+    return dumps(data, indent=indent, default=default).decode('utf-8')
+
+
+def loads(data):
+    """解析 bytes / str"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load(fileobj):
+    """从二进制或文本文件对象解析, 整体读取后一次解析"""
+    return loads(fileobj.read())
@@ -2,14 +2,47 @@
 Label Studio 集成工具
 用于自动创建和同步 OCR 任务到 Label Studio
 """
+import time
+import random
+import threading
+import uuid
 import requests
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
 from datetime import datetime, timezone
 import jwt
+from . import json_codec
+from .http_utils import get_session
 
 logger = logging.getLogger(__name__)
 
+# 单个导入请求的超时时间 (秒), 分块后每个请求的数据量有上限
+LABEL_STUDIO_IMPORT_TIMEOUT = 120
+# 导入接口不是幂等的: 这些状态码表示服务端没有处理请求 (限流 / 服务不可用), 直接按指数退避重试
+IMPORT_RETRY_STATUS = (429, 503)
+# 这些状态码 (以及读超时等连接已建立后的网络错误) 表示服务端可能已经创建了任务,
+# 重试前先按批次号查询, 已创建时不再重复提交
+IMPORT_UNCERTAIN_STATUS = (500, 502, 504)
+IMPORT_BACKOFF_BASE = 1.0
+IMPORT_BACKOFF_MAX = 30.0
+# 按导入批次号查询任务 ID 时的分页大小
+BATCH_QUERY_PAGE_SIZE = 500
+# 拉取标注时的分页大小 (返回完整标注结果, 每页数据量较大)
+ANNOTATION_PULL_PAGE_SIZE = 100
+# 拉取标注时每次查询的任务 ID 数 (ID 列表放在 GET 参数中, 限制 URL 长度)
+ANNOTATION_PULL_ID_CHUNK = 500
+
+# access token 缓存: {(base_url, api_key): (token, 过期时间戳)}, 进程内共享
+_token_cache = {}
+_token_lock = threading.Lock()
+
+
+def _token_valid(cached):
+    token, expiry = cached
+    # 提前60秒刷新
+    return bool(token and expiry) and datetime.now(timezone.utc).timestamp() < expiry - 60
+
 
 class LabelStudioClient:
     """Label Studio API 客户端"""
@@ -18,8 +51,12 @@ class LabelStudioClient:
         self.base_url = settings.LABEL_STUDIO_URL
         self.api_key = settings.LABEL_STUDIO_API_KEY
         self.project_id = settings.LABEL_STUDIO_PROJECT_ID
-        self._access_token = None
-        self._token_expiry = None
+        # 进程内共享连接池, 多个客户端实例和线程复用 keep-alive 连接
+        self.session = get_session(
+            'label_studio',
+            pool_size=settings.LABEL_STUDIO_HTTP_POOL_SIZE,
+            retries=settings.LABEL_STUDIO_HTTP_RETRIES,
+        )
     
     def is_configured(self):
         """检查是否配置了 Label Studio"""
@@ -37,43 +74,51 @@ class LabelStudioClient:
         """
         如果使用 Personal Access Token (JWT),则获取 access token
         否则直接返回 API key (Legacy Token)
+        access token 在进程内所有客户端实例之间共享, 刷新时加锁, 避免并发重复刷新
         """
         if not self._is_jwt_token():
             # Legacy token,直接使用
             return self.api_key
         
+        cache_key = (self.base_url, self.api_key)
+        cached = _token_cache.get(cache_key)
         # 检查现有 access token 是否仍然有效
-        if self._access_token and self._token_expiry:
-            if datetime.now(timezone.utc).timestamp() < self._token_expiry - 60:  # 提前60秒刷新
-                return self._access_token
+        if cached and _token_valid(cached):
+            return cached[0]
         
-        # 使用 refresh token 获取新的 access token
-        try:
-            url = f"{self.base_url}/api/token/refresh"
-            response = requests.post(
-                url,
-                json={"refresh": self.api_key},
-                headers={'Content-Type': 'application/json'},
-                timeout=10
-            )
-            response.raise_for_status()
-            result = response.json()
-            self._access_token = result.get('access')
+        with _token_lock:
+            cached = _token_cache.get(cache_key)
+            if cached and _token_valid(cached):
+                return cached[0]
             
-            # 解析 access token 的过期时间
+            # 使用 refresh token 获取新的 access token
             try:
-                decoded = jwt.decode(self._access_token, options={"verify_signature": False})
-                self._token_expiry = decoded.get('exp')
-            except:
-                # 如果无法解析,默认5分钟后过期
-                self._token_expiry = datetime.now(timezone.utc).timestamp() + 300
-            
-            logger.info("成功获取 Label Studio access token")
-            return self._access_token
-            
-        except Exception as e:
-            logger.error(f"获取 Label Studio access token 失败: {e}")
-            return None
+                url = f"{self.base_url}/api/token/refresh"
+                response = self.session.post(
+                    url,
+                    json={"refresh": self.api_key},
+                    headers={'Content-Type': 'application/json'},
+                    timeout=10
+                )
+                response.raise_for_status()
+                result = response.json()
+                access_token = result.get('access')
+                
+                # 解析 access token 的过期时间
+                try:
+                    decoded = jwt.decode(access_token, options={"verify_signature": False})
+                    token_expiry = decoded.get('exp')
+                except:
+                    # 如果无法解析,默认5分钟后过期
+                    token_expiry = datetime.now(timezone.utc).timestamp() + 300
+                
+                _token_cache[cache_key] = (access_token, token_expiry)
+                logger.info("成功获取 Label Studio access token")
+                return access_token
+                
+            except Exception as e:
+                logger.error(f"获取 Label Studio access token 失败: {e}")
+                return None
     
     def _get_headers(self):
         """获取请求头,根据 token 类型使用不同的格式"""
@@ -123,10 +168,10 @@ class LabelStudioClient:
         url = f"{self.base_url}/api/projects/{self.project_id}/tasks"
         
         try:
-            response = requests.post(url, json=task_data, headers=headers, timeout=10)
+            response = self.session.post(url, data=json_codec.dumps(task_data), headers=headers, timeout=10)
             response.raise_for_status()
             
-            task_info = response.json()
+            task_info = json_codec.loads(response.content)
             logger.info(f"成功创建 Label Studio 任务: ID={task_info.get('id')}")
             return task_info
             
@@ -137,104 +182,269 @@ class LabelStudioClient:
     def create_tasks_batch(self, tasks_data_list):
         """
         批量创建 Label Studio 任务
+        任务按数量和请求体大小拆分为多个导入请求并发发送, 失败的请求按指数退避重试
+        每个任务的 data 中写入本次导入的批次号和序号 (import_batch / import_index),
+        导入接口没有返回 task_ids 时, 用一次按批次号过滤的查询得到各任务的 ID,
+        多个 worker 同时导入也不会把 ID 对应错
         
         Args:
-            tasks_data_list (list): 任务数据列表
+            tasks_data_list (list): 任务数据列表 (不会被修改)
         
         Returns:
             dict: 包含任务ID列表和其他信息, 格式: 
                 {
                     'task_count': 10,
-                    'task_ids': [123, 124, 125, ...],
-                    'annotation_count': 0,
-                    'prediction_count': 0,
-                    'duration': 0.5,
-                    'file_upload_ids': [],
-                    'could_be_tasks_list': False,
-                    'found_formats': [],
-                    'data_columns': []
+                    'task_ids': [123, 124, None, ...],  # 与 tasks_data_list 一一对应, 导入失败的为 None
+                    'failed_task_count': 0,
+                    'chunk_count': 1,
+                    'import_batch': 'a1b2c3...',
+                    'duration': 0.5
                 }
+            全部导入失败时返回 None
         """
         if not self.is_configured():
             logger.warning("Label Studio 未配置,跳过批量任务创建")
             return None
         
-        headers = self._get_headers()
-        if not headers:
+        if not self._get_headers():
             logger.error("无法获取 Label Studio 认证信息")
             return None
         
+        if not tasks_data_list:
+            return {'task_count': 0, 'task_ids': [], 'failed_task_count': 0, 'chunk_count': 0, 'duration': 0}
+
+        batch = uuid.uuid4().hex
+        tagged_tasks = [
+            {**task, 'data': {**task.get('data', {}), 'import_batch': batch, 'import_index': index}}
+            for index, task in enumerate(tasks_data_list)
+        ]
+
         url = f"{self.base_url}/api/projects/{self.project_id}/import"
-        
-        try:
-            # 记录推送前的任务数量
-            tasks_before = self._get_project_task_count()
-            
-            response = requests.post(url, json=tasks_data_list, headers=headers, timeout=30)
-            response.raise_for_status()
-            
-            result = response.json()
-            task_count = result.get('task_count', len(tasks_data_list))
-            task_ids = result.get('task_ids', [])
-            
-            # 如果 API 没有返回 task_ids (import API 通常不返回)
-            # 尝试获取最新创建的任务 IDs
-            if not task_ids and task_count > 0:
-                logger.info("API 未返回 task_ids，尝试获取最新创建的任务...")
-                task_ids = self._get_latest_task_ids(count=task_count, tasks_before=tasks_before)
-                result['task_ids'] = task_ids
-            
-            logger.info(f"成功批量创建 {task_count} 个 Label Studio 任务, IDs: {task_ids}")
-            return result
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"批量创建 Label Studio 任务失败: {e}")
-            if hasattr(e, 'response') and e.response is not None:
-                try:
-                    error_detail = e.response.json()
-                    logger.error(f"错误详情: {error_detail}")
-                except:
-                    logger.error(f"响应内容: {e.response.text[:500]}")
+        chunks = self._split_import_chunks(tagged_tasks)
+        task_ids = [None] * len(tasks_data_list)
+        start_time = time.monotonic()
+
+        def run_chunk(chunk):
+            start, count, body = chunk
+            chunk_ids = self._import_chunk(url, body, count, batch, start)
+            if chunk_ids:
+                task_ids[start:start + count] = chunk_ids
+
+        workers = min(settings.LABEL_STUDIO_IMPORT_WORKERS, len(chunks))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(run_chunk, chunks))
+
+        if None in task_ids:
+            # 接口未返回 ID, 或请求超时但服务端实际已创建: 按批次号查询一次补齐
+            for index, task_id in self._find_batch_task_ids(batch).items():
+                if 0 <= index < len(task_ids):
+                    task_ids[index] = task_id
+
+        failed = task_ids.count(None)
+        if failed == len(tasks_data_list):
+            logger.error(f"批量创建 Label Studio 任务失败: {len(chunks)} 个导入请求全部失败")
             return None
-    
-    def _get_project_task_count(self):
-        """获取项目当前的任务数量"""
-        try:
-            headers = self._get_headers()
-            url = f"{self.base_url}/api/projects/{self.project_id}"
-            response = requests.get(url, headers=headers, timeout=10)
+
+        result = {
+            'task_count': len(tasks_data_list) - failed,
+            'task_ids': task_ids,
+            'failed_task_count': failed,
+            'chunk_count': len(chunks),
+            'import_batch': batch,
+            'duration': round(time.monotonic() - start_time, 3),
+        }
+        if failed:
+            logger.warning(f"批量创建 Label Studio 任务部分失败: {failed}/{len(tasks_data_list)} 个任务未导入")
+        logger.info(f"成功批量创建 {result['task_count']} 个 Label Studio 任务 ({len(chunks)} 个请求, {result['duration']}s)")
+        return result
+
+    def _split_import_chunks(self, tasks_data_list):
+        """
+        按任务数和请求体字节数拆分导入请求, 每个任务只序列化一次
+
+        Returns:
+            list: [(起始下标, 任务数, 请求体 bytes), ...]
+        """
+        max_tasks = settings.LABEL_STUDIO_IMPORT_CHUNK_TASKS
+        max_bytes = settings.LABEL_STUDIO_IMPORT_CHUNK_BYTES
+        chunks = []
+        start, encoded, size = 0, [], 2
+
+        def close_chunk():
+            chunks.append((start, len(encoded), b'[' + b','.join(encoded) + b']'))
+
+        for index, task in enumerate(tasks_data_list):
+            data = json_codec.dumps(task)
+            if encoded and (len(encoded) >= max_tasks or size + len(data) + 1 > max_bytes):
+                close_chunk()
+                start, encoded, size = index, [], 2
+            encoded.append(data)
+            size += len(data) + 1
+        if encoded or not chunks:
+            close_chunk()
+        return chunks
+
+    def _import_chunk(self, url, body, task_count, batch, start):
+        """
+        发送一个导入请求, 失败时按指数退避重试
+        服务端明确未处理的请求 (429 / 503 / 连接超时) 直接重发; 结果不确定的失败 (500 / 502 / 504 / 读超时等)
+        先按批次号查询本分块的任务, 已创建时直接使用查询到的 ID, 避免重复导入
+
+        Args:
+            batch (str): 本次导入的批次号
+            start (int): 分块中第一个任务的 import_index
+
+        Returns:
+            list: 任务 ID (与分块内任务顺序一致, 未能确认的为 None); 未返回 ID 或最终失败时返回 None
+        """
+        retries = settings.LABEL_STUDIO_IMPORT_RETRIES
+        for attempt in range(retries + 1):
+            try:
+                headers = self._get_headers()
+                response = self.session.post(
+                    url, data=body, headers=headers, params={'return_task_ids': 'true'},
+                    timeout=LABEL_STUDIO_IMPORT_TIMEOUT
+                )
+                if response.status_code in IMPORT_RETRY_STATUS + IMPORT_UNCERTAIN_STATUS and attempt < retries:
+                    raise requests.exceptions.HTTPError(f"HTTP {response.status_code}", response=response)
+                response.raise_for_status()
+                result = json_codec.loads(response.content)
+                break
+            except requests.exceptions.RequestException as e:
+                status_code = e.response.status_code if getattr(e, 'response', None) is not None else None
+                not_processed = status_code in IMPORT_RETRY_STATUS or isinstance(e, requests.exceptions.ConnectTimeout)
+                uncertain = not not_processed and (status_code is None or status_code in IMPORT_UNCERTAIN_STATUS)
+                if not (not_processed or uncertain) or attempt >= retries:
+                    logger.error(f"导入 {task_count} 个 Label Studio 任务失败: {e}")
+                    if getattr(e, 'response', None) is not None:
+                        logger.error(f"响应内容: {e.response.text[:500]}")
+                    return None
+                delay = min(IMPORT_BACKOFF_MAX, IMPORT_BACKOFF_BASE * (2 ** attempt)) * random.uniform(0.5, 1.0)
+                logger.warning(f"导入 Label Studio 任务失败 ({e}), {delay:.1f}s 后第 {attempt + 1} 次重试")
+                time.sleep(delay)
+                if uncertain:
+                    try:
+                        mapping = self._query_batch_task_ids(batch)
+                    except requests.exceptions.RequestException as query_error:
+                        # 无法确认是否已创建, 不再重发; 导入结束后按批次号统一补齐 ID
+                        logger.error(f"确认导入结果失败, 放弃重试: {query_error}")
+                        return None
+                    chunk_ids = [mapping.get(index) for index in range(start, start + task_count)]
+                    if any(task_id is not None for task_id in chunk_ids):
+                        logger.info(f"导入请求失败但服务端已创建任务 (批次 {batch}), 不再重复提交")
+                        return chunk_ids
+
+        chunk_ids = result.get('task_ids') or []
+        if len(chunk_ids) != task_count:
+            return None
+        return list(chunk_ids)
+
+    def iter_tasks(self, filter_items, fields='task_only', page_size=BATCH_QUERY_PAGE_SIZE, task_ids=None):
+        """
+        分页查询项目中符合过滤条件的任务, 每次产出一页, 调用方可以边拉取边处理
+
+        Args:
+            filter_items (list): Label Studio 数据管理器过滤条件
+            fields (str): task_only 只返回任务数据; all 同时返回标注和预标注
+            task_ids (list): 只查询这些任务 (数据管理器的 selectedItems)
+
+        Raises:
+            requests.exceptions.RequestException: 请求失败
+        """
+        query = {'filters': {'conjunction': 'and', 'items': filter_items}}
+        if task_ids is not None:
+            query['selectedItems'] = {'all': False, 'included': list(task_ids)}
+        query = json_codec.dumps_str(query)
+        url = f"{self.base_url}/api/tasks"
+        page, seen = 1, 0
+        while True:
+            response = self.session.get(url, headers=self._get_headers(), params={
+                'project': self.project_id,
+                'query': query,
+                'fields': fields,
+                'page': page,
+                'page_size': page_size,
+            }, timeout=60)
+            if response.status_code == 404 and page > 1:
+                # 页码超出范围
+                return
             response.raise_for_status()
-            project_info = response.json()
-            return project_info.get('task_number', 0)
-        except Exception as e:
-            logger.warning(f"获取项目任务数量失败: {e}")
-            return 0
-    
-    def _get_latest_task_ids(self, count, tasks_before=0):
-        """获取最新创建的任务 IDs"""
+            result = json_codec.loads(response.content)
+            tasks = result.get('tasks', []) if isinstance(result, dict) else result
+            if tasks:
+                yield tasks
+            seen += len(tasks)
+            total = result.get('total', 0) if isinstance(result, dict) else 0
+            if len(tasks) < page_size or seen >= total:
+                return
+            page += 1
+
+    def _query_batch_task_ids(self, batch):
+        """
+        按导入批次号查询任务 ID; 同一序号有多个任务 (重复导入) 时保留 ID 最小的, 删除其余的
+
+        Returns:
+            dict: {import_index: task_id}
+
+        Raises:
+            requests.exceptions.RequestException: 查询失败
+        """
+        mapping, duplicates = {}, []
+        for tasks in self.iter_tasks([{
+            'filter': 'filter:tasks:data.import_batch',
+            'operator': 'equal',
+            'type': 'String',
+            'value': batch,
+        }]):
+            for task in tasks:
+                data = task.get('data', {})
+                if data.get('import_batch') != batch or 'import_index' not in data:
+                    continue
+                index = int(data['import_index'])
+                if index in mapping:
+                    duplicates.append(max(mapping[index], task['id']))
+                    mapping[index] = min(mapping[index], task['id'])
+                else:
+                    mapping[index] = task['id']
+        if duplicates:
+            logger.warning(f"批次 {batch} 中有 {len(duplicates)} 个重复导入的任务, 正在删除")
+            for task_id in duplicates:
+                self.delete_task(task_id)
+        return mapping
+
+    def _find_batch_task_ids(self, batch):
+        """
+        按导入批次号查询任务 ID, 查询失败时记录日志并返回空字典
+
+        Returns:
+            dict: {import_index: task_id}
+        """
+        mapping = {}
         try:
-            headers = self._get_headers()
-            # 获取最新的任务，按 ID 降序排列
-            url = f"{self.base_url}/api/projects/{self.project_id}/tasks"
-            params = {
-                'page_size': count + 10,  # 多获取一些以防万一
-                'ordering': '-id'  # 按 ID 降序
-            }
-            response = requests.get(url, headers=headers, params=params, timeout=10)
-            response.raise_for_status()
-            
-            tasks = response.json()
-            if isinstance(tasks, dict):
-                tasks = tasks.get('tasks', [])
-            
-            # 取最新的 count 个任务的 ID
-            task_ids = [task['id'] for task in tasks[:count]]
-            logger.info(f"获取到最新创建的 {len(task_ids)} 个任务 IDs")
-            return task_ids
-            
-        except Exception as e:
-            logger.error(f"获取最新任务 IDs 失败: {e}")
-            return []
+            mapping = self._query_batch_task_ids(batch)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"按批次号查询 Label Studio 任务 ID 失败: {e}")
+        logger.info(f"按批次号 {batch} 查询到 {len(mapping)} 个任务 ID")
+        return mapping
+
+    def iter_annotated_tasks(self, task_ids, page_size=ANNOTATION_PULL_PAGE_SIZE):
+        """
+        分页拉取指定任务中已有标注的任务 (含完整标注结果)
+        任务 ID 按 ANNOTATION_PULL_ID_CHUNK 个一组放入查询, 只返回这些任务, 不会下载其他文档的标注
+        (增量推送和并发导入后同一文档的任务 ID 不连续, 不能按 ID 范围查询)
+
+        Raises:
+            requests.exceptions.RequestException: 请求失败
+        """
+        wanted = sorted(set(task_ids))
+        filter_items = [
+            {'filter': 'filter:tasks:total_annotations', 'operator': 'greater', 'type': 'Number', 'value': 0},
+        ]
+        for start in range(0, len(wanted), ANNOTATION_PULL_ID_CHUNK):
+            chunk = wanted[start:start + ANNOTATION_PULL_ID_CHUNK]
+            chunk_ids = set(chunk)
+            for tasks in self.iter_tasks(filter_items, fields='all', page_size=page_size, task_ids=chunk):
+                yield [task for task in tasks if task.get('id') in chunk_ids]
     
     def get_task(self, task_id):
         """获取任务详情"""
@@ -248,9 +458,9 @@ class LabelStudioClient:
         url = f"{self.base_url}/api/tasks/{task_id}"
         
         try:
-            response = requests.get(url, headers=headers, timeout=10)
+            response = self.session.get(url, headers=headers, timeout=10)
             response.raise_for_status()
-            return response.json()
+            return json_codec.loads(response.content)
         except requests.exceptions.RequestException as e:
             logger.error(f"获取 Label Studio 任务失败: {e}")
             return None
@@ -267,7 +477,7 @@ class LabelStudioClient:
         url = f"{self.base_url}/api/tasks/{task_id}"
         
         try:
-            response = requests.delete(url, headers=headers, timeout=10)
+            response = self.session.delete(url, headers=headers, timeout=10)
             response.raise_for_status()
             logger.info(f"成功删除 Label Studio 任务: ID={task_id}")
             return True
@@ -287,9 +497,9 @@ class LabelStudioClient:
         url = f"{self.base_url}/api/projects/{self.project_id}/tasks"
         
         try:
-            response = requests.get(url, headers=headers, timeout=10)
+            response = self.session.get(url, headers=headers, timeout=10)
             response.raise_for_status()
-            result = response.json()
+            result = json_codec.loads(response.content)
             # Label Studio API 可能返回字典或列表
             if isinstance(result, dict):
                 return result.get('tasks', [])
@@ -310,7 +520,7 @@ class LabelStudioClient:
         url = f"{self.base_url}/api/tasks/{task_id}"
         
         try:
-            response = requests.patch(url, json=update_data, headers=headers, timeout=10)
+            response = self.session.patch(url, data=json_codec.dumps(update_data), headers=headers, timeout=10)
             response.raise_for_status()
             logger.info(f"成功更新 Label Studio 任务: ID={task_id}")
             return True
@@ -318,6 +528,37 @@ class LabelStudioClient:
             logger.error(f"更新 Label Studio 任务失败: {e}")
             return False
     
+    def create_prediction(self, task_id, result, model_version=None):
+        """
+        为已有任务添加一条预标注 (Label Studio 显示最新的一条)
+
+        Args:
+            task_id (int): 任务 ID
+            result (list): 预标注区域列表, 格式与导入任务时 predictions[0]["result"] 相同
+
+        Returns:
+            bool: 是否成功
+        """
+        if not self.is_configured():
+            return False
+
+        headers = self._get_headers()
+        if not headers:
+            return False
+
+        url = f"{self.base_url}/api/predictions"
+        payload = {'task': task_id, 'result': result}
+        if model_version:
+            payload['model_version'] = model_version
+
+        try:
+            response = self.session.post(url, data=json_codec.dumps(payload), headers=headers, timeout=10)
+            response.raise_for_status()
+            return True
+        except requests.exceptions.RequestException as e:
+            logger.error(f"创建 Label Studio 预标注失败 (任务 {task_id}): {e}")
+            return False
+
     def test_connection(self):
         """测试连接"""
         if not self.is_configured():
@@ -330,7 +571,7 @@ class LabelStudioClient:
         url = f"{self.base_url}/api/projects/{self.project_id}"
         
         try:
-            response = requests.get(url, headers=headers, timeout=5)
+            response = self.session.get(url, headers=headers, timeout=5)
             response.raise_for_status()
             project_info = response.json()
             return True, f"连接成功! 项目: {project_info.get('title', 'Unknown')}"
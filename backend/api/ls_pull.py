@@ -0,0 +1,51 @@
+"""
+从 Label Studio 拉取校对结果
+按文档的任务 ID 分页批量拉取已有标注的任务, 每页的最新标注写入 OcrPage (见 corrections),
+只有标注版本 (更新时间 + 标注 ID) 变化的页面会被写入, 不再需要手动导出并上传 JSON
+"""
+import logging
+from django.utils import timezone
+from .corrections import latest_annotation, save_page_annotations
+
+logger = logging.getLogger(__name__)
+
+# 文档处于这些状态时才会拉取标注
+PULL_STATUSES = ('processed', 'corrected', 'ingested')
+
+
+def pull_document_annotations(doc, client):
+    """
+    拉取文档在 Label Studio 中的标注并按页保存
+
+    Args:
+        doc (OcrDocument): 已推送到 Label Studio 的文档
+        client (LabelStudioClient): 已配置的客户端
+
+    Returns:
+        dict: {"annotated", "changed", "unchanged"}
+
+    Raises:
+        requests.exceptions.RequestException: 请求 Label Studio 失败
+    """
+    annotated = 0
+    changed = []
+
+    # 每次只处理一页结果, 写入后即丢弃
+    for tasks in client.iter_annotated_tasks(doc.label_studio_task_ids or []):
+        entries = []
+        for task in tasks:
+            annotation = latest_annotation(task)
+            page_num = task.get('data', {}).get('page_num')
+            if annotation is None or page_num is None:
+                continue
+            entries.append((int(page_num), task, annotation))
+        annotated += len(entries)
+        changed += save_page_annotations(doc, entries)
+
+    doc.label_studio_pull_time = timezone.now()
+    doc.save(update_fields=['label_studio_pull_time'])
+
+    summary = {'annotated': annotated, 'changed': len(changed), 'unchanged': annotated - len(changed)}
+    if changed:
+        logger.info(f"文档 {doc.id} 已拉取 Label Studio 标注: {summary['changed']} 页有变化, {summary['unchanged']} 页未变化")
+    return summary
@@ -0,0 +1,157 @@
+"""
+Label Studio 增量同步
+按页比较任务指纹 (见 ls_tasks.page_fingerprint), 只导入新页面、更新内容有变化的页面、删除已不存在的页面,
+每页的任务 ID / 指纹 / 预标注保存在 OcrPage 中, 重新同步的开销与变化的页数成正比, 而不是文档总页数
+"""
+import logging
+from django.utils import timezone
+from .models import OcrPage
+from .ls_tasks import BASE_OUTPUT_DIR, generate_ls_tasks, page_fingerprint
+from .page_images import page_image_filename
+
+logger = logging.getLogger(__name__)
+
+
+class LabelStudioSyncError(RuntimeError):
+    """导入任务到 Label Studio 失败"""
+
+
+def _page_num(task):
+    return task['data']['page_num']
+
+
+def _previous_pages(doc, tasks):
+    """
+    读取上次同步的页面映射 {页码: {"task_id", "fingerprint"}}
+    旧文档只记录了任务 ID 列表: 数量与当前页数一致时按页码顺序对应 (导入接口按提交顺序分配递增 ID),
+    指纹留空, 这些页面会被原地更新而不是重复导入
+    """
+    previous = {
+        page_num: {'task_id': task_id, 'fingerprint': fingerprint}
+        for page_num, task_id, fingerprint in OcrPage.objects.filter(
+            document=doc, label_studio_task_id__isnull=False
+        ).values_list('page_num', 'label_studio_task_id', 'fingerprint')
+    }
+    if previous:
+        return previous
+    task_ids = doc.label_studio_task_ids or []
+    if task_ids and len(task_ids) == len(tasks):
+        return {_page_num(task): {'task_id': task_id, 'fingerprint': None}
+                for task, task_id in zip(tasks, sorted(task_ids))}
+    return {}
+
+
+def _save_pages(doc, unique_folder_name, written, removed_pages):
+    """只写入本次新增 / 更新的页面, 未变化的页面不触碰; 已删除的页面清空任务信息 (保留校对结果)"""
+    pages_dir = BASE_OUTPUT_DIR / unique_folder_name / 'pages'
+    rows = [
+        OcrPage(
+            document=doc,
+            page_num=page_num,
+            image_path=str(pages_dir / page_image_filename(page_num)),
+            prediction=task['predictions'][0]['result'],
+            fingerprint=fingerprint or '',
+            label_studio_task_id=task_id,
+        )
+        for page_num, (task, task_id, fingerprint) in written.items()
+    ]
+    if rows:
+        OcrPage.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['document', 'page_num'],
+            update_fields=['image_path', 'prediction', 'fingerprint', 'label_studio_task_id', 'updated_at'],
+            batch_size=500,
+        )
+    if removed_pages:
+        OcrPage.objects.filter(document=doc, page_num__in=removed_pages).update(
+            label_studio_task_id=None, fingerprint='', prediction=None
+        )
+
+
+def sync_document_tasks(doc, mineru_data, unique_folder_name, client):
+    """
+    将文档同步到 Label Studio, 并按页保存任务 ID、指纹和预标注
+
+    Args:
+        doc (OcrDocument): 文档
+        mineru_data (dict): MinerU 输出的 _middle.json 内容
+        unique_folder_name (str): 文档输出目录名
+        client (LabelStudioClient): 已配置的客户端
+
+    Returns:
+        dict: {"task_count", "created", "updated", "deleted", "unchanged", "failed", "task_ids"}
+
+    Raises:
+        LabelStudioSyncError: 导入新任务失败
+    """
+    tasks = generate_ls_tasks(mineru_data, doc, unique_folder_name)
+    previous = _previous_pages(doc, tasks)
+
+    # pages: 同步后每页的任务 ID; written: 本次需要写入 OcrPage 的页面 {页码: (任务, 任务 ID, 指纹)}
+    pages = {}
+    written = {}
+    to_create, to_update = [], []
+    for task in tasks:
+        page_num = _page_num(task)
+        fingerprint = page_fingerprint(task)
+        old = previous.get(page_num) or {}
+        if not old.get('task_id'):
+            to_create.append((page_num, task, fingerprint))
+        elif old.get('fingerprint') == fingerprint:
+            pages[page_num] = old['task_id']
+        else:
+            to_update.append((page_num, task, fingerprint, old['task_id']))
+
+    current_pages = {_page_num(task) for task in tasks}
+    removed_pages = [page_num for page_num in previous if page_num not in current_pages]
+    removed = [previous[page_num]['task_id'] for page_num in removed_pages if previous[page_num].get('task_id')]
+
+    updated = 0
+    for page_num, task, fingerprint, task_id in to_update:
+        if not client.update_task(task_id, {'data': task['data']}):
+            # 任务可能已在 Label Studio 中被删除, 改为重新导入
+            to_create.append((page_num, task, fingerprint))
+            continue
+        prediction_ok = client.create_prediction(task_id, task['predictions'][0]['result'])
+        # 预标注写入失败时不记录指纹, 下次同步会再次更新该页
+        pages[page_num] = task_id
+        written[page_num] = (task, task_id, fingerprint if prediction_ok else None)
+        updated += 1
+
+    if to_create:
+        result = client.create_tasks_batch([task for _, task, _ in to_create])
+        if not result:
+            raise LabelStudioSyncError("导入任务到 Label Studio 失败")
+        # task_ids 与提交的任务一一对应, 导入失败或无法获取 ID 的为 None, 下次同步时重新导入
+        task_ids = result.get('task_ids') or []
+        if len(task_ids) != len(to_create):
+            task_ids = [None] * len(to_create)
+        missing = sum(1 for task_id in task_ids if task_id is None)
+        if missing:
+            logger.warning(f"文档 {doc.id}: {missing}/{len(to_create)} 个新任务未导入或未获取到任务 ID")
+        for (page_num, task, fingerprint), task_id in zip(to_create, task_ids):
+            pages[page_num] = task_id
+            written[page_num] = (task, task_id, fingerprint if task_id else None)
+        failed = result.get('failed_task_count', 0)
+    else:
+        failed = 0
+
+    deleted = sum(1 for task_id in removed if client.delete_task(task_id))
+
+    _save_pages(doc, unique_folder_name, written, removed_pages)
+    doc.label_studio_task_ids = [pages[page_num] for page_num in sorted(pages) if pages[page_num]]
+    doc.label_studio_synced = True
+    doc.label_studio_sync_time = timezone.now()
+    doc.save(update_fields=['label_studio_task_ids', 'label_studio_synced', 'label_studio_sync_time'])
+
+    summary = {
+        'task_count': len(tasks),
+        'created': len(to_create) - failed,
+        'updated': updated,
+        'deleted': deleted,
+        'unchanged': len(tasks) - len(to_create) - updated,
+        'failed': failed,
+        'task_ids': doc.label_studio_task_ids,
+    }
+    logger.info(f"文档 {doc.id} 已同步到 Label Studio: 新增 {summary['created']}, 更新 {summary['updated']}, "
+                f"删除 {summary['deleted']}, 未变化 {summary['unchanged']}")
+    return summary
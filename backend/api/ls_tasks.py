@@ -0,0 +1,228 @@
+"""
+Label Studio 任务生成
+将 MinerU 的 _middle.json 转换为带预标注的 Label Studio 任务 (每页一个任务)
+每页的所有 bbox 汇总为一个 NumPy 数组后一次性换算为百分比坐标
+区域 ID 由 (文档, 页码, bbox, 标签, 文本) 的内容哈希得到, OCR 不变时重新生成的任务完全相同
+"""
+import gc
+import hashlib
+import json
+import logging
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+import numpy as np
+from django.conf import settings
+from .page_images import page_image_filename
+
+logger = logging.getLogger(__name__)
+
+BASE_OUTPUT_DIR = settings.DATA_ROOT_PATH / 'data' / 'mineru_output'
+
+# 映射到 label_studio_config.xml 中定义的标签名称
+LS_TYPE_MAPPING = {
+    'text': 'Para',      # 对应 <Label value="Para" />
+    'title': 'Title',
+    'list': 'List',
+    'figure': 'Figure',
+    'foot': 'Footer',    # 对应 <Label value="Footer" />
+    'head': 'Header',    # 对应 <Label value="Header" />
+    'equation': 'Formula',  # 对应 <Label value="Formula" />
+    'table': 'Table'
+}
+# 这些类型的块按行生成区域 (带识别文本), 其余类型按整个块生成一个区域
+LINE_BLOCK_TYPES = ('text', 'title', 'list', 'foot', 'head')
+
+# 区域 ID 哈希使用的常量 (uint64 运算自然溢出回绕)
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+_SHIFT_24 = np.uint64(24)
+_SHIFT_29 = np.uint64(29)
+_SHIFT_32 = np.uint64(32)
+
+
+def _line_text(line):
+    return ''.join([span.get('content', '') for span in line.get('spans', ())]).strip()
+
+
+def _collect_page_regions(page_data):
+    """
+    按原有顺序收集一页中需要生成区域的 bbox
+
+    Returns:
+        tuple: (bboxes, labels, texts), texts 中无文本的区域为空字符串
+    """
+    bboxes, labels, texts = [], [], []
+
+    for block in page_data.get('para_blocks', []) + page_data.get('preproc_blocks', []):
+        block_type = block.get('type')
+        if block_type == 'figure':
+            bbox = block.get('bbox')
+            if bbox and len(bbox) == 4:
+                bboxes.append(bbox)
+                labels.append('Figure')
+                texts.append('')
+            line_label = 'Text'
+        elif block_type in LINE_BLOCK_TYPES:
+            line_label = LS_TYPE_MAPPING[block_type]
+        else:
+            bbox = block.get('bbox')
+            if bbox and len(bbox) == 4:
+                bboxes.append(bbox)
+                labels.append(LS_TYPE_MAPPING.get(block_type, 'Unknown'))
+                texts.append('')
+            continue
+        for line in block.get('lines', ()):
+            bbox = line.get('bbox')
+            if bbox and len(bbox) == 4:
+                bboxes.append(bbox)
+                labels.append(line_label)
+                texts.append(_line_text(line))
+    return bboxes, labels, texts
+
+
+def bboxes_to_percent(bboxes, page_width, page_height):
+    """
+    将 [x1, y1, x2, y2] (PDF 坐标) 批量换算为 Label Studio 的百分比坐标
+
+    Returns:
+        np.ndarray: 形状 (n, 4), 每行为 x, y, width, height
+    """
+    boxes = np.asarray(bboxes, dtype=np.float64)
+    scale = np.array([page_width, page_height, page_width, page_height], dtype=np.float64)
+    result = np.empty_like(boxes)
+    result[:, :2] = boxes[:, :2] / scale[:2] * 100
+    result[:, 2:] = (boxes[:, 2:] - boxes[:, :2]) / scale[2:] * 100
+    return result
+
+
+def region_ids(boxes, labels, texts, doc_id, page_num):
+    """
+    批量计算区域 ID: 对 (文档, 页码, bbox, 标签, 文本) 做 64 位哈希, 取 40 位作为 ID
+    bbox 的浮点数直接按位参与混合, 文本用 crc32, 全部在 NumPy 中向量化完成
+
+    Returns:
+        list: 形如 "ls_0123456789" 的 ID, 相同内容在每次生成时保持不变
+    """
+    words = np.ascontiguousarray(boxes, dtype='<f8').view('<u8')
+    text_hashes = np.fromiter(
+        (zlib.crc32(f"{label}\0{text}".encode('utf-8')) for label, text in zip(labels, texts)),
+        dtype=np.uint64, count=len(labels)
+    )
+    h = np.full(len(labels), zlib.crc32(f"{doc_id}:{page_num}".encode('utf-8')), dtype=np.uint64)
+    h ^= text_hashes << _SHIFT_32
+    for column in range(4):
+        h ^= words[:, column]
+        h *= _HASH_MULTIPLIER
+        h ^= h >> _SHIFT_29
+    h ^= text_hashes
+    h *= _HASH_MULTIPLIER
+    h ^= h >> _SHIFT_32
+    return [f"ls_{value:010x}" for value in (h >> _SHIFT_24).tolist()]
+
+
+def page_fingerprint(task):
+    """
+    任务内容指纹, 指纹相同说明该页任务无需重新推送
+    使用标准库的规范编码 (键排序、无空白), 不受 json_codec 后端 (orjson / 标准库) 输出差异影响
+    """
+    canonical = json.dumps(task, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def build_page_regions(page_data, page_num, doc_id=None):
+    """生成一页的预标注结果 (矩形框 + 对应的识别文本)"""
+    page_width, page_height = page_data['page_size']
+    bboxes, labels, texts = _collect_page_regions(page_data)
+    if not bboxes:
+        return []
+
+    results = []
+    append = results.append
+    seen_ids = set()
+    boxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+    coords = bboxes_to_percent(boxes, page_width, page_height).tolist()
+    ids = region_ids(boxes, labels, texts, doc_id, page_num)
+    for index, (x, y, width, height) in enumerate(coords):
+        label, text = labels[index], texts[index]
+        rid = ids[index]
+        if rid in seen_ids:
+            # 同一页上完全重复的区域, 追加序号保证唯一
+            rid = f"{rid}_{index}"
+        seen_ids.add(rid)
+        append({
+            "id": rid, "from_name": "bbox", "to_name": "image", "type": "rectanglelabels",
+            "value": {"x": x, "y": y, "width": width, "height": height, "rotation": 0, "rectanglelabels": [label]}
+        })
+        if text:
+            append({
+                "id": rid, "from_name": "transcription", "to_name": "image", "type": "textarea",
+                "value": {"text": [text]}
+            })
+    return results
+
+
+@contextmanager
+def _gc_paused():
+    """
+    生成任务时会一次性创建数十万个 dict, 期间暂停循环垃圾回收,
+    避免 GC 反复扫描这些新对象 (它们不含循环引用, 结束后正常回收)
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def generate_ls_tasks(mineru_data, doc, unique_folder_name):
+    """
+    生成文档的 Label Studio 任务列表
+
+    Args:
+        mineru_data (dict): MinerU 输出的 _middle.json 内容
+        doc (OcrDocument): 文档
+        unique_folder_name (str): 文档输出目录名, 页面图片位于其 pages 子目录
+
+    Returns:
+        list: Label Studio 任务, 没有任何区域的页面不生成任务
+    """
+    pdf_info = mineru_data.get('pdf_info', [])
+    if not pdf_info:
+        raise ValueError("Invalid MinerU JSON format: 'pdf_info' key missing.")
+
+    pages_dir = BASE_OUTPUT_DIR / unique_folder_name / 'pages'
+    image_base_url = f"{settings.BACKEND_EXTERNAL_URL}/api/images/{unique_folder_name}"
+    filename = Path(doc.original_pdf_path).name
+    total_pages = len(pdf_info)
+
+    ls_tasks = []
+    with _gc_paused():
+        for page_data in pdf_info:
+            page_index = page_data.get('page_idx', 0)
+            page_num = page_index + 1
+            page_size = page_data.get('page_size')
+            if not page_size or len(page_size) != 2 or page_size[0] == 0 or page_size[1] == 0:
+                logger.warning(f"Page size missing or invalid for page {page_index}. Skipping.")
+                continue
+            page_filename = page_image_filename(page_num)
+            image_path = pages_dir / page_filename
+            if not image_path.exists():
+                logger.warning(f"Could not find image for page {page_num} at expected path: {image_path}")
+                continue
+
+            results = build_page_regions(page_data, page_num, doc.id)
+            if not results:
+                continue
+            ls_tasks.append({
+                "data": {
+                    "image": f"{image_base_url}/{page_filename}",
+                    "doc_id": doc.id,
+                    "page_num": page_num,
+                    "total_pages": total_pages,
+                    "filename": filename
+                },
+                "predictions": [{"result": results}]
+            })
+    return ls_tasks
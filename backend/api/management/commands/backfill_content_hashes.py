@@ -0,0 +1,48 @@
+"""
+为已有文档计算 PDF 内容哈希, 使其可以被内容相同的新上传复用
+
+用法:
+    python manage.py backfill_content_hashes            # 计算所有缺少哈希的文档
+    python manage.py backfill_content_hashes --dry-run  # 只统计
+    python manage.py backfill_content_hashes --report   # 计算后列出内容重复的文档
+"""
+import os
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from api.models import OcrDocument
+from api.dedup import file_sha256
+
+
+class Command(BaseCommand):
+    help = '为缺少 content_hash 的文档计算 PDF 的 SHA-256'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='只统计缺少哈希的文档')
+        parser.add_argument('--report', action='store_true', help='列出内容重复的文档')
+
+    def handle(self, *args, **options):
+        pending = list(
+            OcrDocument.objects.filter(content_hash__isnull=True).values_list('id', 'original_pdf_path')
+        )
+        self.stdout.write(f"缺少哈希的文档: {len(pending)}")
+
+        if not options['dry_run']:
+            hashed = missing = 0
+            for doc_id, pdf_path in pending:
+                if not pdf_path or not os.path.exists(pdf_path):
+                    missing += 1
+                    continue
+                OcrDocument.objects.filter(id=doc_id).update(content_hash=file_sha256(pdf_path))
+                hashed += 1
+            self.stdout.write(f"已计算 {hashed} 个, PDF 不存在 {missing} 个")
+
+        if options['report']:
+            duplicates = (
+                OcrDocument.objects.filter(content_hash__isnull=False).values('content_hash')
+                .annotate(count=Count('id')).filter(count__gt=1).order_by('-count')
+            )
+            for row in duplicates:
+                doc_ids = OcrDocument.objects.filter(content_hash=row['content_hash']).values_list('id', flat=True)
+                self.stdout.write(f"  {row['content_hash'][:12]}: {', '.join(map(str, doc_ids))}")
+
+        self.stdout.write(self.style.SUCCESS('完成'))
@@ -0,0 +1,72 @@
+"""
+压缩已有文档的 MinerU 输出
+
+用法:
+    python manage.py compress_ocr_outputs              # 压缩磁盘上的 _middle.json 并更新 mineru_json_path
+    python manage.py compress_ocr_outputs --blobs      # 同时按当前压缩格式重新编码 blob (如 gzip -> zstd)
+    python manage.py compress_ocr_outputs --dry-run    # 只统计, 不修改
+"""
+from pathlib import Path
+from django.core.management.base import BaseCommand
+from api.models import OcrDocument
+from api.blob_store import get_blob_store
+from api.compression import compress_file, codec_for_name, codec_suffix
+
+
+class Command(BaseCommand):
+    help = '将已有文档的 MinerU _middle.json 转换为压缩格式'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='只统计需要处理的文档')
+        parser.add_argument('--blobs', action='store_true', help='按当前压缩格式重新编码 OCR / 校对 blob')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        saved_bytes = 0
+        converted = 0
+
+        documents = OcrDocument.objects.exclude(mineru_json_path__isnull=True).exclude(mineru_json_path='')
+        for doc in documents.only('id', 'mineru_json_path').iterator():
+            json_path = Path(doc.mineru_json_path)
+            if codec_for_name(json_path) or not json_path.exists():
+                continue
+            converted += 1
+            if dry_run:
+                continue
+            original_size = json_path.stat().st_size
+            compressed_path = compress_file(json_path)
+            saved_bytes += original_size - compressed_path.stat().st_size
+            OcrDocument.objects.filter(id=doc.id).update(mineru_json_path=str(compressed_path))
+            self.stdout.write(f"  文档 {doc.id}: {json_path.name} -> {compressed_path.name}")
+
+        if dry_run:
+            self.stdout.write(f"待压缩 _middle.json: {converted} 个")
+        else:
+            self.stdout.write(f"已压缩 _middle.json: {converted} 个, 节省 {saved_bytes / 1024 / 1024:.1f} MB")
+
+        if options['blobs']:
+            self._recompress_blobs(dry_run)
+
+        self.stdout.write(self.style.SUCCESS('完成'))
+
+    def _recompress_blobs(self, dry_run):
+        store = get_blob_store()
+        suffix = codec_suffix()
+        recompressed = 0
+        fields = (('raw_ocr_ref', 'raw_ocr_json'), ('corrected_json_ref', 'corrected_label_studio_json'))
+
+        for ref_field, inline_field in fields:
+            queryset = OcrDocument.objects.exclude(**{f'{ref_field}__isnull': True}).exclude(**{f'{ref_field}__endswith': suffix})
+            for doc_id, ref in queryset.values_list('id', ref_field):
+                if dry_run:
+                    recompressed += 1
+                    continue
+                try:
+                    new_ref = store.put_json(store.get_json(ref))
+                except Exception as e:
+                    self.stderr.write(f"  文档 {doc_id}: 读取 blob {ref} 失败: {e}")
+                    continue
+                OcrDocument.objects.filter(id=doc_id).update(**{ref_field: new_ref, inline_field: None})
+                recompressed += 1
+
+        self.stdout.write(f"已重新编码 blob: {recompressed} 个 (旧 blob 可通过 migrate_ocr_blobs --gc 清理)")
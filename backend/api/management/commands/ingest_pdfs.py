@@ -0,0 +1,53 @@
+"""
+批量导入目录中的 PDF
+
+用法:
+    python manage.py ingest_pdfs                      # 导入 data/pdfs_to_process 中还没有文档的 PDF
+    python manage.py ingest_pdfs /mnt/scans           # 导入指定目录 (含子目录)
+    python manage.py ingest_pdfs --dry-run            # 只列出待导入的文件
+    python manage.py ingest_pdfs --watch --interval 10  # 持续监视目录, 导入新放入的 PDF
+    python manage.py ingest_pdfs --no-reuse           # 内容重复的 PDF 也重新运行 MinerU
+
+文件原地引用, 不会复制; 删除文档时会一并删除对应的 PDF; 内容哈希由处理任务计算
+"""
+import time
+from django.core.management.base import BaseCommand
+from api.ingest import PDF_UPLOAD_DIR, create_documents, find_new_pdfs
+
+
+class Command(BaseCommand):
+    help = '为目录中还没有文档的 PDF 批量创建文档并分派处理任务, --watch 时持续监视新文件'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', nargs='?', default=str(PDF_UPLOAD_DIR), help='要导入的目录')
+        parser.add_argument('--watch', action='store_true', help='持续监视目录')
+        parser.add_argument('--interval', type=float, default=10, help='监视时两次扫描的间隔 (秒)')
+        parser.add_argument('--min-age', type=float, default=10,
+                            help='修改时间距今不足该秒数的文件视为仍在写入, 下次扫描再导入')
+        parser.add_argument('--dry-run', action='store_true', help='只列出待导入的文件')
+        parser.add_argument('--no-reuse', action='store_true',
+                            help='不复用内容相同的已处理文档的结果 (默认按 OCR_REUSE_DUPLICATES)')
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        known = set()
+        reuse = False if options['no_reuse'] else None
+        try:
+            while True:
+                pdf_paths = find_new_pdfs(directory, known, min_age=options['min_age'])
+                if pdf_paths:
+                    self.stdout.write(f"发现 {len(pdf_paths)} 个新 PDF")
+                    for path in pdf_paths:
+                        self.stdout.write(f"  {path}")
+                    if not options['dry_run']:
+                        documents = create_documents([(path, None) for path in pdf_paths], reuse=reuse)
+                        self.stdout.write(f"已创建 {len(documents)} 个文档")
+                    # dry-run 时也记入, 监视模式下不重复列出
+                    known.update(pdf_paths)
+                if not options['watch']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS('完成'))
@@ -0,0 +1,58 @@
+"""
+将旧文档行内保存的 OCR / 校对 JSON 迁移到 blob 存储
+
+用法:
+    python manage.py migrate_ocr_blobs            # 迁移所有行内 JSON
+    python manage.py migrate_ocr_blobs --dry-run  # 只统计, 不写入
+    python manage.py migrate_ocr_blobs --gc       # 迁移后删除没有被任何文档引用的 blob
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from api.models import OcrDocument
+from api.blob_store import get_blob_store
+
+
+class Command(BaseCommand):
+    help = '将 OcrDocument 中行内保存的大 JSON 迁移到 blob 存储, 数据库只保留引用'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='只统计需要迁移的文档')
+        parser.add_argument('--gc', action='store_true', help='删除未被引用的 blob')
+
+    def handle(self, *args, **options):
+        pending = OcrDocument.objects.filter(
+            Q(raw_ocr_json__isnull=False) | Q(corrected_label_studio_json__isnull=False)
+        ).values_list('id', flat=True)
+        doc_ids = list(pending)
+        self.stdout.write(f"需要迁移的文档: {len(doc_ids)}")
+
+        if not options['dry_run']:
+            for doc_id in doc_ids:
+                # 逐个加载, 避免一次把所有大 JSON 读进内存
+                doc = OcrDocument.objects.get(id=doc_id)
+                update_fields = []
+                if doc.raw_ocr_json is not None:
+                    doc.store_raw_ocr_json(doc.raw_ocr_json)
+                    update_fields += ['raw_ocr_ref', 'raw_ocr_json']
+                if doc.corrected_label_studio_json is not None:
+                    doc.store_corrected_json(doc.corrected_label_studio_json)
+                    update_fields += ['corrected_json_ref', 'corrected_label_studio_json']
+                doc.save(update_fields=update_fields)
+                self.stdout.write(f"  文档 {doc_id}: 已迁移 {', '.join(f for f in update_fields if f.endswith('_ref'))}")
+
+        if options['gc']:
+            self._collect_garbage(options['dry_run'])
+
+        self.stdout.write(self.style.SUCCESS('完成'))
+
+    def _collect_garbage(self, dry_run):
+        store = get_blob_store()
+        referenced = set()
+        for raw_ref, corrected_ref in OcrDocument.objects.values_list('raw_ocr_ref', 'corrected_json_ref'):
+            referenced.update(ref for ref in (raw_ref, corrected_ref) if ref)
+
+        orphaned = [ref for ref in store.iter_refs() if ref not in referenced]
+        self.stdout.write(f"未被引用的 blob: {len(orphaned)}")
+        if not dry_run:
+            for ref in orphaned:
+                store.delete(ref)
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_ocrdocument_label_studio_sync_time_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessingLogLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('line', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='log_lines', to='api.ocrdocument')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['document', 'id'], name='api_logline_doc_id_idx')],
+            },
+        ),
+    ]
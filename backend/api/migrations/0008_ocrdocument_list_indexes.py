@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_processinglogline'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ocrdocument',
+            index=models.Index(fields=['created_at', 'id'], name='api_doc_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ocrdocument',
+            index=models.Index(fields=['status', 'created_at'], name='api_doc_status_created_idx'),
+        ),
+    ]
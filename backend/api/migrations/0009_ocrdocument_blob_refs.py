@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_ocrdocument_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ocrdocument',
+            name='corrected_json_ref',
+            field=models.CharField(blank=True, max_length=128, null=True, verbose_name='校对JSON引用'),
+        ),
+        migrations.AddField(
+            model_name='ocrdocument',
+            name='raw_ocr_ref',
+            field=models.CharField(blank=True, max_length=128, null=True, verbose_name='原始OCR JSON引用'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_ocrdocument_blob_refs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ocrdocument',
+            name='label_studio_push_error',
+            field=models.TextField(blank=True, default='', verbose_name='Label Studio推送错误'),
+        ),
+        migrations.AddField(
+            model_name='ocrdocument',
+            name='label_studio_push_status',
+            field=models.CharField(blank=True, default='', max_length=20, verbose_name='Label Studio推送状态'),
+        ),
+        migrations.AddField(
+            model_name='ocrdocument',
+            name='label_studio_push_task_id',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Label Studio推送任务ID'),
+        ),
+        migrations.AddField(
+            model_name='ocrdocument',
+            name='label_studio_pull_time',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='标注拉取时间'),
+        ),
+        migrations.CreateModel(
+            name='OcrPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_num', models.PositiveIntegerField()),
+                ('image_path', models.CharField(blank=True, default='', max_length=1024)),
+                ('prediction', models.JSONField(blank=True, null=True)),
+                ('fingerprint', models.CharField(blank=True, default='', max_length=64)),
+                ('label_studio_task_id', models.BigIntegerField(blank=True, null=True)),
+                ('annotation_id', models.BigIntegerField(blank=True, null=True)),
+                ('annotation_updated_at', models.CharField(blank=True, default='', max_length=64)),
+                ('corrected_annotation', models.JSONField(blank=True, null=True)),
+                ('corrected_text', models.TextField(blank=True, default='')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='api.ocrdocument')),
+            ],
+            options={
+                'ordering': ['page_num'],
+                'constraints': [models.UniqueConstraint(fields=('document', 'page_num'), name='api_page_doc_page_uniq')],
+            },
+        ),
+    ]
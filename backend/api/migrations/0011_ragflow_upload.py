@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_label_studio_sync_ocrpage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ocrdocument',
+            name='ragflow_dataset_id',
+            field=models.CharField(blank=True, max_length=64, null=True, verbose_name='RAGFlow知识库ID'),
+        ),
+        migrations.AddField(
+            model_name='ocrdocument',
+            name='ragflow_document_id',
+            field=models.CharField(blank=True, max_length=64, null=True, verbose_name='RAGFlow文档ID'),
+        ),
+        migrations.AddField(
+            model_name='ocrdocument',
+            name='ragflow_upload_error',
+            field=models.TextField(blank=True, default='', verbose_name='RAGFlow上传错误'),
+        ),
+        migrations.AddField(
+            model_name='ocrdocument',
+            name='ragflow_upload_status',
+            field=models.CharField(blank=True, default='', max_length=20, verbose_name='RAGFlow上传状态'),
+        ),
+        migrations.AddField(
+            model_name='ocrdocument',
+            name='ragflow_upload_task_id',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='RAGFlow上传任务ID'),
+        ),
+        migrations.AddField(
+            model_name='ocrdocument',
+            name='ragflow_upload_time',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='RAGFlow上传时间'),
+        ),
+        migrations.CreateModel(
+            name='RagflowChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chunk_key', models.CharField(max_length=64)),
+                ('chunk_id', models.CharField(max_length=64)),
+                ('page_num', models.PositiveIntegerField()),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ragflow_chunks', to='api.ocrdocument')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('document', 'chunk_key'), name='api_ragflow_chunk_doc_key_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_ragflow_upload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ocrdocument',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, null=True, verbose_name='内容哈希'),
+        ),
+        migrations.AddField(
+            model_name='ocrdocument',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='api.ocrdocument', verbose_name='复用的原文档'),
+        ),
+        migrations.AddIndex(
+            model_name='ocrdocument',
+            index=models.Index(fields=['content_hash'], name='api_doc_content_hash_idx'),
+        ),
+    ]
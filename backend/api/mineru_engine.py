@@ -0,0 +1,163 @@
+"""
+MinerU 执行引擎
+提供常驻 worker 进程的 in-process 引擎 (模型只加载一次), 以及原有的 CLI 子进程引擎作为回退
+"""
+import subprocess
+import threading
+import logging
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MINERU_COMMAND = 'mineru'
+MINERU_TIMEOUT = 3600
+MINERU_LANG = 'ch'
+
+
+class MineruError(RuntimeError):
+    """MinerU 执行失败"""
+
+
+class MineruEngine:
+    """MinerU 引擎基类"""
+    name = 'base'
+
+    def load(self):
+        """预加载资源, 默认无需处理"""
+
+    def run(self, pdf_path, output_dir, start_page=None, end_page=None, on_line=None):
+        """
+        解析 PDF, 结果写入 output_dir/<pdf 名>/auto/
+
+        Args:
+            start_page / end_page: 可选页码区间 (从 0 开始, 包含 end)
+            on_line (callable): 每产生一行日志时回调
+        """
+        raise NotImplementedError
+
+
+class CliMineruEngine(MineruEngine):
+    """通过 mineru 命令行子进程执行, 每个文档都要重新启动解释器并加载模型"""
+    name = 'cli'
+
+    def build_command(self, pdf_path, output_dir, start_page=None, end_page=None):
+        command_str = f'"{MINERU_COMMAND}" -p "{str(pdf_path)}" -o "{str(output_dir)}"'
+        if start_page is not None:
+            command_str += f' -s {start_page} -e {end_page}'
+        return command_str
+
+    def run(self, pdf_path, output_dir, start_page=None, end_page=None, on_line=None):
+        command_str = self.build_command(pdf_path, output_dir, start_page, end_page)
+        logger.info(f"Executing command: {command_str}")
+        if on_line:
+            on_line(f'命令: {command_str}')
+
+        # 使用 Popen 实现实时日志流式读取
+        process = subprocess.Popen(
+            command_str,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,  # 合并 stderr 到 stdout
+            text=True,
+            bufsize=1,  # 行缓冲
+            universal_newlines=True
+        )
+
+        try:
+            for line in process.stdout:
+                line = line.rstrip()
+                if line and on_line:
+                    on_line(line)
+
+            return_code = process.wait(timeout=MINERU_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            raise MineruError(f"MinerU 执行超时 (>{MINERU_TIMEOUT}秒)")
+
+        if return_code != 0:
+            raise MineruError(f"MinerU 执行失败, 返回码: {return_code}")
+
+
+class InProcessMineruEngine(MineruEngine):
+    """在 worker 进程内直接调用 MinerU Python API, 模型在进程内只加载一次"""
+    name = 'inprocess'
+
+    def __init__(self):
+        self._do_parse = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._do_parse is not None:
+            return
+        with self._lock:
+            if self._do_parse is not None:
+                return
+            from mineru.cli.common import do_parse
+
+            try:
+                # 预热 pipeline 模型, 后续 do_parse 直接复用进程内的单例
+                from mineru.backend.pipeline.pipeline_analyze import ModelSingleton
+                ModelSingleton().get_model(lang=MINERU_LANG, formula_enable=True, table_enable=True)
+            except Exception as e:
+                logger.warning(f"MinerU 模型预加载失败, 将在首次解析时加载: {e}")
+
+            self._do_parse = do_parse
+            logger.info("MinerU in-process 引擎已加载")
+
+    def run(self, pdf_path, output_dir, start_page=None, end_page=None, on_line=None):
+        self.load()
+        from loguru import logger as mineru_logger
+
+        # MinerU 内部使用 loguru, 临时挂一个 sink 把日志转发给调用方
+        sink_id = None
+        if on_line:
+            sink_id = mineru_logger.add(lambda message: on_line(message.record['message']), level='INFO')
+
+        try:
+            with open(pdf_path, 'rb') as f:
+                pdf_bytes = f.read()
+            self._do_parse(
+                str(output_dir),
+                [pdf_path.stem],
+                [pdf_bytes],
+                [MINERU_LANG],
+                backend='pipeline',
+                parse_method='auto',
+                start_page_id=start_page or 0,
+                end_page_id=end_page,
+            )
+        except Exception as e:
+            raise MineruError(f"MinerU 解析失败: {e}") from e
+        finally:
+            if sink_id is not None:
+                mineru_logger.remove(sink_id)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def _create_engine():
+    engine_name = settings.MINERU_ENGINE
+    if engine_name == 'cli':
+        return CliMineruEngine()
+
+    engine = InProcessMineruEngine()
+    try:
+        engine.load()
+        return engine
+    except Exception as e:
+        if engine_name == 'inprocess':
+            raise
+        logger.warning(f"MinerU in-process 引擎不可用, 回退到 CLI: {e}")
+        return CliMineruEngine()
+
+
+def get_engine():
+    """获取当前进程的 MinerU 引擎 (首次调用时创建并加载)"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = _create_engine()
+    return _engine
@@ -0,0 +1,99 @@
+"""
+MinIO / S3 兼容的 blob 存储
+需要安装 minio 包, 通过 BLOB_STORE_BACKEND=minio 启用
+本地开发可直接连接 docker 启动的 MinIO 实例
+"""
+import io
+import logging
+from django.conf import settings
+from .blob_store import BlobStore
+
+logger = logging.getLogger(__name__)
+
+
+class _ObjectStream(io.RawIOBase):
+    """包装 MinIO get_object 的响应, 关闭时释放连接"""
+
+    def __init__(self, response):
+        self._response = response
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._response.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._response.close()
+            self._response.release_conn()
+        super().close()
+
+
+class MinioBlobStore(BlobStore):
+    """对象存储后端, 对象名为 <prefix><ref[:2]>/<ref>"""
+
+    def __init__(self, client=None, bucket=None, prefix=None):
+        if client is None:
+            from minio import Minio
+            client = Minio(
+                settings.MINIO_ENDPOINT,
+                access_key=settings.MINIO_ACCESS_KEY,
+                secret_key=settings.MINIO_SECRET_KEY,
+                secure=settings.MINIO_SECURE,
+            )
+        self.client = client
+        self.bucket = bucket or settings.MINIO_BUCKET
+        self.prefix = settings.MINIO_PREFIX if prefix is None else prefix
+        self._bucket_checked = False
+
+    def _object_name(self, ref):
+        return f'{self.prefix}{ref[:2]}/{ref}'
+
+    def _ensure_bucket(self):
+        if self._bucket_checked:
+            return
+        if not self.client.bucket_exists(self.bucket):
+            self.client.make_bucket(self.bucket)
+            logger.info(f"已创建 MinIO bucket: {self.bucket}")
+        self._bucket_checked = True
+
+    def exists(self, ref):
+        from minio.error import S3Error
+        try:
+            self.client.stat_object(self.bucket, self._object_name(ref))
+            return True
+        except S3Error as e:
+            if e.code in ('NoSuchKey', 'NoSuchBucket', 'NoSuchObject'):
+                return False
+            raise
+
+    def put_bytes(self, ref, data):
+        self._ensure_bucket()
+        self.client.put_object(
+            self.bucket,
+            self._object_name(ref),
+            io.BytesIO(data),
+            length=len(data),
+            content_type='application/octet-stream',
+        )
+
+    def open(self, ref):
+        response = self.client.get_object(self.bucket, self._object_name(ref))
+        return io.BufferedReader(_ObjectStream(response))
+
+    def open_range(self, ref, start):
+        response = self.client.get_object(self.bucket, self._object_name(ref), offset=start)
+        return io.BufferedReader(_ObjectStream(response))
+
+    def size(self, ref):
+        return self.client.stat_object(self.bucket, self._object_name(ref)).size
+
+    def delete(self, ref):
+        self.client.remove_object(self.bucket, self._object_name(ref))
+
+    def iter_refs(self):
+        for obj in self.client.list_objects(self.bucket, prefix=self.prefix, recursive=True):
+            yield obj.object_name.rsplit('/', 1)[-1]
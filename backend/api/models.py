@@ -1,11 +1,17 @@
 # api/models.py
 from django.db import models
+from .blob_store import get_blob_store
 
 class OcrDocument(models.Model):
     """
     Represents a single document processing workflow.
     """
     original_pdf_path = models.CharField(max_length=1024)
+    # PDF 内容的 SHA-256, 内容相同的文档复用已有的处理结果 (见 dedup)
+    content_hash = models.CharField(max_length=64, null=True, blank=True, verbose_name="内容哈希")
+    # 复用结果的重复文档指向原文档: Label Studio 任务只由原文档推送和更新, 重复文档只读取任务映射
+    duplicate_of = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL,
+                                     related_name='duplicates', verbose_name="复用的原文档")
     mineru_json_path = models.CharField(max_length=1024, blank=True, null=True)
 
     # FIX: 添加此字段以存储来自 MinerU 的原始 OCR JSON。
@@ -15,18 +21,174 @@ class OcrDocument(models.Model):
     # NEW: 添加此字段以存储用户从 Label Studio 提交的、校对后的 JSON 数据。
     corrected_label_studio_json = models.JSONField(null=True, blank=True, verbose_name="校对后的JSON")
 
+    # 大 JSON 存放在 blob 存储中, 这里只保存内容哈希引用
+    # 上面两个 JSONField 仅保留尚未迁移的旧数据 (见 migrate_ocr_blobs 命令)
+    raw_ocr_ref = models.CharField(max_length=128, null=True, blank=True, verbose_name="原始OCR JSON引用")
+    corrected_json_ref = models.CharField(max_length=128, null=True, blank=True, verbose_name="校对JSON引用")
+
     # UPDATED: 状态选项已更新,增加了 'corrected'。
     status = models.CharField(max_length=50, default='pending')
     
     # NEW: 处理日志,用于实时显示 MinerU 处理进度
+    # 新日志写入 ProcessingLogLine, 此字段仅保留旧文档的日志
     processing_log = models.TextField(blank=True, default='', verbose_name="处理日志")
     
     # NEW: Label Studio 推送状态
     label_studio_synced = models.BooleanField(default=False, verbose_name="已推送到Label Studio")
     label_studio_task_ids = models.JSONField(null=True, blank=True, verbose_name="Label Studio任务ID列表")
     label_studio_sync_time = models.DateTimeField(null=True, blank=True, verbose_name="推送时间")
+    # 异步推送状态 (queued / running / retrying / done / failed / skipped), 由 push_document_to_label_studio 任务更新
+    # push_task_id 同时作为幂等键: 只有与之一致的 Celery 任务会执行推送, 重复投递或被新推送取代的任务直接跳过
+    label_studio_push_status = models.CharField(max_length=20, blank=True, default='', verbose_name="Label Studio推送状态")
+    label_studio_push_task_id = models.CharField(max_length=255, null=True, blank=True, verbose_name="Label Studio推送任务ID")
+    label_studio_push_error = models.TextField(blank=True, default='', verbose_name="Label Studio推送错误")
+    label_studio_pull_time = models.DateTimeField(null=True, blank=True, verbose_name="标注拉取时间")
+
+    # RAGFlow 上传状态 (queued / running / retrying / done / failed / skipped), 由 upload_document_to_ragflow 任务更新
+    # upload_task_id 与 Label Studio 推送一样作为幂等键
+    ragflow_upload_status = models.CharField(max_length=20, blank=True, default='', verbose_name="RAGFlow上传状态")
+    ragflow_upload_task_id = models.CharField(max_length=255, null=True, blank=True, verbose_name="RAGFlow上传任务ID")
+    ragflow_upload_error = models.TextField(blank=True, default='', verbose_name="RAGFlow上传错误")
+    ragflow_dataset_id = models.CharField(max_length=64, null=True, blank=True, verbose_name="RAGFlow知识库ID")
+    ragflow_document_id = models.CharField(max_length=64, null=True, blank=True, verbose_name="RAGFlow文档ID")
+    ragflow_upload_time = models.DateTimeField(null=True, blank=True, verbose_name="RAGFlow上传时间")
     
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # 文档列表按 (created_at, id) 游标分页, 并支持按状态过滤
+            models.Index(fields=['created_at', 'id'], name='api_doc_created_id_idx'),
+            models.Index(fields=['status', 'created_at'], name='api_doc_status_created_idx'),
+            models.Index(fields=['content_hash'], name='api_doc_content_hash_idx'),
+        ]
+
     def __str__(self):
         return self.original_pdf_path
+
+    def _load_blob(self, ref_field, inline_field):
+        """优先从 blob 存储读取, 没有引用时回退到行内 JSONField, 读取结果缓存在实例上"""
+        ref = getattr(self, ref_field)
+        if not ref:
+            return getattr(self, inline_field)
+        cache = self.__dict__.setdefault('_blob_cache', {})
+        if cache.get(ref_field, (None,))[0] != ref:
+            cache[ref_field] = (ref, get_blob_store().get_json(ref))
+        return cache[ref_field][1]
+
+    def _store_blob(self, ref_field, inline_field, data):
+        """写入 blob 存储并清空行内字段, 调用方需保存 ref_field 和 inline_field"""
+        ref = get_blob_store().put_json(data) if data is not None else None
+        setattr(self, ref_field, ref)
+        setattr(self, inline_field, None)
+        self.__dict__.setdefault('_blob_cache', {})[ref_field] = (ref, data)
+        return ref
+
+    def load_raw_ocr_json(self):
+        return self._load_blob('raw_ocr_ref', 'raw_ocr_json')
+
+    def store_raw_ocr_json(self, data):
+        return self._store_blob('raw_ocr_ref', 'raw_ocr_json', data)
+
+    def has_raw_ocr_json(self):
+        return bool(self.raw_ocr_ref) or self.raw_ocr_json is not None
+
+    def load_corrected_json(self):
+        return self._load_blob('corrected_json_ref', 'corrected_label_studio_json')
+
+    def store_corrected_json(self, data):
+        return self._store_blob('corrected_json_ref', 'corrected_label_studio_json', data)
+
+    def has_corrected_json(self):
+        return bool(self.corrected_json_ref) or self.corrected_label_studio_json is not None
+
+    def get_corrected_tasks(self):
+        """
+        校对结果 (Label Studio 导出的任务列表格式)
+        按页保存的结果 (OcrPage) 优先, 没有按页结果的页面来自旧版整体上传的 JSON
+        """
+        tasks = {
+            page_num: task for page_num, task in
+            self.pages.filter(corrected_annotation__isnull=False).values_list('page_num', 'corrected_annotation')
+        }
+        if self.has_corrected_json():
+            for i, task in enumerate(self.load_corrected_json() or []):
+                tasks.setdefault(task.get('data', {}).get('page_num', i + 1), task)
+        if not tasks:
+            return None
+        return [tasks[page_num] for page_num in sorted(tasks)]
+
+    def get_processing_log(self):
+        """完整处理日志: 旧版文本字段 + 追加写入的日志行"""
+        lines = ''.join(f'{log_line.line}\n' for log_line in self.log_lines.all())
+        return self.processing_log + lines
+
+
+class OcrPage(models.Model):
+    """
+    文档的单页数据: 页面图片、OCR 预标注、Label Studio 任务和校对结果
+    推送、标注同步和 RAGFlow 分块都按页读写, 单页变化只更新对应的行
+    """
+    document = models.ForeignKey(OcrDocument, on_delete=models.CASCADE, related_name='pages')
+    page_num = models.PositiveIntegerField()
+    image_path = models.CharField(max_length=1024, blank=True, default='')
+    # 推送到 Label Studio 的预标注结果和任务指纹, 指纹不变的页面不会重新推送
+    prediction = models.JSONField(null=True, blank=True)
+    fingerprint = models.CharField(max_length=64, blank=True, default='')
+    label_studio_task_id = models.BigIntegerField(null=True, blank=True)
+    # 当前保存的标注版本, 只有更新时间更晚的标注才会覆盖 (webhook 可能乱序到达)
+    annotation_id = models.BigIntegerField(null=True, blank=True)
+    annotation_updated_at = models.CharField(max_length=64, blank=True, default='')
+    # Label Studio 导出格式的单个任务: {"id", "data", "annotations": [最新标注]}
+    corrected_annotation = models.JSONField(null=True, blank=True)
+    # 从校对结果中提取的文本
+    corrected_text = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['page_num']
+        constraints = [
+            models.UniqueConstraint(fields=['document', 'page_num'], name='api_page_doc_page_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.document_id}#{self.page_num}"
+
+
+class RagflowChunk(models.Model):
+    """
+    已上传到 RAGFlow 的分块
+    chunk_key 由文档 / 页码 / 页内序号 / 内容计算 (见 ragflow_sync.chunk_key), 内容不变的分块不会重复上传,
+    上传中断后重试时跳过已记录的分块
+    """
+    document = models.ForeignKey(OcrDocument, on_delete=models.CASCADE, related_name='ragflow_chunks')
+    chunk_key = models.CharField(max_length=64)
+    chunk_id = models.CharField(max_length=64)
+    page_num = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['document', 'chunk_key'], name='api_ragflow_chunk_doc_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.document_id}#{self.page_num}:{self.chunk_id}"
+
+
+class ProcessingLogLine(models.Model):
+    """
+    处理日志行 (只追加)
+    替代反复重写 processing_log 整个文本字段, 每次写入只插入新增的行
+    """
+    document = models.ForeignKey(OcrDocument, on_delete=models.CASCADE, related_name='log_lines')
+    line = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['document', 'id'], name='api_logline_doc_id_idx'),
+        ]
+
+    def __str__(self):
+        return self.line
@@ -0,0 +1,83 @@
+"""
+PDF 页面图片生成
+按批次调用 poppler 直接把页面写入磁盘, 不在内存中保留 PIL 图片, 峰值内存与页数无关
+"""
+import os
+import tempfile
+import logging
+from pathlib import Path
+from django.conf import settings
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+logger = logging.getLogger(__name__)
+
+POPPLER_PATH = os.getenv('POPPLER_PATH', None)
+RASTER_THREAD_COUNT = 4
+
+
+class RasterizeCancelled(RuntimeError):
+    """转换被调用方取消 (见 rasterize_pdf 的 cancel_event)"""
+
+
+def page_image_filename(page_num):
+    """页面图片文件名, page_num 从 1 开始"""
+    return f"page-{str(page_num).zfill(4)}.jpg"
+
+
+def get_pdf_page_count(pdf_path):
+    """读取 PDF 页数"""
+    return int(pdfinfo_from_path(str(pdf_path), poppler_path=POPPLER_PATH).get('Pages', 0))
+
+
+def rasterize_pdf(pdf_path, pages_dir, page_count=None, dpi=None, quality=None, batch_size=None, on_progress=None,
+                  cancel_event=None):
+    """
+    将 PDF 逐批转换为 pages_dir/page-NNNN.jpg
+
+    Args:
+        page_count (int): 总页数, 为空时通过 pdfinfo 读取
+        dpi / quality / batch_size: 为空时使用 settings 中的 PAGE_IMAGE_* 配置
+        on_progress (callable): 每批完成后回调 on_progress(done_pages, page_count)
+        cancel_event (threading.Event): 每批开始前检查, 被设置时停止转换
+
+    Returns:
+        int: 已转换的页数
+
+    Raises:
+        RasterizeCancelled: cancel_event 被设置
+    """
+    dpi = dpi or settings.PAGE_IMAGE_DPI
+    quality = quality or settings.PAGE_IMAGE_QUALITY
+    batch_size = batch_size or settings.PAGE_RASTER_BATCH_SIZE
+    if page_count is None:
+        page_count = get_pdf_page_count(pdf_path)
+
+    pages_dir = Path(pages_dir)
+    os.makedirs(pages_dir, exist_ok=True)
+
+    # 临时目录建在 pages_dir 下, 保证 os.replace 在同一文件系统内完成
+    with tempfile.TemporaryDirectory(dir=pages_dir) as tmp_dir:
+        for first_page in range(1, page_count + 1, batch_size):
+            if cancel_event is not None and cancel_event.is_set():
+                raise RasterizeCancelled(f"已取消 {pdf_path} 的页面图片转换 (完成 {first_page - 1}/{page_count} 页)")
+            last_page = min(first_page + batch_size - 1, page_count)
+            paths = convert_from_path(
+                pdf_path,
+                dpi=dpi,
+                first_page=first_page,
+                last_page=last_page,
+                fmt='jpeg',
+                jpegopt={'quality': quality},
+                output_folder=tmp_dir,
+                paths_only=True,
+                thread_count=min(RASTER_THREAD_COUNT, last_page - first_page + 1),
+                poppler_path=POPPLER_PATH,
+            )
+            for offset, path in enumerate(paths):
+                os.replace(path, pages_dir / page_image_filename(first_page + offset))
+
+            logger.info(f"Rasterized pages {first_page}-{last_page}/{page_count} of {pdf_path}")
+            if on_progress:
+                on_progress(last_page, page_count)
+
+    return page_count
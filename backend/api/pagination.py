@@ -0,0 +1,15 @@
+"""
+分页配置
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class DocumentCursorPagination(CursorPagination):
+    """
+    文档列表游标分页
+    按 (created_at, id) 倒序, 翻页代价与偏移量无关, 新文档插入时也不会出现重复或遗漏
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
@@ -0,0 +1,16 @@
+"""
+自定义 DRF 解析器
+"""
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from . import json_codec
+
+
+class FastJSONParser(JSONParser):
+    """基于 json_codec 的 JSON 解析器, 用于接收 Label Studio 导出的大体积校对数据"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return json_codec.loads(stream.read())
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
@@ -0,0 +1,111 @@
+"""
+派生文件缓存
+RAGFlow payload 等由校对结果生成的文件按输入指纹 (校对版本 + 生成参数的哈希) 缓存在本地磁盘,
+指纹不变时直接返回缓存文件; 缓存总大小超过上限时按最近访问时间淘汰 (LRU)
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import logging
+from pathlib import Path
+from django.conf import settings
+from . import json_codec
+
+logger = logging.getLogger(__name__)
+
+# 淘汰时删除到上限的这个比例以下, 避免每次写入都触发淘汰
+EVICT_TARGET_RATIO = 0.9
+
+
+def cache_key(*parts):
+    """由生成参数计算缓存键 (sha256), parts 需可 JSON 序列化"""
+    return hashlib.sha256(json_codec.dumps(list(parts))).hexdigest()
+
+
+class PayloadCache:
+    """本地磁盘缓存, 路径为 <root>/<key[:2]>/<key><suffix>, 文件的 mtime 记录最近访问时间"""
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = Path(root or settings.PAYLOAD_CACHE_ROOT)
+        self.max_bytes = settings.PAYLOAD_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self._evict_lock = threading.Lock()
+
+    def _path(self, key, suffix):
+        return self.root / key[:2] / f'{key}{suffix}'
+
+    def get(self, key, suffix=''):
+        """命中时返回缓存文件路径并刷新访问时间, 否则返回 None"""
+        path = self._path(key, suffix)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def iter_and_store(self, key, chunks, suffix=''):
+        """
+        边输出边写入缓存: 完整输出后原子替换为缓存文件,
+        中途出错或客户端断开时丢弃临时文件
+        """
+        path = self._path(key, suffix)
+        os.makedirs(path.parent, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        completed = False
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            os.replace(tmp_path, path)
+            completed = True
+        finally:
+            if not completed and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.evict()
+
+    def evict(self):
+        """总大小超过上限时, 从最久未访问的文件开始删除"""
+        if not self.max_bytes or not self.root.exists():
+            return 0
+        with self._evict_lock:
+            entries, total = [], 0
+            for path in self.root.glob('*/*'):
+                if path.name.endswith('.tmp'):
+                    continue
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+            if total <= self.max_bytes:
+                return 0
+
+            removed = 0
+            target = self.max_bytes * EVICT_TARGET_RATIO
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            logger.info(f"派生文件缓存淘汰了 {removed} 个文件, 当前约 {total // (1024 * 1024)} MB")
+            return removed
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_payload_cache():
+    """获取进程内共享的派生文件缓存"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PayloadCache()
+    return _cache
@@ -0,0 +1,97 @@
+"""
+处理日志读写
+日志按行追加到 ProcessingLogLine 表, 写入端按行数/时间批量落库, 读取端支持按行 ID 增量读取
+每次落库后通过 Redis 发布 log 事件, 供 SSE 端点实时推送
+"""
+import time
+import threading
+import logging
+from .models import OcrDocument, ProcessingLogLine
+from .events import publish_event
+
+logger = logging.getLogger(__name__)
+
+FLUSH_MAX_LINES = 50
+FLUSH_INTERVAL = 1.5
+
+
+def _split_lines(text):
+    """拆分为行, 忽略末尾换行"""
+    if text.endswith('\n'):
+        text = text[:-1]
+    return text.split('\n')
+
+
+class ProcessingLogWriter:
+    """
+    带缓冲的日志写入器
+    缓冲满 max_lines 行或距上次落库超过 interval 秒时, 用一次 bulk_create 写入
+    """
+
+    def __init__(self, doc_id, max_lines=FLUSH_MAX_LINES, interval=FLUSH_INTERVAL):
+        self.doc_id = doc_id
+        self.max_lines = max_lines
+        self.interval = interval
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def write(self, text):
+        with self._lock:
+            self._buffer.extend(_split_lines(text))
+            if len(self._buffer) >= self.max_lines or time.monotonic() - self._last_flush >= self.interval:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        lines, self._buffer = self._buffer, []
+        created = ProcessingLogLine.objects.bulk_create(
+            [ProcessingLogLine(document_id=self.doc_id, line=line) for line in lines]
+        )
+        publish_event(self.doc_id, 'log', {'lines': [{'id': obj.id, 'line': obj.line} for obj in created]})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+
+def append_log(doc_id, text):
+    """立即追加日志 (用于状态变化等少量关键信息)"""
+    with ProcessingLogWriter(doc_id) as writer:
+        writer.write(text)
+
+
+def reset_log(doc_id, text=''):
+    """清空文档的处理日志, 可选写入第一条"""
+    ProcessingLogLine.objects.filter(document_id=doc_id).delete()
+    OcrDocument.objects.filter(id=doc_id).update(processing_log='')
+    if text:
+        append_log(doc_id, text)
+
+
+def read_log_lines(doc_id, after_id=None, limit=None):
+    """
+    增量读取日志行
+
+    Args:
+        after_id (int): 只返回 ID 大于该值的行
+        limit (int): 最多返回的行数
+
+    Returns:
+        list: [{"id": 1, "line": "..."}, ...]
+    """
+    queryset = ProcessingLogLine.objects.filter(document_id=doc_id)
+    if after_id:
+        queryset = queryset.filter(id__gt=after_id)
+    queryset = queryset.order_by('id').values('id', 'line')
+    if limit:
+        queryset = queryset[:limit]
+    return list(queryset)
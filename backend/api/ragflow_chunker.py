@@ -0,0 +1,236 @@
+"""
+RAGFlow 分块
+按页读取校对结果, 将区域按标签分组 (标题 / 段落 / 列表 / 表格) 生成有长度上限和重叠的分块,
+逐页产出, 下载接口以 JSON 或 NDJSON 流式输出, 不在内存中拼接整个文档
+
+分块规则 (只在页内分块, 单页校对结果变化时只需重新生成该页的分块):
+- 标题开始一个新分块, 并作为之后同一小节各分块的首行
+- 表格单独成块
+- 段落 / 列表等正文依次累积, 超过 max_tokens 时切分, 新分块带上前一块末尾约 overlap_tokens 的内容
+- 页眉 / 页脚不参与分块
+"""
+import re
+from django.conf import settings
+from . import json_codec
+
+# 分块规则变化时递增, 使已缓存的 payload 失效
+CHUNKER_VERSION = 1
+
+# 不参与分块的区域标签
+SKIPPED_LABELS = frozenset({'Header', 'Footer'})
+TITLE_LABELS = frozenset({'Title'})
+TABLE_LABELS = frozenset({'Table'})
+# 只有识别文本、没有矩形标签的区域 (旧版导出) 按正文处理
+DEFAULT_LABEL = 'Text'
+
+# 近似 token 计数: 每个汉字、每个连续的字母数字串、每个其他符号各算一个 token
+_TOKEN_RE = re.compile(r'[\u3400-\u9fff\uf900-\ufaff]|[A-Za-z0-9]+|[^\sA-Za-z0-9\u3400-\u9fff\uf900-\ufaff]')
+_SENTENCE_RE = re.compile(r'[^。！？!?；;\n]*[。！？!?；;\n]+|[^。！？!?；;\n]+')
+
+
+def estimate_tokens(text):
+    return len(_TOKEN_RE.findall(text))
+
+
+def chunk_params(max_tokens=None, overlap_tokens=None):
+    """分块参数, 未指定时使用配置; 也用于缓存键"""
+    max_tokens = max_tokens or settings.RAGFLOW_CHUNK_MAX_TOKENS
+    overlap_tokens = settings.RAGFLOW_CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    return {'max_tokens': max_tokens, 'overlap_tokens': min(overlap_tokens, max_tokens // 2)}
+
+
+def annotation_regions(result):
+    """
+    按原有顺序列出标注中的区域
+
+    Returns:
+        list: [(标签, 文本)], 没有文本的区域不包含在内
+    """
+    labels, texts, order = {}, {}, []
+    for item in result or ():
+        region_id = item.get('id')
+        if region_id not in labels and region_id not in texts:
+            order.append(region_id)
+        value = item.get('value', {})
+        if item.get('type') == 'rectanglelabels':
+            region_labels = value.get('rectanglelabels') or ()
+            if region_labels:
+                labels[region_id] = region_labels[0]
+        elif item.get('type') == 'textarea':
+            text_list = value.get('text', [])
+            if text_list:
+                texts[region_id] = text_list[0]
+    return [(labels.get(region_id, DEFAULT_LABEL), texts[region_id])
+            for region_id in order if texts.get(region_id, '').strip()]
+
+
+def _split_text(text, max_tokens):
+    """超过上限的单个区域按句子切分, 单句仍超长时按 token 硬切; 由调用方把句子重新组合为分块"""
+    pieces = []
+    for sentence in _SENTENCE_RE.findall(text):
+        if estimate_tokens(sentence) <= max_tokens:
+            pieces.append(sentence)
+            continue
+        matches = list(_TOKEN_RE.finditer(sentence))
+        for start in range(0, len(matches), max_tokens):
+            window = matches[start:start + max_tokens]
+            pieces.append(sentence[window[0].start():window[-1].end()])
+    return [piece.strip() for piece in pieces if piece.strip()]
+
+
+class _PageChunker:
+    """单页的分块状态"""
+
+    def __init__(self, page_num, max_tokens, overlap_tokens):
+        self.page_num = page_num
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.heading = []  # [(文本, token 数)]
+        self.heading_used = False
+        self.body = []  # [(标签, 文本, token 数, 是否与上一项属于同一区域)]
+        self.chunks = []
+
+    def _emit(self, units):
+        parts = [text for text, _ in self.heading]
+        for index, (_, text, _, continued) in enumerate(units):
+            # 同一区域切分出的句子直接拼接, 不同区域之间换行
+            if continued and index:
+                parts[-1] += text
+            else:
+                parts.append(text)
+        self.chunks.append({
+            'content_ltxt': '\n'.join(parts),
+            'page_num': self.page_num,
+            'labels': sorted({unit[0] for unit in units} or TITLE_LABELS),
+        })
+        self.heading_used = True
+
+    def _body_tokens(self):
+        return sum(unit[2] for unit in self.body)
+
+    def flush(self, keep_overlap=False):
+        """输出当前正文; keep_overlap 时保留末尾不超过 overlap_tokens 的内容作为下一块的开头"""
+        if self.body:
+            self._emit(self.body)
+        tail = []
+        if keep_overlap and self.overlap_tokens:
+            tokens = 0
+            for unit in reversed(self.body):
+                if tokens + unit[2] > self.overlap_tokens:
+                    break
+                tail.insert(0, unit)
+                tokens += unit[2]
+        self.body = tail
+
+    def close_section(self):
+        """结束当前小节, 没有任何正文的标题单独成块"""
+        self.flush()
+        if self.heading and not self.heading_used:
+            self._emit([])
+        self.heading, self.heading_used = [], False
+
+    def add(self, label, text):
+        if label in SKIPPED_LABELS:
+            return
+        if label in TITLE_LABELS:
+            # 连续的多个标题合并为同一小节的标题
+            if self.body or self.heading_used:
+                self.close_section()
+            self.heading.append((text, estimate_tokens(text)))
+            return
+
+        budget = max(self.max_tokens - sum(tokens for _, tokens in self.heading), 1)
+        pieces = [text] if estimate_tokens(text) <= budget else _split_text(text, budget)
+        if label in TABLE_LABELS:
+            self.flush()
+            for piece in pieces:
+                self._emit([(label, piece, 0, False)])
+            return
+        for index, piece in enumerate(pieces):
+            tokens = estimate_tokens(piece)
+            if self.body and self._body_tokens() + tokens > budget:
+                self.flush(keep_overlap=True)
+                # 重叠内容加上新片段仍然超长时放弃重叠
+                if self._body_tokens() + tokens > budget:
+                    self.body = []
+            self.body.append((label, piece, tokens, index > 0))
+
+    def finish(self):
+        self.close_section()
+        return self.chunks
+
+
+def chunk_page(page_num, result, max_tokens=None, overlap_tokens=None):
+    """
+    生成一页的分块
+
+    Args:
+        page_num (int): 页码
+        result (list): 该页标注的 result 列表
+
+    Returns:
+        list: [{"content_ltxt", "page_num", "labels"}]
+    """
+    params = chunk_params(max_tokens, overlap_tokens)
+    chunker = _PageChunker(page_num, params['max_tokens'], params['overlap_tokens'])
+    for label, text in annotation_regions(result):
+        chunker.add(label, text.strip())
+    return chunker.finish()
+
+
+def _task_result(task):
+    # Label Studio 导出的数据可能使用 'annotations' 或 'completions'
+    annotations = task.get('annotations') or task.get('completions')
+    return annotations[0].get('result', []) if annotations else None
+
+
+def iter_task_chunks(tasks, **params):
+    """按任务列表 (Label Studio 导出格式) 的页码顺序逐页产出分块"""
+    pages = []
+    for i, task in enumerate(tasks):
+        result = _task_result(task)
+        if result is not None:
+            pages.append((task.get('data', {}).get('page_num', i + 1), result))
+    pages.sort(key=lambda page: page[0])
+    for page_num, result in pages:
+        yield from chunk_page(page_num, result, **params)
+
+
+def iter_document_chunks(doc, **params):
+    """
+    按页码顺序逐页产出文档的分块
+    按页保存的校对结果 (OcrPage) 分批从数据库读取; 没有按页结果的页面来自旧版整体上传的 JSON
+    """
+    legacy = {}
+    if doc.has_corrected_json():
+        for i, task in enumerate(doc.load_corrected_json() or []):
+            result = _task_result(task)
+            if result is not None:
+                legacy.setdefault(task.get('data', {}).get('page_num', i + 1), result)
+
+    rows = doc.pages.filter(corrected_annotation__isnull=False).order_by('page_num').values_list(
+        'page_num', 'corrected_annotation'
+    ).iterator(chunk_size=100)
+    for page_num, task in rows:
+        # 页码在前的旧版结果先输出, 保持整体页码顺序
+        for legacy_page in sorted(page for page in legacy if page < page_num):
+            yield from chunk_page(legacy_page, legacy.pop(legacy_page), **params)
+        legacy.pop(page_num, None)
+        yield from chunk_page(page_num, _task_result(task) or [], **params)
+    for legacy_page in sorted(legacy):
+        yield from chunk_page(legacy_page, legacy[legacy_page], **params)
+
+
+def iter_payload_json(header, chunks):
+    """以 {"doc_id", "kb_name", "chunks": [...]} 格式流式编码, 逐个分块输出"""
+    yield json_codec.dumps(header)[:-1] + b',"chunks":['
+    for index, chunk in enumerate(chunks):
+        yield (b',' if index else b'') + json_codec.dumps(chunk)
+    yield b']}'
+
+
+def iter_payload_ndjson(header, chunks):
+    """NDJSON: 首行为文档信息, 之后每行一个分块"""
+    yield json_codec.dumps(header) + b'\n'
+    for chunk in chunks:
+        yield json_codec.dumps(chunk) + b'\n'
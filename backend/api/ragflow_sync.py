@@ -0,0 +1,192 @@
+"""
+RAGFlow 增量上传
+每个分块的 chunk_key 由文档 / 页码 / 页内序号 / 内容计算, 与已上传记录 (RagflowChunk) 比较,
+只上传新的分块、删除已不存在的分块; 新分块按批并发上传, 每批完成后写入记录, 任务重试时从中断处继续
+每个 OcrDocument 对应 RAGFlow 中独立的文档 (名称带文档 ID 前缀), 删除分块只作用于属于本文档的 RAGFlow 文档
+"""
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import requests
+from django.conf import settings
+from django.utils import timezone
+from .models import OcrDocument, RagflowChunk
+from .ragflow_chunker import iter_document_chunks
+from .ragflow_utils import RagflowError
+
+logger = logging.getLogger(__name__)
+
+
+def chunk_key(doc_id, page_num, index, content):
+    """分块的幂等键, 内容或位置不变时保持不变"""
+    digest = hashlib.sha256(f"{doc_id}:{page_num}:{index}:".encode('utf-8'))
+    digest.update(content.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def iter_keyed_chunks(doc, **params):
+    """按页码顺序产出 (chunk_key, 分块), 页内序号从 0 开始"""
+    page_num, index = None, 0
+    for chunk in iter_document_chunks(doc, **params):
+        if chunk['page_num'] != page_num:
+            page_num, index = chunk['page_num'], 0
+        yield chunk_key(doc.id, page_num, index, chunk['content_ltxt']), chunk
+        index += 1
+
+
+def ragflow_document_name(doc):
+    """RAGFlow 中的文档名: 带文档 ID 前缀, 同名的 PDF (不同目录 / 重复上传 / 内容重复) 各自对应独立的文档"""
+    return f"{doc.id}_{Path(doc.original_pdf_path).name}"
+
+
+def _owned_document_id(doc, client, dataset_id):
+    """
+    上次绑定的 RAGFlow 文档仍然存在且只属于本文档时返回其 ID
+    旧版本按文件名绑定, 同名的 PDF 可能共用一个 RAGFlow 文档, 这种绑定不再沿用
+    """
+    document_id = doc.ragflow_document_id
+    if doc.ragflow_dataset_id != dataset_id or not document_id:
+        return None
+    shared = OcrDocument.objects.filter(
+        ragflow_dataset_id=dataset_id, ragflow_document_id=document_id
+    ).exclude(id=doc.id).exists()
+    if shared:
+        logger.warning(f"文档 {doc.id} 绑定的 RAGFlow 文档 {document_id} 被其他文档共用, 改为创建独立的文档")
+        return None
+    if client.get_document(dataset_id, document_id) is None:
+        return None
+    return document_id
+
+
+def _bind_document(doc, client, kb_name):
+    """
+    找到 (或创建) 分块所属的知识库和本文档专属的 RAGFlow 文档
+
+    Returns:
+        tuple: (dataset_id, document_id, 是否沿用上次的上传记录, 文档是否已存在于 RAGFlow)
+    """
+    dataset_id = client.ensure_dataset(kb_name)
+    document_id = _owned_document_id(doc, client, dataset_id)
+    if document_id:
+        return dataset_id, document_id, True, True
+
+    # 按带文档 ID 的名称查找: 上次上传在记录文档 ID 之前中断时, RAGFlow 中已有该文档
+    name = ragflow_document_name(doc)
+    document = client.find_document(dataset_id, name)
+    document_id = document['id'] if document else client.upload_document(dataset_id, doc.original_pdf_path, name=name)
+
+    # 首次上传、切换知识库、RAGFlow 中的文档被删除或原绑定被共用: 之前的上传记录不再适用
+    doc.ragflow_chunks.all().delete()
+    doc.ragflow_dataset_id, doc.ragflow_document_id = dataset_id, document_id
+    doc.save(update_fields=['ragflow_dataset_id', 'ragflow_document_id'])
+    return dataset_id, document_id, False, document is not None
+
+
+def _reconcile(doc, client, dataset_id, document_id, uploaded, pending):
+    """
+    核对 RAGFlow 中文档的实际分块: 上次上传中断时请求可能已创建分块但没有记录 ID,
+    按内容与待上传的分块匹配后补写记录; 既没有记录也无法匹配的分块删除
+    (只对 _bind_document 确认属于本文档的 RAGFlow 文档调用)
+
+    Returns:
+        tuple: (剩余待上传的分块, 补写的记录数)
+    """
+    known = set(uploaded.values())
+    by_content = {}
+    for key, chunk in pending:
+        by_content.setdefault(chunk['content_ltxt'], []).append((key, chunk))
+
+    rows, orphans = [], []
+    for remote_chunks in client.iter_chunks(dataset_id, document_id):
+        for remote in remote_chunks:
+            if remote['id'] in known:
+                continue
+            matches = by_content.get(remote.get('content'))
+            if matches:
+                key, chunk = matches.pop(0)
+                rows.append(RagflowChunk(document=doc, chunk_key=key, chunk_id=remote['id'], page_num=chunk['page_num']))
+                uploaded[key] = remote['id']
+            else:
+                orphans.append(remote['id'])
+    RagflowChunk.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+    if orphans:
+        client.delete_chunks(dataset_id, document_id, orphans)
+        logger.info(f"文档 {doc.id} 删除了 {len(orphans)} 个 RAGFlow 中没有记录的分块")
+    return [(key, chunk) for key, chunk in pending if key not in uploaded], len(rows)
+
+
+def upload_document_chunks(doc, client, kb_name, reconcile=False):
+    """
+    将文档的校对分块增量上传到 RAGFlow
+
+    Args:
+        doc (OcrDocument): 有校对结果的文档
+        client (RagflowClient): 已配置的客户端
+        kb_name (str): 知识库名称, 不存在时创建
+        reconcile (bool): 先核对 RAGFlow 中的实际分块 (上次上传中断后重试时使用)
+
+    Returns:
+        dict: {"chunk_count", "added", "unchanged", "deleted", "recovered"}
+
+    Raises:
+        requests.exceptions.RequestException / RagflowError: 请求失败, 已上传的分块已记录
+    """
+    dataset_id, document_id, same_binding, existed = _bind_document(doc, client, kb_name)
+
+    uploaded = dict(doc.ragflow_chunks.values_list('chunk_key', 'chunk_id'))
+    wanted, pending = set(), []
+    for key, chunk in iter_keyed_chunks(doc):
+        wanted.add(key)
+        if key not in uploaded:
+            pending.append((key, chunk))
+
+    recovered = 0
+    if pending and (reconcile or existed and not same_binding):
+        pending, recovered = _reconcile(doc, client, dataset_id, document_id, uploaded, pending)
+
+    def upload(item):
+        key, chunk = item
+        return key, chunk, client.add_chunk(dataset_id, document_id, chunk['content_ltxt'])
+
+    added = 0
+    batch_size = settings.RAGFLOW_UPLOAD_BATCH_SIZE
+    if pending:
+        workers = min(settings.RAGFLOW_UPLOAD_CONCURRENCY, len(pending))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for start in range(0, len(pending), batch_size):
+                futures = [executor.submit(upload, item) for item in pending[start:start + batch_size]]
+                rows, errors = [], []
+                for future in futures:
+                    try:
+                        key, chunk, chunk_id = future.result()
+                    except (requests.exceptions.RequestException, RagflowError) as e:
+                        errors.append(e)
+                        continue
+                    rows.append(RagflowChunk(document=doc, chunk_key=key, chunk_id=chunk_id, page_num=chunk['page_num']))
+                # 先记录本批成功的分块, 再抛出错误, 重试时不会重复上传
+                RagflowChunk.objects.bulk_create(rows, batch_size=500)
+                added += len(rows)
+                if errors:
+                    logger.error(f"文档 {doc.id} 有 {len(errors)} 个分块上传到 RAGFlow 失败: {errors[0]}")
+                    raise errors[0]
+
+    # 新分块上传完成后再删除旧分块, 检索结果不会出现缺失内容的窗口
+    stale = {key: chunk_id for key, chunk_id in uploaded.items() if key not in wanted}
+    if stale:
+        client.delete_chunks(dataset_id, document_id, stale.values())
+        RagflowChunk.objects.filter(document=doc, chunk_key__in=list(stale)).delete()
+
+    doc.ragflow_upload_time = timezone.now()
+    doc.status = 'ingested'
+    doc.save(update_fields=['ragflow_upload_time', 'status'])
+
+    summary = {
+        'chunk_count': len(wanted),
+        'added': added,
+        'unchanged': len(wanted) - added - recovered,
+        'deleted': len(stale),
+        'recovered': recovered,
+    }
+    logger.info(f"文档 {doc.id} 已上传到 RAGFlow 知识库 {kb_name}: {summary}")
+    return summary
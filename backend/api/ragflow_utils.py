@@ -0,0 +1,191 @@
+"""
+RAGFlow 集成工具
+通过 RAGFlow HTTP API (/api/v1) 查找或创建知识库和文档, 并向文档添加 / 删除分块
+"""
+import time
+import random
+import logging
+from pathlib import Path
+import requests
+from django.conf import settings
+from . import json_codec
+from .http_utils import get_session
+
+logger = logging.getLogger(__name__)
+
+# 普通请求和上传原始文件的超时时间 (秒)
+RAGFLOW_REQUEST_TIMEOUT = 30
+RAGFLOW_UPLOAD_TIMEOUT = 300
+# 添加分块的接口不是幂等的, 只在服务端明确未处理请求 (限流 / 服务不可用 / 连接超时) 时重试,
+# 超时等结果不确定的错误交给上层任务重试, 重试前按内容核对已创建的分块 (见 ragflow_sync)
+ADD_CHUNK_RETRY_STATUS = (429, 503)
+ADD_CHUNK_RETRIES = 3
+ADD_CHUNK_BACKOFF_BASE = 1.0
+ADD_CHUNK_BACKOFF_MAX = 30.0
+# 列出文档分块时的分页大小
+CHUNK_LIST_PAGE_SIZE = 1024
+# 单个删除请求包含的分块 ID 数
+CHUNK_DELETE_BATCH = 500
+
+
+class RagflowError(RuntimeError):
+    """RAGFlow 返回了错误码 (响应中 code 不为 0)"""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+class RagflowClient:
+    """RAGFlow API 客户端"""
+
+    def __init__(self):
+        self.base_url = settings.RAGFLOW_URL
+        self.api_key = settings.RAGFLOW_API_KEY
+        # 进程内共享连接池, 多个客户端实例和上传线程复用 keep-alive 连接
+        self.session = get_session(
+            'ragflow',
+            pool_size=settings.RAGFLOW_HTTP_POOL_SIZE,
+            retries=settings.RAGFLOW_HTTP_RETRIES,
+        )
+
+    def is_configured(self):
+        """检查是否配置了 RAGFlow"""
+        return bool(self.api_key and self.base_url)
+
+    def _get_headers(self):
+        return {'Authorization': f'Bearer {self.api_key}'}
+
+    def _request(self, method, path, timeout=RAGFLOW_REQUEST_TIMEOUT, **kwargs):
+        """
+        发送请求并返回响应中的 data
+
+        Raises:
+            requests.exceptions.RequestException: 网络错误或 HTTP 错误状态
+            RagflowError: 响应中的 code 不为 0
+        """
+        response = self.session.request(
+            method, f"{self.base_url}/api/v1{path}", headers=self._get_headers(), timeout=timeout, **kwargs
+        )
+        response.raise_for_status()
+        result = json_codec.loads(response.content)
+        if result.get('code', 0) != 0:
+            raise RagflowError(result.get('message') or f"RAGFlow 错误码 {result.get('code')}", code=result.get('code'))
+        return result.get('data')
+
+    def find_dataset(self, name):
+        """按名称查找知识库, 不存在时返回 None"""
+        try:
+            datasets = self._request('GET', '/datasets', params={'name': name, 'page': 1, 'page_size': 30})
+        except RagflowError:
+            # 名称不存在时 RAGFlow 返回错误码而不是空列表
+            return None
+        for dataset in datasets or ():
+            if dataset.get('name') == name:
+                return dataset
+        return None
+
+    def ensure_dataset(self, name):
+        """
+        查找知识库, 不存在时创建
+
+        Returns:
+            str: 知识库 ID
+        """
+        dataset = self.find_dataset(name)
+        if dataset is None:
+            dataset = self._request('POST', '/datasets', json={'name': name})
+            logger.info(f"已创建 RAGFlow 知识库 {name} ({dataset['id']})")
+        return dataset['id']
+
+    def find_document(self, dataset_id, name):
+        """按文件名查找知识库中的文档, 不存在时返回 None"""
+        try:
+            data = self._request('GET', f'/datasets/{dataset_id}/documents',
+                                 params={'name': name, 'page': 1, 'page_size': 30})
+        except RagflowError:
+            return None
+        for document in (data or {}).get('docs', ()):
+            if document.get('name') == name:
+                return document
+        return None
+
+    def get_document(self, dataset_id, document_id):
+        """按 ID 查找知识库中的文档, 不存在 (已被删除) 时返回 None"""
+        try:
+            data = self._request('GET', f'/datasets/{dataset_id}/documents',
+                                 params={'id': document_id, 'page': 1, 'page_size': 1})
+        except RagflowError:
+            return None
+        for document in (data or {}).get('docs', ()):
+            if document.get('id') == document_id:
+                return document
+        return None
+
+    def upload_document(self, dataset_id, file_path, name=None):
+        """
+        上传原始文件作为分块所属的文档 (只上传, 不触发 RAGFlow 自身的解析)
+
+        Returns:
+            str: 文档 ID
+        """
+        name = name or Path(file_path).name
+        with open(file_path, 'rb') as file_obj:
+            documents = self._request('POST', f'/datasets/{dataset_id}/documents',
+                                      files={'file': (name, file_obj)}, timeout=RAGFLOW_UPLOAD_TIMEOUT)
+        return documents[0]['id']
+
+    def add_chunk(self, dataset_id, document_id, content, important_keywords=None):
+        """
+        向文档添加一个分块, 限流 / 服务不可用 / 连接超时时按指数退避重试
+
+        Returns:
+            str: RAGFlow 分配的分块 ID
+        """
+        body = {'content': content}
+        if important_keywords:
+            body['important_keywords'] = list(important_keywords)
+        path = f'/datasets/{dataset_id}/documents/{document_id}/chunks'
+        for attempt in range(ADD_CHUNK_RETRIES + 1):
+            try:
+                data = self._request('POST', path, json=body)
+                return data['chunk']['id']
+            except (requests.exceptions.HTTPError, requests.exceptions.ConnectTimeout) as e:
+                status_code = e.response.status_code if getattr(e, 'response', None) is not None else None
+                retriable = status_code in ADD_CHUNK_RETRY_STATUS or isinstance(e, requests.exceptions.ConnectTimeout)
+                if not retriable or attempt >= ADD_CHUNK_RETRIES:
+                    raise
+                delay = min(ADD_CHUNK_BACKOFF_MAX, ADD_CHUNK_BACKOFF_BASE * (2 ** attempt)) * random.uniform(0.5, 1.0)
+                logger.warning(f"添加 RAGFlow 分块失败 ({e}), {delay:.1f}s 后第 {attempt + 1} 次重试")
+                time.sleep(delay)
+
+    def iter_chunks(self, dataset_id, document_id, page_size=CHUNK_LIST_PAGE_SIZE):
+        """分页列出文档的分块, 每次产出一页"""
+        path = f'/datasets/{dataset_id}/documents/{document_id}/chunks'
+        page, seen = 1, 0
+        while True:
+            data = self._request('GET', path, params={'page': page, 'page_size': page_size}) or {}
+            chunks = data.get('chunks', [])
+            if chunks:
+                yield chunks
+            seen += len(chunks)
+            if len(chunks) < page_size or seen >= data.get('total', 0):
+                return
+            page += 1
+
+    def delete_chunks(self, dataset_id, document_id, chunk_ids):
+        """按 ID 批量删除文档中的分块"""
+        chunk_ids = list(chunk_ids)
+        path = f'/datasets/{dataset_id}/documents/{document_id}/chunks'
+        for start in range(0, len(chunk_ids), CHUNK_DELETE_BATCH):
+            self._request('DELETE', path, json={'chunk_ids': chunk_ids[start:start + CHUNK_DELETE_BATCH]})
+
+    def test_connection(self):
+        """测试连接"""
+        if not self.is_configured():
+            return False, "RAGFlow 未配置"
+        try:
+            self._request('GET', '/datasets', params={'page': 1, 'page_size': 1})
+            return True, "连接成功"
+        except (requests.exceptions.RequestException, RagflowError) as e:
+            return False, f"连接失败: {e}"
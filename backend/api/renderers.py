@@ -0,0 +1,40 @@
+"""
+自定义 DRF 渲染器
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from . import json_codec
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    基于 json_codec 的 JSON 渲染器 (有 orjson 时使用 orjson)
+    行为与 DRF 的 JSONRenderer 一致: 中文不转义, 支持 Accept 中的 indent 参数,
+    orjson 无法处理的类型 (Decimal, 懒翻译字符串等) 交给 DRF 的 JSONEncoder 转换
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        ret = json_codec.dumps(data, indent=bool(indent), default=self.encoder_class().default)
+        # 与 JSONRenderer 相同, 转义 U+2028 / U+2029, 使输出可以安全嵌入 <script>
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    text/event-stream 渲染器
+    使 EventSource 请求 (Accept: text/event-stream) 能通过 DRF 的内容协商,
+    流式响应本身由视图返回 StreamingHttpResponse
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        return b'event: error\ndata: ' + json_codec.dumps(data) + b'\n\n'
@@ -7,12 +7,21 @@ class OcrDocumentSerializer(serializers.ModelSerializer):
     Serializes the OcrDocument model to and from JSON format.
     Includes the new fields for raw and corrected JSON data.
     """
+    # OCR / 校对 JSON 从 blob 存储按需读取
+    raw_ocr_json = serializers.JSONField(source='load_raw_ocr_json', read_only=True)
+    # 校对结果按页保存, 这里拼接为 Label Studio 导出的任务列表格式
+    corrected_label_studio_json = serializers.JSONField(source='get_corrected_tasks', read_only=True)
+    # 处理日志由旧版文本字段和 ProcessingLogLine 拼接而成
+    processing_log = serializers.CharField(source='get_processing_log', read_only=True)
+
     class Meta:
         model = OcrDocument
         # 确保所有需要的字段都包含在内,以便前端可以访问它们
         fields = (
             'id', 
             'original_pdf_path', 
+            'content_hash',  # PDF 内容哈希, 用于去重
+            'duplicate_of',  # 复用结果的原文档 (Label Studio 任务的所有者)
             'mineru_json_path', 
             'status', 
             'created_at', 
@@ -21,5 +30,51 @@ class OcrDocumentSerializer(serializers.ModelSerializer):
             'processing_log',  # 新增: 处理日志字段
             'label_studio_synced',  # 新增: 是否已推送到 Label Studio
             'label_studio_task_ids',  # 新增: Label Studio 任务 ID
-            'label_studio_sync_time'  # 新增: 推送时间
+            'label_studio_sync_time',  # 新增: 推送时间
+            'label_studio_push_status',  # 异步推送状态
+            'label_studio_push_task_id',
+            'label_studio_push_error',
+            'ragflow_upload_status',  # RAGFlow 上传状态
+            'ragflow_upload_task_id',
+            'ragflow_upload_error',
+            'ragflow_upload_time',
+        )
+
+
+class OcrDocumentSummarySerializer(serializers.ModelSerializer):
+    """
+    文档列表使用的轻量序列化器
+    不包含 OCR / 校对 JSON 和处理日志, 只用布尔标记表示是否存在,
+    完整内容通过详情接口获取
+    """
+    has_raw_ocr = serializers.BooleanField(read_only=True)
+    has_corrections = serializers.BooleanField(read_only=True)
+
+    # 列表查询只加载这些列
+    LIST_COLUMNS = (
+        'id',
+        'original_pdf_path',
+        'mineru_json_path',
+        'status',
+        'created_at',
+        'label_studio_synced',
+        'label_studio_sync_time',
+        'label_studio_push_status',
+        'ragflow_upload_status',
+    )
+
+    class Meta:
+        model = OcrDocument
+        fields = (
+            'id',
+            'original_pdf_path',
+            'mineru_json_path',
+            'status',
+            'created_at',
+            'has_raw_ocr',
+            'has_corrections',
+            'label_studio_synced',
+            'label_studio_sync_time',
+            'label_studio_push_status',
+            'ragflow_upload_status',
         )
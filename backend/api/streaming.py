@@ -0,0 +1,186 @@
+"""
+大文件下载的流式响应工具
+支持 ETag / If-None-Match, 单段 Range 请求, 以及按客户端 Accept-Encoding 直接输出压缩内容
+"""
+import re
+import zlib
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags
+from . import json_codec
+from .blob_store import get_blob_store
+from .compression import codec_for_name, codec_suffix
+
+STREAM_CHUNK_SIZE = 64 * 1024
+GZIP_STREAM_LEVEL = 6
+
+# 存储格式 -> HTTP Content-Encoding
+CONTENT_ENCODINGS = {'zstd': 'zstd', 'gzip': 'gzip'}
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def accepts_encoding(request, encoding):
+    """客户端 Accept-Encoding 是否接受指定编码 (忽略 q=0)"""
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = item.strip().partition(';')
+        if name.strip().lower() != encoding:
+            continue
+        return params.replace(' ', '').lower() not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+def etag_matches(request, content_hash):
+    """
+    If-None-Match 是否命中
+    同一内容的不同编码使用 "<hash>" / "<hash>.gz" 等 ETag, 比较时只看内容哈希部分
+    """
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    if '*' in etags:
+        return True
+    return any(etag.removeprefix('W/').strip('"').split('.', 1)[0] == content_hash for etag in etags)
+
+
+def not_modified(etag):
+    response = HttpResponseNotModified()
+    response['ETag'] = etag
+    return response
+
+
+def parse_range(request, size, etag):
+    """
+    解析单段 Range 请求头
+
+    Returns:
+        None: 没有 Range, 或 Range 无效 / If-Range 不匹配, 应返回完整内容
+        (start, end): 闭区间字节范围
+        False: 范围无法满足, 应返回 416
+    """
+    header = request.META.get('HTTP_RANGE')
+    if not header:
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range.strip() != etag:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        # 多段范围等不支持的格式, 按规范可以忽略 Range 返回完整内容
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-N: 最后 N 个字节
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def iter_fileobj(fileobj, length=None, chunk_size=STREAM_CHUNK_SIZE):
+    """逐块读取文件对象, 可限定总长度, 读完后关闭"""
+    try:
+        remaining = length
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            chunk = fileobj.read(size)
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def iter_gzip(chunks, level=GZIP_STREAM_LEVEL):
+    """将字节流边读边压缩为 gzip"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def iter_json_document(data):
+    """
+    逐页序列化 MinerU 文档: pdf_info 中的每一页单独编码后输出,
+    峰值内存只有一页的编码结果, 而不是整个 JSON 字符串
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('pdf_info'), list):
+        yield json_codec.dumps(data)
+        return
+    yield b'{"pdf_info":['
+    for index, page in enumerate(data['pdf_info']):
+        yield (b',' if index else b'') + json_codec.dumps(page)
+    yield b']'
+    for key, value in data.items():
+        if key != 'pdf_info':
+            yield b',' + json_codec.dumps(key) + b':' + json_codec.dumps(value)
+    yield b'}'
+
+
+def blob_download_response(request, ref, content_type='application/json; charset=utf-8'):
+    """
+    流式下载 blob 存储中的 JSON
+
+    - ETag 取自 ref 中的内容哈希, If-None-Match 命中时返回 304
+    - 客户端接受 blob 的压缩格式时直接输出压缩后的字节 (Content-Encoding), 支持 Range
+    - 否则边解压边输出; 客户端接受 gzip 时再边压缩为 gzip 输出
+    """
+    store = get_blob_store()
+    content_hash = ref.split('.', 1)[0]
+    codec = codec_for_name(ref)
+    encoding = CONTENT_ENCODINGS.get(codec)
+
+    if encoding and accepts_encoding(request, encoding):
+        etag = f'"{content_hash}{codec_suffix(codec)}"'
+        if etag_matches(request, content_hash):
+            return not_modified(etag)
+        size = store.size(ref)
+        byte_range = parse_range(request, size, etag)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                iter_fileobj(store.open_range(ref, start), end - start + 1),
+                content_type=content_type, status=206
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = end - start + 1
+        elif hasattr(store, 'local_path'):
+            # 本地文件交给 FileResponse, WSGI 服务器可以用 sendfile 输出
+            response = FileResponse(open(store.local_path(ref), 'rb'), content_type=content_type)
+        else:
+            response = StreamingHttpResponse(iter_fileobj(store.open(ref)), content_type=content_type)
+            response['Content-Length'] = size
+        response['Content-Encoding'] = encoding
+        response['Accept-Ranges'] = 'bytes'
+    else:
+        chunks = store.iter_decompressed(ref)
+        if accepts_encoding(request, 'gzip'):
+            etag = f'"{content_hash}{codec_suffix(codec)}.gz"'
+            chunks = iter_gzip(chunks)
+        else:
+            etag = f'"{content_hash}"'
+        if etag_matches(request, content_hash):
+            return not_modified(etag)
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        if etag.endswith('.gz"'):
+            response['Content-Encoding'] = 'gzip'
+        response['Accept-Ranges'] = 'none'
+
+    response['ETag'] = etag
+    response['Vary'] = 'Accept-Encoding'
+    return response
@@ -1,226 +1,655 @@
-import subprocess
 import os
-import time
 import uuid
-import json
-from celery import shared_task
+import random
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from celery import shared_task, chord, group
+from celery.signals import worker_process_init
 from .models import OcrDocument
 from django.conf import settings
 from pathlib import Path
 import logging
-from pdf2image import convert_from_path
+import requests
 from .label_studio_utils import LabelStudioClient
-from django.utils import timezone
+from .mineru_engine import get_engine, MineruError
+from .page_images import rasterize_pdf, get_pdf_page_count
+from .ls_sync import sync_document_tasks, LabelStudioSyncError
+from .ls_pull import pull_document_annotations, PULL_STATUSES
+from .ragflow_utils import RagflowClient, RagflowError
+from .ragflow_sync import upload_document_chunks
+from .dedup import copy_document_results, file_sha256, find_reusable_document, share_label_studio_tasks
+from .processing_log import ProcessingLogWriter, append_log, reset_log
+from .compression import compress_file, dump_ocr_json, load_ocr_json
+from .events import get_redis, publish_event, publish_status, publish_progress
 
 logger = logging.getLogger(__name__)
 
 DATA_ROOT = settings.DATA_ROOT_PATH
 BASE_OUTPUT_DIR = DATA_ROOT / 'data' / 'mineru_output'
-POPPLER_PATH = os.getenv('POPPLER_PATH', None)
-MINERU_COMMAND = 'mineru'
+
+# 处于这些状态时文档已有推送任务在排队或执行, 不会重复入队
+LS_PUSH_ACTIVE_STATUSES = ('queued', 'running', 'retrying')
+# 同一文档同时只执行一次 Label Studio 推送 / RAGFlow 上传, 锁的超时时间 (秒)
+LABEL_STUDIO_PUSH_LOCK_TIMEOUT = 3600
+RAGFLOW_UPLOAD_LOCK_TIMEOUT = 3600
+
+
+@worker_process_init.connect
+def _load_mineru_engine(**kwargs):
+    """worker 进程启动时加载 MinerU 引擎, 模型加载开销由该进程处理的所有文档分摊"""
+    if not settings.MINERU_PRELOAD:
+        return
+    try:
+        engine = get_engine()
+        logger.info(f"MinerU 引擎就绪: {engine.name}")
+    except Exception as e:
+        logger.error(f"MinerU 引擎初始化失败: {e}", exc_info=True)
+
+
+def _append_log(doc_id, text):
+    """追加处理日志 (只插入新行, 分页并行的子任务可以同时写入)"""
+    append_log(doc_id, text)
+
+
+def _format_mineru_line(line):
+    """格式化 MinerU 输出行"""
+    lower_line = line.lower()
+    if 'error' in lower_line or 'fail' in lower_line:
+        return f'❌ {line}'
+    elif 'warning' in lower_line or 'warn' in lower_line:
+        return f'⚠️  {line}'
+    elif 'success' in lower_line or 'complete' in lower_line:
+        return f'✅ {line}'
+    elif 'processing' in lower_line or 'page' in lower_line:
+        return f'⚙️  {line}'
+    return f'📝 {line}'
+
+
+def _get_page_count(pdf_path):
+    """读取 PDF 页数, 失败时返回 None"""
+    try:
+        return get_pdf_page_count(pdf_path)
+    except Exception as e:
+        logger.warning(f"无法读取 PDF 页数 {pdf_path}: {e}")
+        return None
+
+
+def _split_page_ranges(page_count, chunk_pages):
+    """按块大小切分页码区间, 返回 [(start, end), ...], 均从 0 开始且包含 end"""
+    return [
+        (start, min(start + chunk_pages, page_count) - 1)
+        for start in range(0, page_count, chunk_pages)
+    ]
+
+
+def _run_mineru(doc_id, pdf_path, output_dir, start_page=None, end_page=None, log_prefix=''):
+    """
+    使用当前 worker 的 MinerU 引擎解析 PDF, 并实时写入处理日志
+
+    Args:
+        start_page / end_page: 可选页码区间 (从 0 开始, 包含 end), 用于分页并行
+
+    Returns:
+        Path: MinerU 生成的 _middle.json 路径
+    """
+    engine = get_engine()
+    _append_log(doc_id, f'{log_prefix}[命令] 执行 MinerU (引擎: {engine.name})\n{"-" * 60}\n')
+
+    # MinerU 输出按行数/时间批量落库, 避免每几行就写一次数据库
+    log_writer = ProcessingLogWriter(doc_id)
+
+    def on_line(line):
+        logger.info(f"MinerU[{doc_id}]: {line}")
+        log_writer.write(f'{log_prefix}{_format_mineru_line(line)}')
+
+    try:
+        engine.run(pdf_path, output_dir, start_page, end_page, on_line=on_line)
+    except MineruError as e:
+        log_writer.write(f'{"-" * 60}\n{log_prefix}[错误] {e}\n')
+        raise
+    finally:
+        # 保存剩余日志
+        log_writer.flush()
+
+    _append_log(doc_id, f'{"-" * 60}\n{log_prefix}[信息] MinerU 执行完成,正在查找输出文件...\n')
+
+    # 两种引擎的 run 都在 MinerU 结束 (子进程退出 / do_parse 返回) 后才返回, 输出文件此时已写完, 无需等待
+    json_path = Path(output_dir) / pdf_path.stem / "auto" / f"{pdf_path.stem}_middle.json"
+
+    if not os.path.exists(json_path):
+        # 如果文件依然不存在,抛出错误,此时日志中已有详细的 stdout/stderr
+        _append_log(doc_id, f'{log_prefix}[错误] 未找到输出文件: {json_path}\n')
+        raise FileNotFoundError(f"'_middle.json' not found at expected path: {json_path}. MinerU did not produce the expected output.")
+
+    return json_path
+
+
+def _merge_chunk_outputs(chunk_results, pdf_path, task_output_dir):
+    """
+    合并各页码区间的 _middle.json 为一个完整文档
+
+    MinerU 按区间运行时输出的 page_idx 从 0 开始, 这里按区间起始页修正,
+    同时把各区间的 images/ 汇总到合并后的输出目录, 保证 image_path 仍可解析
+    """
+    merged_dir = task_output_dir / pdf_path.stem / "auto"
+    merged_images_dir = merged_dir / "images"
+    os.makedirs(merged_images_dir, exist_ok=True)
+
+    merged = None
+    for result in sorted(chunk_results, key=lambda r: r['start_page']):
+        chunk_json_path = Path(result['json_path'])
+        chunk_data = load_ocr_json(chunk_json_path)
+
+        chunk_images_dir = chunk_json_path.parent / "images"
+        if chunk_images_dir.is_dir():
+            for image_file in chunk_images_dir.iterdir():
+                target = merged_images_dir / image_file.name
+                if not target.exists():
+                    shutil.move(str(image_file), str(target))
+
+        chunk_pages = chunk_data.get('pdf_info', [])
+        for page_data in chunk_pages:
+            page_data['page_idx'] = result['start_page'] + page_data.get('page_idx', 0)
+
+        if merged is None:
+            merged = {key: value for key, value in chunk_data.items() if key != 'pdf_info'}
+            merged['pdf_info'] = []
+        merged['pdf_info'].extend(chunk_pages)
+
+    merged['pdf_info'].sort(key=lambda page: page.get('page_idx', 0))
+
+    # 合并结果直接以压缩格式写入
+    json_path = dump_ocr_json(merged, merged_dir / f"{pdf_path.stem}_middle.json")
+
+    shutil.rmtree(task_output_dir / "chunks", ignore_errors=True)
+    return json_path, merged
+
+
+def _finalize_document(doc_id, pdf_path, unique_folder_name, json_path, ocr_data, page_count):
+    """保存 OCR 结果并将 Label Studio 推送加入队列 (页面图片已由并行阶段生成)"""
+    doc = OcrDocument.objects.get(id=doc_id)
+
+    logger.info(f"Found OCR JSON file at: {json_path}. Reading content.")
+    _append_log(doc_id, f'[成功] 找到 OCR 结果文件\n')
+
+    doc.store_raw_ocr_json(ocr_data)
+    doc.save(update_fields=['raw_ocr_ref', 'raw_ocr_json'])
+    logger.info(f"Successfully saved raw OCR JSON to blob store ({doc.raw_ocr_ref}) for Doc ID {doc_id}.")
+
+    logger.info(f"Successfully converted and saved {page_count} images.")
+    _append_log(doc_id, f'[成功] 已转换 {page_count} 页图片\n')
+
+    doc.mineru_json_path = str(json_path)
+    doc.status = 'processed'
+    doc.save(update_fields=['mineru_json_path', 'status'])
+
+    # 推送到 Label Studio 交给独立队列中的任务执行, 不占用 OCR worker
+    try:
+        enqueue_label_studio_push(doc_id)
+        _append_log(doc_id, '[信息] 已加入 Label Studio 推送队列\n')
+    except Exception as ls_error:
+        logger.warning(f"Label Studio 推送任务入队失败: {ls_error}")
+        _append_log(doc_id, f'⚠️  Label Studio 推送任务入队失败: {str(ls_error)}\n')
+
+    _append_log(doc_id, '[完成] 文档处理成功!\n')
+    publish_status(doc_id, 'processed')
+
+    logger.info(f"Celery Task fully succeeded for Doc ID {doc_id}.")
+    return f"Success: {str(json_path)}"
+
+
+def _reuse_document(doc, source):
+    """
+    内容与已处理的文档相同: 复用其 OCR 结果、页面图片和 Label Studio 任务, 不再运行 MinerU
+    任务由原文档推送, 原文档尚未推送时为其排队推送, 完成后任务映射复制给本文档
+    """
+    doc_id = doc.id
+    _append_log(doc_id, f'[信息] 内容与文档 {source.id} 相同, 复用其 OCR 结果和页面图片\n')
+    corrected = copy_document_results(doc, source)
+
+    if doc.label_studio_synced:
+        _append_log(doc_id, f'[信息] 复用文档 {doc.duplicate_of_id} 的 {len(doc.label_studio_task_ids or [])} 个 '
+                            f'Label Studio 任务{f", 已有 {corrected} 页校对结果" if corrected else ""}\n')
+    else:
+        try:
+            enqueue_label_studio_push(doc.duplicate_of_id)
+            _append_log(doc_id, f'[信息] 文档 {doc.duplicate_of_id} 已加入 Label Studio 推送队列, 完成后复用其任务\n')
+        except Exception as ls_error:
+            logger.warning(f"Label Studio 推送任务入队失败: {ls_error}")
+            _append_log(doc_id, f'⚠️  Label Studio 推送任务入队失败: {str(ls_error)}\n')
+
+    _append_log(doc_id, '[完成] 文档处理成功!\n')
+    publish_status(doc_id, doc.status)
+    logger.info(f"Doc ID {doc_id} reused results of duplicate Doc ID {source.id}.")
+    return f"Reused: Doc ID {source.id}"
+
+
+def _mark_failed(doc_id, error):
+    """将文档标记为失败并记录原因"""
+    OcrDocument.objects.filter(id=doc_id).update(status='failed')
+    publish_status(doc_id, 'failed')
+    _append_log(doc_id, f'[失败] 处理异常: {str(error)}\n')
+
+
 @shared_task
-def process_pdf_with_mineru(doc_id):
+def process_pdf_with_mineru(doc_id, reuse=None):
+    """
+    处理上传的 PDF; reuse 为 None 时按 OCR_REUSE_DUPLICATES 决定是否复用内容相同的已处理文档的结果
+    """
     doc = None
     try:
         doc = OcrDocument.objects.get(id=doc_id)
         doc.status = 'processing'
-        doc.processing_log = '[开始] 准备处理 PDF 文档...\n'
-        doc.save(update_fields=['status', 'processing_log'])
+        doc.save(update_fields=['status'])
+        publish_status(doc_id, 'processing')
+        reset_log(doc_id, '[开始] 准备处理 PDF 文档...\n')
 
         pdf_path = Path(doc.original_pdf_path)
+        if not doc.content_hash:
+            # 目录导入的文件没有在上传时计算哈希
+            doc.content_hash = file_sha256(pdf_path)
+            doc.save(update_fields=['content_hash'])
+        if settings.OCR_REUSE_DUPLICATES if reuse is None else reuse:
+            source = find_reusable_document(doc)
+            if source is not None:
+                return _reuse_document(doc, source)
+
         unique_folder_name = uuid.uuid4().hex[:12]
         task_output_dir = BASE_OUTPUT_DIR / unique_folder_name
         os.makedirs(task_output_dir, exist_ok=True)
-        
-        doc.processing_log += f'[信息] 创建输出目录: {unique_folder_name}\n'
-        doc.save(update_fields=['processing_log'])
-
-        command_str = f'"{MINERU_COMMAND}" -p "{str(pdf_path)}" -o "{str(task_output_dir)}"'
-
-        logger.info(f"Executing command: {command_str}")
-        doc.processing_log += f'[命令] 执行 MinerU\n'
-        doc.processing_log += f'命令: {command_str}\n'
-        doc.processing_log += f'{"-" * 60}\n'
-        doc.save(update_fields=['processing_log'])
-        
-        # 使用 Popen 实现实时日志流式读取
-        process = subprocess.Popen(
-            command_str,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,  # 合并 stderr 到 stdout
-            text=True,
-            bufsize=1,  # 行缓冲
-            universal_newlines=True
-        )
-        
-        log_lines = []
-        line_count = 0
-        last_save_time = time.time()
-        
-        try:
-            # 实时读取输出
-            for line in process.stdout:
-                line = line.rstrip()
-                if line:  # 跳过空行
-                    logger.info(f"MinerU[{doc_id}]: {line}")
-                    
-                    # 格式化日志输出
-                    if 'error' in line.lower() or 'fail' in line.lower():
-                        formatted_line = f'❌ {line}'
-                    elif 'warning' in line.lower() or 'warn' in line.lower():
-                        formatted_line = f'⚠️  {line}'
-                    elif 'success' in line.lower() or 'complete' in line.lower():
-                        formatted_line = f'✅ {line}'
-                    elif 'processing' in line.lower() or 'page' in line.lower():
-                        formatted_line = f'⚙️  {line}'
-                    else:
-                        formatted_line = f'📝 {line}'
-                    
-                    log_lines.append(formatted_line)
-                    line_count += 1
-                    
-                    # 每 3 行或每 1.5 秒保存一次到数据库 (更频繁以获得更实时的体验)
-                    current_time = time.time()
-                    if line_count >= 3 or (current_time - last_save_time) >= 1.5:
-                        doc.refresh_from_db()
-                        doc.processing_log += '\n'.join(log_lines) + '\n'
-                        doc.save(update_fields=['processing_log'])
-                        log_lines = []
-                        line_count = 0
-                        last_save_time = current_time
-            
-            # 保存剩余日志
-            if log_lines:
-                doc.refresh_from_db()
-                doc.processing_log += '\n'.join(log_lines) + '\n'
-                doc.save(update_fields=['processing_log'])
-            
-            # 等待进程结束
-            return_code = process.wait(timeout=3600)
-            
-            if return_code != 0:
-                doc.refresh_from_db()
-                doc.processing_log += f'\n{"-" * 60}\n'
-                doc.processing_log += f'[错误] MinerU 执行失败, 返回码: {return_code}\n'
-                doc.save(update_fields=['processing_log'])
-                raise RuntimeError(f"MinerU execution failed with return code {return_code}.")
-                
-        except subprocess.TimeoutExpired:
-            process.kill()
-            doc.refresh_from_db()
-            doc.processing_log += f'\n[错误] MinerU 执行超时 (>3600秒)\n'
-            doc.save(update_fields=['processing_log'])
-            raise RuntimeError("MinerU execution timeout.")
-        
-        doc.refresh_from_db()
-        doc.processing_log += f'{"-" * 60}\n'
-        doc.processing_log += '[信息] MinerU 执行完成,正在查找输出文件...\n'
-        doc.save(update_fields=['processing_log'])
-        
-        mineru_created_dir = task_output_dir / pdf_path.stem
-        json_path = mineru_created_dir / "auto" / f"{pdf_path.stem}_middle.json"
-        
-        time.sleep(1)
-        
-        if not os.path.exists(json_path):
-            # 如果文件依然不存在,抛出错误,此时日志中已有详细的 stdout/stderr
-            doc.processing_log += f'[错误] 未找到输出文件: {json_path}\n'
-            doc.save(update_fields=['processing_log'])
-            raise FileNotFoundError(f"'_middle.json' not found at expected path: {json_path}. MinerU did not produce the expected output.")
-            
-        # ===================== 核心修改结束 =====================
-
-        logger.info(f"Found OCR JSON file at: {json_path}. Reading content.")
-        doc.processing_log += f'[成功] 找到 OCR 结果文件\n'
-        doc.save(update_fields=['processing_log'])
-        
-        with open(json_path, 'r', encoding='utf-8') as f:
-            ocr_data = json.load(f)
-        
-        doc.raw_ocr_json = ocr_data
-        doc.save(update_fields=['raw_ocr_json'])
-        logger.info(f"Successfully saved raw_ocr_json to database for Doc ID {doc_id}.")
-        
+
+        _append_log(doc_id, f'[信息] 创建输出目录: {unique_folder_name}\n')
+
+        # 分页并行: 大文档按页码区间拆分为多个子任务, 由 chord 回调合并结果
+        if settings.MINERU_PAGE_PARALLEL:
+            page_count = _get_page_count(pdf_path)
+            if page_count and page_count >= settings.MINERU_PARALLEL_MIN_PAGES:
+                page_ranges = _split_page_ranges(page_count, settings.MINERU_CHUNK_PAGES)
+                _append_log(doc_id, f'[信息] 共 {page_count} 页, 拆分为 {len(page_ranges)} 个区间并行处理\n')
+                # 页面图片生成作为独立子任务与各区间 OCR 一起并行, chord 回调等待全部完成
+                chord(
+                    group(
+                        [rasterize_document_pages.s(doc_id, unique_folder_name, page_count)] + [
+                            run_mineru_chunk.s(doc_id, unique_folder_name, start_page, end_page)
+                            for start_page, end_page in page_ranges
+                        ]
+                    )
+                )(merge_mineru_chunks.s(doc_id, unique_folder_name))
+                return f"Dispatched {len(page_ranges)} chunks for Doc ID {doc_id}"
+
+        # 页面图片生成与 MinerU 同时进行, 两者都完成后才进入 Label Studio 任务生成
         logger.info(f"Converting PDF pages to images for Doc ID {doc_id}.")
-        doc.processing_log += f'[信息] 正在转换 PDF 页面为图片...\n'
-        doc.save(update_fields=['processing_log'])
-        
-        pages_dir = task_output_dir / "pages"
-        os.makedirs(pages_dir, exist_ok=True)
-        
-        pil_images = convert_from_path(pdf_path, poppler_path=POPPLER_PATH, thread_count=4, fmt='jpeg')
-        for i, image in enumerate(pil_images):
-            page_num = i + 1
-            filename = f"page-{str(page_num).zfill(4)}.jpg"
-            image.save(pages_dir / filename, 'JPEG')
-        
-        logger.info(f"Successfully converted and saved {len(pil_images)} images.")
-        doc.processing_log += f'[成功] 已转换 {len(pil_images)} 页图片\n'
-        doc.save(update_fields=['processing_log'])
-
-        # 自动推送到 Label Studio
+        _append_log(doc_id, f'[信息] 正在后台转换 PDF 页面为图片...\n')
+        raster_executor = ThreadPoolExecutor(max_workers=1)
+        raster_cancel = threading.Event()
+        raster_future = raster_executor.submit(
+            rasterize_pdf, pdf_path, task_output_dir / "pages",
+            on_progress=lambda done, total: publish_progress(doc_id, 'rasterize', done, total),
+            cancel_event=raster_cancel,
+        )
         try:
-            doc.processing_log += '[信息] 正在推送任务到 Label Studio...\n'
-            doc.save(update_fields=['processing_log'])
-            
-            ls_client = LabelStudioClient()
-            if ls_client.is_configured():
-                # 使用 _generate_ls_tasks 函数生成带预标注的任务
-                from .views import _generate_ls_tasks
-                
-                try:
-                    # 生成包含 OCR 预标注的任务数据
-                    tasks_data = _generate_ls_tasks(ocr_data, doc, unique_folder_name)
-                    
-                    if not tasks_data:
-                        logger.warning(f"No valid tasks generated for Doc ID {doc_id}")
-                        doc.processing_log += '⚠️  未能生成有效的任务数据\n'
-                        doc.save(update_fields=['processing_log'])
-                    else:
-                        doc.processing_log += f'[信息] 已生成 {len(tasks_data)} 个任务(包含OCR预标注)\n'
-                        doc.save(update_fields=['processing_log'])
-                        
-                        # 批量创建任务
-                        result = ls_client.create_tasks_batch(tasks_data)
-                        if result:
-                            task_ids = result.get('task_ids', [])
-                            doc.refresh_from_db()
-                            doc.processing_log += f'✅ 已推送 {len(tasks_data)} 个任务到 Label Studio\n'
-                            doc.processing_log += f'[信息] 每个任务包含 OCR 识别的文本框和内容\n'
-                            doc.label_studio_synced = True
-                            doc.label_studio_task_ids = task_ids
-                            doc.label_studio_sync_time = timezone.now()
-                            doc.save(update_fields=['processing_log', 'label_studio_synced', 'label_studio_task_ids', 'label_studio_sync_time'])
-                        else:
-                            doc.processing_log += '⚠️  推送到 Label Studio 失败,请手动重试\n'
-                            doc.save(update_fields=['processing_log'])
-                            
-                except Exception as generate_error:
-                    logger.error(f"Error generating Label Studio tasks: {generate_error}", exc_info=True)
-                    doc.processing_log += f'⚠️  生成任务数据失败: {str(generate_error)}\n'
-                    doc.save(update_fields=['processing_log'])
-            else:
-                doc.processing_log += '[跳过] Label Studio 未配置 API Key\n'
-                doc.save(update_fields=['processing_log'])
-        except Exception as ls_error:
-            logger.warning(f"Label Studio 推送失败: {ls_error}")
-            doc.processing_log += f'⚠️  Label Studio 推送失败: {str(ls_error)}\n'
-            doc.save(update_fields=['processing_log'])
-
-        doc.mineru_json_path = str(json_path)
-        doc.status = 'processed'
-        doc.processing_log += '[完成] 文档处理成功!\n'
-        doc.save(update_fields=['mineru_json_path', 'status', 'processing_log'])
-        
-        logger.info(f"Celery Task fully succeeded for Doc ID {doc_id}.")
-        return f"Success: {str(json_path)}"
+            json_path = _run_mineru(doc_id, pdf_path, task_output_dir)
+
+            ocr_data = load_ocr_json(json_path)
+            # 磁盘上只保留压缩后的 _middle.json
+            json_path = compress_file(json_path)
+
+            page_count = raster_future.result()
+        except Exception:
+            # 任务已失败: 停止后台转换 (等待当前批次结束), 删除不完整的页面图片, 不再占用 worker 的 CPU 和内存
+            raster_cancel.set()
+            raster_executor.shutdown(wait=True, cancel_futures=True)
+            shutil.rmtree(task_output_dir / "pages", ignore_errors=True)
+            raise
+        finally:
+            raster_executor.shutdown(wait=False)
+
+        return _finalize_document(doc_id, pdf_path, unique_folder_name, json_path, ocr_data, page_count)
 
     except Exception as e:
         if doc:
-            doc.status = 'failed'
-            doc.processing_log += f'[失败] 处理异常: {str(e)}\n'
-            doc.save(update_fields=['status', 'processing_log'])
+            _mark_failed(doc_id, e)
         # 错误日志现在会包含更丰富的信息
         logger.error(f"Error in Celery task for doc ID {doc_id if 'doc_id' in locals() else 'unknown'}: {e}", exc_info=True)
-        raise e
\ No newline at end of file
+        raise e
+
+
+@shared_task
+def run_mineru_chunk(doc_id, unique_folder_name, start_page, end_page):
+    """分页并行子任务: 对指定页码区间运行 MinerU"""
+    try:
+        doc = OcrDocument.objects.get(id=doc_id)
+        pdf_path = Path(doc.original_pdf_path)
+        chunk_output_dir = BASE_OUTPUT_DIR / unique_folder_name / "chunks" / f"{start_page:04d}-{end_page:04d}"
+        os.makedirs(chunk_output_dir, exist_ok=True)
+
+        log_prefix = f'[页 {start_page + 1}-{end_page + 1}] '
+        json_path = _run_mineru(doc_id, pdf_path, chunk_output_dir, start_page, end_page, log_prefix=log_prefix)
+        publish_event(doc_id, 'progress', {'stage': 'ocr_chunk', 'start_page': start_page, 'end_page': end_page})
+        return {'start_page': start_page, 'end_page': end_page, 'json_path': str(json_path)}
+
+    except Exception as e:
+        _mark_failed(doc_id, e)
+        logger.error(f"Error in MinerU chunk {start_page}-{end_page} for doc ID {doc_id}: {e}", exc_info=True)
+        raise
+
+
+@shared_task
+def rasterize_document_pages(doc_id, unique_folder_name, page_count=None):
+    """分页并行子任务: 生成页面图片, 与 MinerU 区间任务同时运行"""
+    try:
+        doc = OcrDocument.objects.get(id=doc_id)
+        pdf_path = Path(doc.original_pdf_path)
+        _append_log(doc_id, f'[信息] 正在后台转换 PDF 页面为图片...\n')
+        page_count = rasterize_pdf(
+            pdf_path, BASE_OUTPUT_DIR / unique_folder_name / "pages", page_count=page_count,
+            on_progress=lambda done, total: publish_progress(doc_id, 'rasterize', done, total)
+        )
+        return {'page_count': page_count}
+
+    except Exception as e:
+        _mark_failed(doc_id, e)
+        logger.error(f"Error rasterizing pages for doc ID {doc_id}: {e}", exc_info=True)
+        raise
+
+
+@shared_task
+def merge_mineru_chunks(header_results, doc_id, unique_folder_name):
+    """分页并行的 chord 回调: 区间 OCR 和页面图片都完成后, 合并结果并继续后续流程"""
+    try:
+        doc = OcrDocument.objects.get(id=doc_id)
+        pdf_path = Path(doc.original_pdf_path)
+        task_output_dir = BASE_OUTPUT_DIR / unique_folder_name
+
+        chunk_results = [result for result in header_results if 'json_path' in result]
+        page_count = next(result['page_count'] for result in header_results if 'page_count' in result)
+
+        _append_log(doc_id, f'[信息] {len(chunk_results)} 个区间处理完成, 正在合并结果...\n')
+        json_path, ocr_data = _merge_chunk_outputs(chunk_results, pdf_path, task_output_dir)
+        _append_log(doc_id, f'[成功] 已合并 {len(ocr_data.get("pdf_info", []))} 页 OCR 结果\n')
+
+        return _finalize_document(doc_id, pdf_path, unique_folder_name, json_path, ocr_data, page_count)
+
+    except Exception as e:
+        _mark_failed(doc_id, e)
+        logger.error(f"Error merging MinerU chunks for doc ID {doc_id}: {e}", exc_info=True)
+        raise
+
+
+def _set_push_state(doc_id, task_id, push_status, error=''):
+    # 只更新仍属于该任务的状态, 已被 force 推送取代的旧任务不会覆盖新任务的状态
+    OcrDocument.objects.filter(id=doc_id, label_studio_push_task_id=task_id).update(
+        label_studio_push_status=push_status, label_studio_push_error=error
+    )
+
+
+def enqueue_label_studio_push(doc_id, force=False):
+    """
+    将文档加入 Label Studio 推送队列
+
+    同一文档同时只保留一个排队或执行中的推送: 状态由条件 UPDATE 原子地抢占,
+    并发的重复请求返回已有任务的 ID; force=True 时用新任务取代已有任务 (旧任务执行时会直接跳过)
+
+    Returns:
+        tuple: (task_id, created)
+    """
+    task_id = f"ls-push-{doc_id}-{uuid.uuid4().hex[:12]}"
+    documents = OcrDocument.objects.filter(id=doc_id)
+    if not force:
+        documents = documents.exclude(label_studio_push_status__in=LS_PUSH_ACTIVE_STATUSES)
+    claimed = documents.update(label_studio_push_status='queued', label_studio_push_task_id=task_id,
+                               label_studio_push_error='')
+    if not claimed:
+        current = OcrDocument.objects.filter(id=doc_id).values_list('label_studio_push_task_id', flat=True).first()
+        return current, False
+
+    try:
+        push_document_to_label_studio.apply_async(args=[doc_id], task_id=task_id)
+    except Exception as e:
+        _set_push_state(doc_id, task_id, 'failed', f"任务入队失败: {e}")
+        raise
+    return task_id, True
+
+
+@shared_task(bind=True, acks_late=True, max_retries=settings.LABEL_STUDIO_PUSH_MAX_RETRIES)
+def push_document_to_label_studio(self, doc_id, lock_waits=0):
+    """
+    将文档按页增量同步到 Label Studio (在 LABEL_STUDIO_PUSH_QUEUE 队列中执行)
+    网络错误和导入失败按指数退避重试, 同步本身按页指纹比较, 重复执行不会产生重复任务;
+    同一文档的推送锁被占用时与 RAGFlow 上传一样重新入队等待, 等待次数不占用重试次数
+    """
+    task_id = self.request.id
+    doc = OcrDocument.objects.filter(id=doc_id).first()
+    if doc is None or doc.label_studio_push_task_id != task_id:
+        logger.info(f"Label Studio 推送任务 {task_id} 已被取代, 跳过 (Doc ID {doc_id})")
+        return 'superseded'
+    if doc.label_studio_push_status in ('done', 'failed', 'skipped'):
+        # acks_late 下消息可能被重复投递
+        return doc.label_studio_push_status
+
+    if doc.duplicate_of_id:
+        return _push_duplicate_document(doc, task_id)
+
+    ls_client = LabelStudioClient()
+    if not ls_client.is_configured():
+        _set_push_state(doc_id, task_id, 'skipped')
+        _append_log(doc_id, '[跳过] Label Studio 未配置 API Key\n')
+        return 'skipped'
+
+    # 被取代的旧任务可能仍在执行, 等它结束后再同步, 避免两个任务同时导入同一页的任务
+    lock = get_redis().lock(f'ocr:ls-push:{doc_id}', timeout=LABEL_STUDIO_PUSH_LOCK_TIMEOUT, blocking=False)
+    if not lock.acquire():
+        if lock_waits * settings.LABEL_STUDIO_PUSH_RETRY_BACKOFF >= LABEL_STUDIO_PUSH_LOCK_TIMEOUT:
+            _set_push_state(doc_id, task_id, 'failed', '同一文档的另一个推送任务仍在执行')
+            return 'locked'
+        self.apply_async(args=[doc_id], kwargs={'lock_waits': lock_waits + 1},
+                         task_id=task_id, retries=self.request.retries,
+                         countdown=settings.LABEL_STUDIO_PUSH_RETRY_BACKOFF)
+        return 'waiting'
+
+    try:
+        _set_push_state(doc_id, task_id, 'running')
+        if not self.request.retries:
+            _append_log(doc_id, '[信息] 正在推送任务到 Label Studio...\n')
+        mineru_data = doc.load_raw_ocr_json()
+        if mineru_data is None:
+            mineru_data = load_ocr_json(doc.mineru_json_path)
+        # _middle.json 位于 <输出目录>/<文件名>/auto/ 下
+        unique_folder_name = Path(doc.mineru_json_path).parents[2].name
+        # 生成包含 OCR 预标注的任务, 按页指纹增量同步 (首次处理时全部导入)
+        summary = sync_document_tasks(doc, mineru_data, unique_folder_name, ls_client)
+        shared = share_label_studio_tasks(doc)
+
+    except (requests.exceptions.RequestException, LabelStudioSyncError) as e:
+        if self.request.retries < self.max_retries:
+            countdown = min(settings.LABEL_STUDIO_PUSH_RETRY_BACKOFF * 2 ** self.request.retries,
+                            settings.LABEL_STUDIO_PUSH_RETRY_BACKOFF_MAX)
+            countdown = countdown * (0.5 + random.random() / 2)
+            _set_push_state(doc_id, task_id, 'retrying', str(e))
+            _append_log(doc_id, f'⚠️  推送到 Label Studio 失败, {countdown:.0f} 秒后重试: {str(e)}\n')
+            raise self.retry(exc=e, countdown=countdown)
+        _set_push_state(doc_id, task_id, 'failed', str(e))
+        _append_log(doc_id, '⚠️  推送到 Label Studio 失败,请手动重试\n')
+        raise
+    except Exception as e:
+        logger.error(f"Error generating Label Studio tasks: {e}", exc_info=True)
+        _set_push_state(doc_id, task_id, 'failed', str(e))
+        _append_log(doc_id, f'⚠️  生成任务数据失败: {str(e)}\n')
+        raise
+    finally:
+        try:
+            lock.release()
+        except Exception:
+            pass
+
+    if not summary['task_count']:
+        logger.warning(f"No valid tasks generated for Doc ID {doc_id}")
+        _append_log(doc_id, '⚠️  未能生成有效的任务数据\n')
+    else:
+        _append_log(doc_id, f'✅ 已同步 {summary["task_count"]} 个任务到 Label Studio '
+                            f'(新增 {summary["created"]}, 更新 {summary["updated"]}, 未变化 {summary["unchanged"]})\n'
+                            f'[信息] 每个任务包含 OCR 识别的文本框和内容\n')
+        if summary['failed']:
+            _append_log(doc_id, f'⚠️  {summary["failed"]} 个任务导入失败, 可在文档列表中重新推送\n')
+    if shared:
+        _append_log(doc_id, f'[信息] 任务映射已复制给 {shared} 个内容相同的文档\n')
+    _set_push_state(doc_id, task_id, 'done')
+    return summary
+
+
+def _push_duplicate_document(doc, task_id):
+    """
+    重复文档不向 Label Studio 写入任务 (任务由原文档所有):
+    原文档已推送时直接复制其任务映射, 否则为原文档排队推送, 完成后再复制
+    """
+    owner = OcrDocument.objects.only('id', 'label_studio_synced', 'label_studio_task_ids',
+                                     'label_studio_sync_time').get(id=doc.duplicate_of_id)
+    if owner.label_studio_synced:
+        share_label_studio_tasks(owner)
+        _append_log(doc.id, f'[信息] 复用文档 {owner.id} 的 {len(owner.label_studio_task_ids or [])} 个 Label Studio 任务\n')
+        return 'shared'
+    enqueue_label_studio_push(owner.id)
+    _set_push_state(doc.id, task_id, 'skipped', f"等待文档 {owner.id} 推送到 Label Studio 后复用其任务")
+    _append_log(doc.id, f'[信息] 文档 {owner.id} 已加入 Label Studio 推送队列, 完成后复用其任务\n')
+    return 'skipped'
+
+
+@shared_task(autoretry_for=(requests.exceptions.RequestException,), retry_backoff=True, retry_jitter=True, max_retries=3)
+def pull_label_studio_annotations(doc_id):
+    """拉取单个文档在 Label Studio 中的标注, 只写回有变化的页面"""
+    # 同一文档同时只执行一次拉取 (定时任务间隔短于拉取耗时的情况)
+    lock = get_redis().lock(f'ocr:ls-pull:{doc_id}', timeout=settings.LABEL_STUDIO_PULL_LOCK_TIMEOUT, blocking=False)
+    if not lock.acquire():
+        return 'locked'
+    try:
+        doc = OcrDocument.objects.defer('raw_ocr_json').get(id=doc_id)
+        ls_client = LabelStudioClient()
+        if not ls_client.is_configured():
+            return 'skipped'
+        summary = pull_document_annotations(doc, ls_client)
+        if summary['changed']:
+            _append_log(doc_id, f'[信息] 已从 Label Studio 拉取 {summary["changed"]} 页校对结果\n')
+        return summary
+    finally:
+        try:
+            lock.release()
+        except Exception:
+            pass
+
+
+@shared_task
+def pull_all_label_studio_annotations():
+    """定时任务: 为所有已推送到 Label Studio 的文档分派标注拉取任务"""
+    if not LabelStudioClient().is_configured():
+        return 0
+    doc_ids = list(
+        OcrDocument.objects.filter(label_studio_synced=True, status__in=PULL_STATUSES)
+        .values_list('id', flat=True)
+    )
+    if doc_ids:
+        group(pull_label_studio_annotations.s(doc_id) for doc_id in doc_ids).apply_async()
+    return len(doc_ids)
+
+
+def _set_ragflow_state(doc_id, task_id, upload_status, error=''):
+    # 只更新仍属于该任务的状态, 已被新任务取代的旧任务不会覆盖新任务的状态
+    OcrDocument.objects.filter(id=doc_id, ragflow_upload_task_id=task_id).update(
+        ragflow_upload_status=upload_status, ragflow_upload_error=error
+    )
+
+
+def enqueue_ragflow_upload(doc_id, kb_name=None, force=False):
+    """
+    将文档加入 RAGFlow 上传队列, 与 enqueue_label_studio_push 相同: 同一文档同时只保留一个排队或执行中的上传,
+    force=True 时用新任务取代已有任务 (校对结果有更新时使用)
+
+    Returns:
+        tuple: (task_id, created)
+    """
+    task_id = f"ragflow-upload-{doc_id}-{uuid.uuid4().hex[:12]}"
+    documents = OcrDocument.objects.filter(id=doc_id)
+    if not force:
+        documents = documents.exclude(ragflow_upload_status__in=LS_PUSH_ACTIVE_STATUSES)
+    claimed = documents.update(ragflow_upload_status='queued', ragflow_upload_task_id=task_id, ragflow_upload_error='')
+    if not claimed:
+        current = OcrDocument.objects.filter(id=doc_id).values_list('ragflow_upload_task_id', flat=True).first()
+        return current, False
+
+    try:
+        upload_document_to_ragflow.apply_async(args=[doc_id], kwargs={'kb_name': kb_name}, task_id=task_id)
+    except Exception as e:
+        _set_ragflow_state(doc_id, task_id, 'failed', f"任务入队失败: {e}")
+        raise
+    return task_id, True
+
+
+@shared_task(bind=True, acks_late=True, max_retries=settings.RAGFLOW_UPLOAD_MAX_RETRIES)
+def upload_document_to_ragflow(self, doc_id, kb_name=None, lock_waits=0):
+    """
+    将文档的校对分块增量上传到 RAGFlow (在 RAGFLOW_UPLOAD_QUEUE 队列中执行)
+    网络错误和 RAGFlow 错误按指数退避重试, 重试时先核对已创建的分块, 不会重复上传;
+    同一文档的上传锁被占用时重新入队等待, 等待次数 (lock_waits) 单独计数, 不占用重试次数
+    """
+    task_id = self.request.id
+    doc = OcrDocument.objects.defer('raw_ocr_json', 'corrected_label_studio_json').filter(id=doc_id).first()
+    if doc is None or doc.ragflow_upload_task_id != task_id:
+        logger.info(f"RAGFlow 上传任务 {task_id} 已被取代, 跳过 (Doc ID {doc_id})")
+        return 'superseded'
+    if doc.ragflow_upload_status in ('done', 'failed', 'skipped'):
+        # acks_late 下消息可能被重复投递
+        return doc.ragflow_upload_status
+
+    client = RagflowClient()
+    if not client.is_configured():
+        _set_ragflow_state(doc_id, task_id, 'skipped')
+        _append_log(doc_id, '[跳过] RAGFlow 未配置 API Key\n')
+        return 'skipped'
+
+    # 被取代的旧任务可能仍在执行, 等它结束后再上传, 避免两个任务同时创建分块
+    lock = get_redis().lock(f'ocr:ragflow-upload:{doc_id}', timeout=RAGFLOW_UPLOAD_LOCK_TIMEOUT, blocking=False)
+    if not lock.acquire():
+        # 锁最长持有 RAGFLOW_UPLOAD_LOCK_TIMEOUT 秒, 等待超过该时长仍未获得时放弃
+        if lock_waits * settings.RAGFLOW_UPLOAD_RETRY_BACKOFF >= RAGFLOW_UPLOAD_LOCK_TIMEOUT:
+            _set_ragflow_state(doc_id, task_id, 'failed', '同一文档的另一个上传任务仍在执行')
+            return 'locked'
+        # 以同一任务 ID 重新入队 (仍是当前有效的上传任务), retries 保持不变
+        self.apply_async(args=[doc_id], kwargs={'kb_name': kb_name, 'lock_waits': lock_waits + 1},
+                         task_id=task_id, retries=self.request.retries,
+                         countdown=settings.RAGFLOW_UPLOAD_RETRY_BACKOFF)
+        return 'waiting'
+
+    kb_name = kb_name or settings.RAGFLOW_KB_NAME
+    try:
+        _set_ragflow_state(doc_id, task_id, 'running')
+        if not self.request.retries:
+            _append_log(doc_id, f'[信息] 正在上传分块到 RAGFlow 知识库 {kb_name}...\n')
+        # 重试或等待过其他任务时, RAGFlow 中可能已有未记录的分块, 先核对
+        summary = upload_document_chunks(doc, client, kb_name, reconcile=bool(self.request.retries or lock_waits))
+
+    except (requests.exceptions.RequestException, RagflowError) as e:
+        if self.request.retries < self.max_retries:
+            countdown = min(settings.RAGFLOW_UPLOAD_RETRY_BACKOFF * 2 ** self.request.retries,
+                            settings.RAGFLOW_UPLOAD_RETRY_BACKOFF_MAX)
+            countdown = countdown * (0.5 + random.random() / 2)
+            _set_ragflow_state(doc_id, task_id, 'retrying', str(e))
+            _append_log(doc_id, f'⚠️  上传到 RAGFlow 失败, {countdown:.0f} 秒后重试: {str(e)}\n')
+            raise self.retry(exc=e, countdown=countdown)
+        _set_ragflow_state(doc_id, task_id, 'failed', str(e))
+        _append_log(doc_id, '⚠️  上传到 RAGFlow 失败,请手动重试\n')
+        raise
+    except Exception as e:
+        logger.error(f"Error uploading chunks to RAGFlow: {e}", exc_info=True)
+        _set_ragflow_state(doc_id, task_id, 'failed', str(e))
+        _append_log(doc_id, f'⚠️  上传到 RAGFlow 失败: {str(e)}\n')
+        raise
+    finally:
+        try:
+            lock.release()
+        except Exception:
+            pass
+
+    _append_log(doc_id, f'✅ 已上传 {summary["chunk_count"]} 个分块到 RAGFlow 知识库 {kb_name} '
+                        f'(新增 {summary["added"]}, 未变化 {summary["unchanged"]}, 删除 {summary["deleted"]})\n')
+    _set_ragflow_state(doc_id, task_id, 'done')
+    return summary
@@ -2,19 +2,27 @@ from django.urls import path
 from .views import (
     DocumentListView, 
     DocumentDetailView, 
+    DocumentLogView,
+    DocumentEventsView,
     DocumentUploadView, 
+    DocumentBatchUploadView,
     LabelStudioTaskView,
     SubmitCorrectionView,
     GenerateRAGFlowPayloadView,
     IngestToRagflowView,  # 新增: 接收校对数据并转换为 RAGFlow 格式
+    UploadToRagflowView,
     PushToLabelStudioView,  # 新增: 手动推送到 Label Studio
+    LabelStudioWebhookView,
     ServeImageView  # 新增: 静态图片服务
 )
 
 urlpatterns = [
     path('documents/', DocumentListView.as_view(), name='document_list'),
     path('documents/upload/', DocumentUploadView.as_view(), name='document_upload'),
+    path('documents/batch-upload/', DocumentBatchUploadView.as_view(), name='document_batch_upload'),
     path('documents/<int:pk>/', DocumentDetailView.as_view(), name='document_detail'),
+    path('documents/<int:pk>/log/', DocumentLogView.as_view(), name='document_log'),
+    path('documents/<int:pk>/events/', DocumentEventsView.as_view(), name='document_events'),
     
     path('documents/<int:pk>/to-label-studio/', LabelStudioTaskView.as_view(), name='download_raw_ocr'),
     
@@ -25,10 +33,16 @@ urlpatterns = [
 
     # RAGFlow 转换和下载的端点
     path('documents/<int:pk>/to-ragflow/', GenerateRAGFlowPayloadView.as_view(), name='generate_ragflow_payload'),
+
+    # 上传分块到 RAGFlow 知识库 (异步)
+    path('documents/<int:pk>/upload-to-ragflow/', UploadToRagflowView.as_view(), name='upload_to_ragflow'),
     
     # 新增: 手动推送到 Label Studio
     path('documents/<int:pk>/push-to-labelstudio/', PushToLabelStudioView.as_view(), name='push_to_labelstudio'),
     
+    # Label Studio 标注事件 (ANNOTATION_CREATED / ANNOTATION_UPDATED)
+    path('webhooks/label-studio/', LabelStudioWebhookView.as_view(), name='label_studio_webhook'),
+    
     # 新增: 静态图片服务 (为 Label Studio 提供图片访问)
     path('images/<str:document_id>/<str:filename>', ServeImageView.as_view(), name='serve_image'),
 ]
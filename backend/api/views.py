@@ -1,121 +1,84 @@
 import subprocess
 import os
-import json
+import hmac
 import logging
 from pathlib import Path
 import requests
-import uuid
 import shutil
 import mimetypes
+import zipfile
+import time
+import redis
 
-from django.utils.text import get_valid_filename
-import unidecode
-
-from django.http import JsonResponse, HttpResponse, FileResponse, Http404
-from django.core.files.storage import FileSystemStorage
+from django.http import JsonResponse, HttpResponse, FileResponse, Http404, StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.conf import settings
+from django.urls import reverse
+from django.db.models import Q, BooleanField, ExpressionWrapper, Exists, OuterRef
 from pdf2image import convert_from_path
 
-from .models import OcrDocument
-from .serializers import OcrDocumentSerializer
-from .tasks import process_pdf_with_mineru
+from .models import OcrDocument, OcrPage
+from .serializers import OcrDocumentSerializer, OcrDocumentSummarySerializer
+from .pagination import DocumentCursorPagination
+from .tasks import enqueue_label_studio_push, enqueue_ragflow_upload
+from .ingest import create_documents, ingest_zip, is_pdf_name, is_zip_name, store_upload
+from .dedup import release_duplicates
 from .label_studio_utils import LabelStudioClient
+from .ragflow_utils import RagflowClient
+from .processing_log import read_log_lines
+from .events import get_redis, channel_name, TERMINAL_STATUSES
+from .renderers import FastJSONRenderer, EventStreamRenderer
+from . import json_codec
+from .streaming import blob_download_response, iter_json_document, etag_matches, not_modified
+from .ragflow_chunker import (
+    CHUNKER_VERSION, chunk_params, iter_document_chunks, iter_task_chunks, iter_payload_json, iter_payload_ndjson
+)
+from .payload_cache import cache_key, get_payload_cache
+from .corrections import (
+    correction_version, has_corrections, save_page_annotations, save_uploaded_corrections
+)
 
 logger = logging.getLogger(__name__)
 
 DATA_ROOT = settings.DATA_ROOT_PATH
-PDF_UPLOAD_DIR = DATA_ROOT / 'data' / 'pdfs_to_process'
 BASE_OUTPUT_DIR = DATA_ROOT / 'data' / 'mineru_output'
 POPPLER_PATH = os.getenv('POPPLER_PATH', None)
 
-# The helper functions _create_ls_region and _generate_ls_tasks remain unchanged.
-# ... (您的 _create_ls_region 和 _generate_ls_tasks 函数放在这里)
-def _create_ls_region(bbox, page_dims, label, text_content=None):
-    page_width, page_height = page_dims
-    x1, y1, x2, y2 = bbox
-    if page_width == 0 or page_height == 0: return []
-    x = (x1 / page_width) * 100; y = (y1 / page_height) * 100
-    width = ((x2 - x1) / page_width) * 100; height = ((y2 - y1) / page_height) * 100
-    region_id = f"ls_{uuid.uuid4().hex[:10]}"
-    results = [{"id": region_id, "from_name": "bbox", "to_name": "image", "type": "rectanglelabels", "value": {"x": x, "y": y, "width": width, "height": height, "rotation": 0, "rectanglelabels": [label]}}]
-    if text_content and text_content.strip():
-        results.append({"id": region_id, "from_name": "transcription", "to_name": "image", "type": "textarea", "value": {"text": [text_content.strip()]}})
-    return results
-
-def _generate_ls_tasks(mineru_data, doc: OcrDocument, unique_folder_name: str):
-    ls_tasks = []
-    task_output_dir = BASE_OUTPUT_DIR / unique_folder_name
-    pdf_info = mineru_data.get('pdf_info', [])
-    if not pdf_info: raise ValueError("Invalid MinerU JSON format: 'pdf_info' key missing.")
-    # 映射到 label_studio_config.xml 中定义的标签名称
-    type_mapping = {
-        'text': 'Para',      # 对应 <Label value="Para" />
-        'title': 'Title', 
-        'list': 'List', 
-        'figure': 'Figure', 
-        'foot': 'Footer',    # 对应 <Label value="Footer" />
-        'head': 'Header',    # 对应 <Label value="Header" />
-        'equation': 'Formula',  # 对应 <Label value="Formula" />
-        'table': 'Table'
-    }
-    
-    # 获取 PDF 文件名
-    pdf_path = Path(doc.original_pdf_path)
-    total_pages = len(pdf_info)
-    
-    for page_data in pdf_info:
-        page_index = page_data.get('page_idx', 0)
-        page_num = page_index + 1
-        page_size = page_data.get('page_size')
-        if not page_size or len(page_size) != 2 or page_size[0] == 0 or page_size[1] == 0:
-            logger.warning(f"Page size missing or invalid for page {page_index}. Skipping."); continue
-        page_dims = (page_size[0], page_size[1])
-        page_filename = f"page-{str(page_num).zfill(4)}.jpg"
-        image_path = task_output_dir / "pages" / page_filename
-        if not image_path.exists():
-            logger.warning(f"Could not find image for page {page_num} at expected path: {image_path}"); continue
-        
-        # 使用 HTTP URL 格式访问图片
-        backend_url = os.getenv('BACKEND_EXTERNAL_URL', 'http://localhost:8010')
-        image_url = f"{backend_url}/api/images/{unique_folder_name}/{page_filename}"
-        
-        # 添加完整的元数据
-        task = {
-            "data": {
-                "image": image_url,
-                "doc_id": doc.id,
-                "page_num": page_num,
-                "total_pages": total_pages,
-                "filename": pdf_path.name
-            },
-            "predictions": [{"result": []}]
-        }
-        
-        all_blocks = page_data.get('para_blocks', []) + page_data.get('preproc_blocks', [])
-        for block in all_blocks:
-            block_type = block.get('type')
-            label = type_mapping.get(block_type, 'Unknown')
-            if block_type == 'figure':
-                if 'bbox' in block: task["predictions"][0]["result"].extend(_create_ls_region(block['bbox'], page_dims, 'Figure'))
-                for line in block.get('lines', []):
-                    if 'bbox' in line: task["predictions"][0]["result"].extend(_create_ls_region(line['bbox'], page_dims, 'Text', ''.join(s.get('content', '') for s in line.get('spans', []))))
-            elif block_type in ['text', 'title', 'list', 'foot', 'head']:
-                for line in block.get('lines', []):
-                    if 'bbox' in line: task["predictions"][0]["result"].extend(_create_ls_region(line['bbox'], page_dims, label, ''.join(s.get('content', '') for s in line.get('spans', []))))
-            elif 'bbox' in block:
-                task["predictions"][0]["result"].extend(_create_ls_region(block['bbox'], page_dims, label))
-        if task["predictions"][0]["result"]: ls_tasks.append(task)
-    return ls_tasks
-
+# SSE 单次连接的最长时间, 需小于 gunicorn 的 --timeout, 到期后由 EventSource 自动重连续传
+SSE_MAX_DURATION = 240
+SSE_HEARTBEAT_INTERVAL = 15
+# Redis 不可用时退化为定时查库的间隔
+SSE_FALLBACK_POLL_INTERVAL = 2
+LONG_POLL_MAX_TIMEOUT = 30
 
 class DocumentListView(APIView):
+    """
+    文档列表 (轻量字段 + 游标分页)
+    GET /api/documents/?status=processing,failed&page_size=50&cursor=...
+    OCR / 校对 JSON 和处理日志请通过 /api/documents/<pk>/ 获取
+    """
     def get(self, request, *args, **kwargs):
-        documents = OcrDocument.objects.all().order_by('-created_at')
-        serializer = OcrDocumentSerializer(documents, many=True)
-        return Response(serializer.data)
+        documents = OcrDocument.objects.only(*OcrDocumentSummarySerializer.LIST_COLUMNS).annotate(
+            has_raw_ocr=ExpressionWrapper(
+                Q(raw_ocr_ref__isnull=False) | Q(raw_ocr_json__isnull=False), output_field=BooleanField()
+            ),
+            has_corrections=ExpressionWrapper(
+                Q(corrected_json_ref__isnull=False) | Q(corrected_label_studio_json__isnull=False)
+                | Exists(OcrPage.objects.filter(document=OuterRef('pk'), corrected_annotation__isnull=False)),
+                output_field=BooleanField()
+            ),
+        )
+
+        status_filter = request.query_params.get('status')
+        if status_filter:
+            documents = documents.filter(status__in=[s.strip() for s in status_filter.split(',') if s.strip()])
+
+        paginator = DocumentCursorPagination()
+        page = paginator.paginate_queryset(documents, request, view=self)
+        serializer = OcrDocumentSummarySerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 class DocumentDetailView(APIView):
     def get_object(self, pk):
@@ -137,42 +100,257 @@ class DocumentDetailView(APIView):
             return Response({"error": "Document not found"}, status=status.HTTP_404_NOT_FOUND)
         
         try:
+            # 内容重复的文档共用输出目录 (见 dedup), 只有没有其他文档引用时才删除文件
+            others = OcrDocument.objects.exclude(id=doc.id)
             if doc.original_pdf_path and os.path.exists(doc.original_pdf_path):
-                os.remove(doc.original_pdf_path)
+                if not others.filter(original_pdf_path=doc.original_pdf_path).exists():
+                    os.remove(doc.original_pdf_path)
             if doc.mineru_json_path:
                 output_dir_parent = Path(doc.mineru_json_path).parents[2] 
                 if os.path.isdir(output_dir_parent) and output_dir_parent.name != 'mineru_output':
-                    shutil.rmtree(output_dir_parent)
+                    if others.filter(mineru_json_path__startswith=f'{output_dir_parent}{os.sep}').exists():
+                        logger.info(f"文档 {pk} 的输出目录仍被其他文档引用, 保留 {output_dir_parent}")
+                    else:
+                        shutil.rmtree(output_dir_parent)
         except Exception as e:
             logger.error(f"Error deleting associated files for doc ID {pk}: {e}")
         
+        # 复用本文档 Label Studio 任务的重复文档由最早的一个接管任务
+        new_owner_id = release_duplicates(doc)
+        if new_owner_id:
+            logger.info(f"文档 {pk} 的 Label Studio 任务由重复文档 {new_owner_id} 接管")
         doc.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class DocumentLogView(APIView):
+    """
+    增量读取处理日志
+    GET /api/documents/<pk>/log/?after=<行ID>&limit=<行数>
+    """
+    def get(self, request, pk, *args, **kwargs):
+        doc = OcrDocument.objects.filter(pk=pk).only('id', 'status', 'processing_log').first()
+        if doc is None:
+            return Response({"error": "Document not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            after_id = int(request.query_params.get('after', 0))
+            limit = int(request.query_params.get('limit', 0)) or None
+        except ValueError:
+            return Response({"error": "after/limit 必须是整数"}, status=status.HTTP_400_BAD_REQUEST)
+
+        lines = read_log_lines(doc.id, after_id=after_id, limit=limit)
+        return Response({
+            "status": doc.status,
+            # 旧版文本日志只在首次读取时返回
+            "legacy_log": doc.processing_log if not after_id else '',
+            "lines": lines,
+            "last_id": lines[-1]['id'] if lines else after_id,
+        })
+
+
+def _sse_message(event, data, event_id=None):
+    """格式化一条 SSE 消息"""
+    message = f'id: {event_id}\n' if event_id is not None else ''
+    return message + f'event: {event}\ndata: {json_codec.dumps_str(data)}\n\n'
+
+
+def _wait_for_event(pubsub, timeout):
+    """
+    等待一条文档事件, 超时返回 None
+    pubsub 为 None (Redis 不可用) 时睡眠一段时间后返回 poll, 由调用方查库
+    """
+    if pubsub is None:
+        time.sleep(min(timeout, SSE_FALLBACK_POLL_INTERVAL))
+        return {'event': 'poll'}
+
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        message = pubsub.get_message(timeout=remaining)
+        if message and message.get('type') == 'message':
+            return json_codec.loads(message['data'])
+
+
+def _subscribe(doc_id):
+    """订阅文档事件频道, Redis 不可用时返回 None"""
+    try:
+        pubsub = get_redis().pubsub()
+        pubsub.subscribe(channel_name(doc_id))
+        return pubsub
+    except redis.RedisError as e:
+        logger.warning(f"订阅文档 {doc_id} 事件失败, 退化为查库轮询: {e}")
+        return None
+
+
+def _get_status(doc_id):
+    return OcrDocument.objects.filter(id=doc_id).values_list('status', flat=True).first()
+
+
+class DocumentEventsView(APIView):
+    """
+    文档处理进度推送
+    GET /api/documents/<pk>/events/
+    - Accept: text/event-stream: SSE 流, 推送 log / status / progress 事件, 支持 Last-Event-ID 断点续传
+    - 其他: 长轮询, ?after=<行ID>&timeout=<秒>, 有新事件或超时后返回 JSON
+    事件由 Celery 任务通过 Redis pub/sub 发布, 日志内容以数据库为准
+    """
+    renderer_classes = [FastJSONRenderer, EventStreamRenderer]
+
+    def get(self, request, pk, *args, **kwargs):
+        if not OcrDocument.objects.filter(pk=pk).exists():
+            return Response({"error": "Document not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            after_id = int(request.headers.get('Last-Event-ID') or request.query_params.get('after', 0))
+            timeout = min(float(request.query_params.get('timeout', LONG_POLL_MAX_TIMEOUT)), LONG_POLL_MAX_TIMEOUT)
+        except ValueError:
+            return Response({"error": "after/timeout 参数格式错误"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.accepted_renderer.format == EventStreamRenderer.format:
+            response = StreamingHttpResponse(
+                self._event_stream(pk, after_id),
+                content_type='text/event-stream; charset=utf-8'
+            )
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'  # 禁止反向代理缓冲
+            return response
+
+        return self._long_poll(pk, after_id, timeout)
+
+    def _long_poll(self, doc_id, after_id, timeout):
+        progress = None
+        pubsub = _subscribe(doc_id)
+        try:
+            # 先订阅再查库, 避免两者之间发布的事件丢失
+            lines = read_log_lines(doc_id, after_id=after_id)
+            if not lines and _get_status(doc_id) not in TERMINAL_STATUSES and pubsub is not None:
+                payload = _wait_for_event(pubsub, timeout)
+                if payload and payload.get('event') == 'progress':
+                    progress = payload.get('data')
+                lines = read_log_lines(doc_id, after_id=after_id)
+        finally:
+            if pubsub is not None:
+                pubsub.close()
+
+        return Response({
+            "status": _get_status(doc_id),
+            "lines": lines,
+            "last_id": lines[-1]['id'] if lines else after_id,
+            "progress": progress,
+        })
+
+    def _event_stream(self, doc_id, last_id):
+        pubsub = _subscribe(doc_id)
+        try:
+            lines = read_log_lines(doc_id, after_id=last_id)
+            if lines:
+                last_id = lines[-1]['id']
+                yield _sse_message('log', {'lines': lines}, last_id)
+
+            current_status = _get_status(doc_id)
+            yield _sse_message('status', {'status': current_status})
+            if current_status in TERMINAL_STATUSES:
+                yield _sse_message('end', {})
+                return
+
+            deadline = time.monotonic() + SSE_MAX_DURATION
+            while time.monotonic() < deadline:
+                payload = _wait_for_event(pubsub, SSE_HEARTBEAT_INTERVAL)
+                if payload is None:
+                    yield ': keep-alive\n\n'
+                    continue
+
+                event = payload.get('event')
+                if event == 'progress':
+                    yield _sse_message('progress', payload.get('data', {}))
+                    continue
+
+                # log / status / poll: 以数据库为准补发新日志
+                lines = read_log_lines(doc_id, after_id=last_id)
+                if lines:
+                    last_id = lines[-1]['id']
+                    yield _sse_message('log', {'lines': lines}, last_id)
+
+                if event in ('status', 'poll'):
+                    new_status = payload.get('data', {}).get('status') or _get_status(doc_id)
+                    if new_status != current_status:
+                        current_status = new_status
+                        yield _sse_message('status', {'status': current_status})
+                    if current_status in TERMINAL_STATUSES:
+                        yield _sse_message('end', {})
+                        return
+        finally:
+            if pubsub is not None:
+                pubsub.close()
+
+
+def _reuse_option(request):
+    """上传请求的 reuse 参数: 未提供时为 None (按 OCR_REUSE_DUPLICATES), false / 0 / no 表示不复用重复文档的结果"""
+    value = request.data.get('reuse')
+    if value is None or value == '':
+        return None
+    return str(value).lower() not in ('0', 'false', 'no')
+
+
 class DocumentUploadView(APIView):
     def post(self, request, *args, **kwargs):
         file_obj = request.FILES.get('file')
         if not file_obj:
             return Response({"error": "No file provided"}, status=status.HTTP_400_BAD_REQUEST)
 
-        ascii_name = unidecode.unidecode(file_obj.name)
-        safe_filename = get_valid_filename(ascii_name)
-
-        os.makedirs(PDF_UPLOAD_DIR, exist_ok=True)
-        fs = FileSystemStorage(location=str(PDF_UPLOAD_DIR))
-        
-        filename = fs.save(safe_filename, file_obj)
-        uploaded_file_path = fs.path(filename)
-        
-        doc = OcrDocument.objects.create(
-            original_pdf_path=uploaded_file_path,
-            status='pending'
-        )
-        process_pdf_with_mineru.delay(doc.id)
+        doc, = create_documents([store_upload(file_obj)], reuse=_reuse_option(request))
         serializer = OcrDocumentSerializer(doc)
         return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
 
+
+class DocumentBatchUploadView(APIView):
+    """
+    批量上传 PDF
+    POST /api/documents/batch-upload/ (multipart): files 字段可以包含多个 PDF 或 ZIP (导入 ZIP 中的所有 PDF),
+    文件流式写入磁盘, 文档按批 bulk_create, 处理任务以 Celery group 分派; reuse=false 时重复的 PDF 也重新处理
+    """
+    def post(self, request, *args, **kwargs):
+        files = request.FILES.getlist('files') or request.FILES.getlist('file')
+        if not files:
+            return Response({"error": "No file provided"}, status=status.HTTP_400_BAD_REQUEST)
+
+        reuse = _reuse_option(request)
+        documents, pdf_files, skipped = [], [], []
+        try:
+            for file_obj in files:
+                if is_zip_name(file_obj.name):
+                    try:
+                        zip_documents, zip_skipped = ingest_zip(file_obj, reuse=reuse)
+                    except zipfile.BadZipFile:
+                        skipped.append({"name": file_obj.name, "reason": "不是有效的 ZIP 文件"})
+                        continue
+                    documents += zip_documents
+                    skipped += [{"name": f"{file_obj.name}/{name}", "reason": "不是 PDF 文件"} for name in zip_skipped]
+                elif is_pdf_name(file_obj.name):
+                    pdf_files.append(store_upload(file_obj))
+                else:
+                    skipped.append({"name": file_obj.name, "reason": "不是 PDF 或 ZIP 文件"})
+            documents += create_documents(pdf_files, reuse=reuse)
+        except Exception as e:
+            logger.error(f"批量上传失败: {e}", exc_info=True)
+            return Response({
+                "error": f"批量上传失败: {str(e)}",
+                "created": [doc.id for doc in documents],
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        logger.info(f"批量上传: 创建 {len(documents)} 个文档, 跳过 {len(skipped)} 个文件")
+        return Response({
+            "count": len(documents),
+            "documents": [
+                {"id": doc.id, "original_pdf_path": doc.original_pdf_path, "status": doc.status}
+                for doc in documents
+            ],
+            "skipped": skipped,
+        }, status=status.HTTP_202_ACCEPTED)
+
 class LabelStudioTaskView(APIView):
     """
     处理对原始OCR JSON数据的请求。
@@ -182,25 +360,31 @@ class LabelStudioTaskView(APIView):
     def get(self, request, pk, *args, **kwargs):
         logger.info(f"--- [GET] 开始为文档ID为 {pk} 的文件提供原始OCR JSON下载 ---")
         try:
-            doc = OcrDocument.objects.get(pk=pk)
+            # 行内 JSON 只在旧数据 (没有 blob 引用) 时才按需加载
+            doc = OcrDocument.objects.defer('raw_ocr_json', 'corrected_label_studio_json').get(pk=pk)
 
             # 现在的失败条件更简单：只检查原始JSON是否存在
-            if not doc.raw_ocr_json:
+            if not doc.has_raw_ocr_json():
                 return Response(
                     {"error": "未找到此文档的原始OCR JSON。可能在处理过程中失败。"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # 将JSON数据（Python字典/列表）转换回字符串
-            json_string = json.dumps(doc.raw_ocr_json, indent=4, ensure_ascii=False)
-
             # 为下载的文件创建一个名称
             original_filename = Path(doc.original_pdf_path).stem
             download_filename = f"{original_filename}_raw_ocr.json"
 
-            # 创建一个HttpResponse对象，设置内容类型和Content-Disposition头
-            # 以便浏览器触发下载操作
-            response = HttpResponse(json_string, content_type='application/json; charset=utf-8')
+            if doc.raw_ocr_ref:
+                # 直接输出 blob (压缩内容或边解压边输出), 支持 ETag / Range, 不在内存中构建完整字符串
+                response = blob_download_response(request, doc.raw_ocr_ref)
+                if response.status_code in (304, 416):
+                    return response
+            else:
+                # 尚未迁移到 blob 存储的旧数据: 逐页序列化输出
+                response = StreamingHttpResponse(
+                    iter_json_document(doc.raw_ocr_json),
+                    content_type='application/json; charset=utf-8'
+                )
             response['Content-Disposition'] = f'attachment; filename="{download_filename}"'
             
             return response
@@ -230,21 +414,21 @@ class SubmitCorrectionView(APIView):
 
         try:
             # 2. 从上传的文件对象中读取并解析JSON
-            corrected_data = json.load(file_obj)
+            corrected_data = json_codec.load(file_obj)
             
             # 简单的验证，确保它是一个列表 (Label Studio 导出的是任务列表)
             if not isinstance(corrected_data, list):
                 return Response({"error": "Invalid JSON format. Expected a list of tasks."}, status=status.HTTP_400_BAD_REQUEST)
 
-            # 3. 保存数据并更新状态
-            doc.corrected_label_studio_json = corrected_data
+            # 3. 按页保存数据并更新状态
+            save_uploaded_corrections(doc, corrected_data)
             doc.status = 'corrected'
-            doc.save()
+            doc.save(update_fields=['status'])
             
             serializer = OcrDocumentSerializer(doc)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
-        except json.JSONDecodeError:
+        except json_codec.JSONDecodeError:
             return Response({"error": "Uploaded file is not a valid JSON."}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             logger.error(f"Error in SubmitCorrectionView for doc ID {pk}: {e}", exc_info=True)
@@ -257,55 +441,54 @@ class GenerateRAGFlowPayloadView(APIView):
     def get(self, request, pk, *args, **kwargs):
         logger.info(f"--- [GET] 开始为文档ID {pk} 生成RAGFlow入库文件 ---")
         try:
-            doc = OcrDocument.objects.get(pk=pk)
+            doc = OcrDocument.objects.defer('raw_ocr_json').get(pk=pk)
 
-            # 1. 检查是否存在校对后的数据
-            if not doc.corrected_label_studio_json:
+            # 1. 检查是否存在校对后的数据 (同时得到校对结果的版本, 用于缓存)
+            version = correction_version(doc)
+            if version is None:
                 return Response(
                     {"error": "未找到校对后的数据(Corrected JSON)。请先上传校对文件。"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # 2. 转换逻辑
-            pages = {}
-            all_tasks_data = doc.corrected_label_studio_json
-            
-            for i, task_data in enumerate(all_tasks_data):
-                annotations = task_data.get('completions') or task_data.get('annotations')
-                if not annotations: continue
-
-                result = annotations[0].get('result', [])
-                page_num = i + 1
-
-                for item in result:
-                    if item.get('type') == 'textarea':
-                        if page_num not in pages:
-                            pages[page_num] = []
-                        text_list = item.get('value', {}).get('text', [])
-                        if text_list:
-                            pages[page_num].append(text_list[0])
-            
-            chunks = []
-            for page_num in sorted(pages.keys()):
-                page_text = "\n".join(pages[page_num])
-                chunks.append({"content_ltxt": page_text})
-            
-            ragflow_payload = {
+            # 2. 转换逻辑: 按页分块 (Label Studio 按页同步的结果覆盖上传的 JSON), ?output=ndjson 时每行一个分块
+            header = {
                 "doc_id": Path(doc.original_pdf_path).name,
-                "kb_name": "test_kb", # 您可以稍后将其更改为动态值
-                "chunks": chunks
+                "kb_name": settings.RAGFLOW_KB_NAME,
             }
-            
+            output = 'ndjson' if request.query_params.get('output') == 'ndjson' else 'json'
+
             # 3. 更新状态为 'ingested'
-            doc.status = 'ingested'
-            doc.save(update_fields=['status'])
+            if doc.status != 'ingested':
+                doc.status = 'ingested'
+                doc.save(update_fields=['status'])
 
-            # 4. 将结果作为可下载文件提供
-            json_string = json.dumps(ragflow_payload, indent=4, ensure_ascii=False)
-            original_filename = Path(doc.original_pdf_path).stem
-            download_filename = f"{original_filename}_ragflow_payload.json"
+            # 4. 校对结果和分块参数不变时 payload 不变: 按其哈希做 ETag, 生成结果缓存在磁盘上
+            key = cache_key('ragflow_payload', CHUNKER_VERSION, version, header, chunk_params(), output)
+            etag = f'"{key}"'
+            if etag_matches(request, key):
+                return not_modified(etag)
 
-            response = HttpResponse(json_string, content_type='application/json; charset=utf-8')
+            original_filename = Path(doc.original_pdf_path).stem
+            if output == 'ndjson':
+                download_filename = f"{original_filename}_ragflow_payload.ndjson"
+                content_type = 'application/x-ndjson; charset=utf-8'
+                encode = iter_payload_ndjson
+            else:
+                download_filename = f"{original_filename}_ragflow_payload.json"
+                content_type = 'application/json; charset=utf-8'
+                encode = iter_payload_json
+
+            cache = get_payload_cache()
+            cached_path = cache.get(key)
+            if cached_path is not None:
+                response = FileResponse(open(cached_path, 'rb'), content_type=content_type)
+            else:
+                # 逐页流式输出, 同时写入缓存
+                response = StreamingHttpResponse(
+                    cache.iter_and_store(key, encode(header, iter_document_chunks(doc))), content_type=content_type
+                )
+            response['ETag'] = etag
             response['Content-Disposition'] = f'attachment; filename="{download_filename}"'
             
             return response
@@ -336,7 +519,7 @@ class IngestToRagflowView(APIView):
             file_obj = request.FILES.get('file')
             if file_obj:
                 logger.info(f"从上传文件中读取校对数据")
-                corrected_data = json.load(file_obj)
+                corrected_data = json_codec.load(file_obj)
             else:
                 # 尝试从 request body 中读取 JSON
                 corrected_data = request.data
@@ -350,67 +533,48 @@ class IngestToRagflowView(APIView):
             
             logger.info(f"收到 {len(corrected_data)} 个任务的校对数据")
             
-            # 保存校对后的数据
-            doc.corrected_label_studio_json = corrected_data
-            
-            # 转换为 RAGFlow 格式
-            pages = {}
-            
-            for i, task_data in enumerate(corrected_data):
-                # Label Studio 导出的数据可能使用 'annotations' 或 'completions'
-                annotations = task_data.get('annotations') or task_data.get('completions')
-                
-                if not annotations:
-                    logger.warning(f"任务 {i} 没有标注数据，跳过")
-                    continue
-                
-                # 获取第一个标注结果
-                result = annotations[0].get('result', [])
-                page_num = task_data.get('data', {}).get('page_num', i + 1)
-                
-                logger.debug(f"处理第 {page_num} 页，包含 {len(result)} 个标注项")
-                
-                # 提取文本内容
-                for item in result:
-                    if item.get('type') == 'textarea':
-                        if page_num not in pages:
-                            pages[page_num] = []
-                        text_list = item.get('value', {}).get('text', [])
-                        if text_list:
-                            pages[page_num].append(text_list[0])
+            # 按页保存校对后的数据
+            save_uploaded_corrections(doc, corrected_data)
             
-            # 生成 RAGFlow chunks
-            chunks = []
-            for page_num in sorted(pages.keys()):
-                page_text = "\n".join(pages[page_num])
-                if page_text.strip():  # 只添加非空内容
-                    chunks.append({"content_ltxt": page_text})
+            # 转换为 RAGFlow 格式: 按页分块, 空白区域不生成分块
+            chunks = list(iter_task_chunks(corrected_data))
             
             logger.info(f"生成了 {len(chunks)} 个文本块")
             
             # 构建 RAGFlow payload
             ragflow_payload = {
                 "doc_id": Path(doc.original_pdf_path).name,
-                "kb_name": "test_kb",
+                "kb_name": settings.RAGFLOW_KB_NAME,
                 "chunks": chunks
             }
             
             # 更新状态
             doc.status = 'ingested'
-            doc.save()
+            doc.save(update_fields=['status'])
             
             logger.info(f"文档 {pk} 校对数据已保存，状态更新为 'ingested'")
             
+            # 已配置 RAGFlow 时在后台直接上传 (校对结果已更新, 取代尚未完成的上传)
+            ragflow_upload = None
+            if RagflowClient().is_configured():
+                task_id, _ = enqueue_ragflow_upload(doc.id, force=True)
+                ragflow_upload = {
+                    "task_id": task_id,
+                    "status_url": request.build_absolute_uri(reverse('upload_to_ragflow', args=[doc.id])),
+                }
+                doc.refresh_from_db(fields=['ragflow_upload_status', 'ragflow_upload_task_id', 'ragflow_upload_error'])
+            
             # 返回成功响应
             serializer = OcrDocumentSerializer(doc)
             return Response({
                 "message": "校对数据已保存并转换为 RAGFlow 格式",
                 "document": serializer.data,
                 "chunks_count": len(chunks),
-                "ragflow_payload": ragflow_payload
+                "ragflow_payload": ragflow_payload,
+                "ragflow_upload": ragflow_upload,
             }, status=status.HTTP_200_OK)
             
-        except json.JSONDecodeError as e:
+        except json_codec.JSONDecodeError as e:
             logger.error(f"JSON 解析失败: {e}")
             return Response({
                 "error": "上传的文件不是有效的 JSON 格式"
@@ -422,14 +586,96 @@ class IngestToRagflowView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class UploadToRagflowView(APIView):
+    """
+    将校对后的分块上传到 RAGFlow 知识库
+    上传在后台队列中异步执行: POST 返回 202 和任务 ID (可选参数 kb_name / force), GET 查询上传状态
+    """
+    def _upload_status(self, request, doc):
+        return {
+            "upload_status": doc.ragflow_upload_status,
+            "task_id": doc.ragflow_upload_task_id,
+            "error": doc.ragflow_upload_error,
+            "dataset_id": doc.ragflow_dataset_id,
+            "document_id": doc.ragflow_document_id,
+            "upload_time": doc.ragflow_upload_time,
+            "chunk_count": doc.ragflow_chunks.count(),
+            "status_url": request.build_absolute_uri(reverse('upload_to_ragflow', args=[doc.id])),
+        }
+
+    def get(self, request, pk, *args, **kwargs):
+        try:
+            doc = OcrDocument.objects.only(
+                'id', 'ragflow_upload_status', 'ragflow_upload_task_id', 'ragflow_upload_error',
+                'ragflow_dataset_id', 'ragflow_document_id', 'ragflow_upload_time'
+            ).get(id=pk)
+            return Response(self._upload_status(request, doc), status=status.HTTP_200_OK)
+        except OcrDocument.DoesNotExist:
+            return Response({"error": "文档未找到"}, status=status.HTTP_404_NOT_FOUND)
+
+    def post(self, request, pk, *args, **kwargs):
+        try:
+            doc = OcrDocument.objects.defer('raw_ocr_json', 'corrected_label_studio_json').get(id=pk)
+
+            if not has_corrections(doc):
+                return Response({
+                    "error": "未找到校对后的数据,请先完成校对"
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            if not RagflowClient().is_configured():
+                return Response({
+                    "error": "RAGFlow 未配置,请设置 RAGFLOW_API_KEY"
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            kb_name = request.data.get('kb_name') or settings.RAGFLOW_KB_NAME
+            task_id, created = enqueue_ragflow_upload(doc.id, kb_name=kb_name, force=bool(request.data.get('force', False)))
+            doc.refresh_from_db(fields=['ragflow_upload_status', 'ragflow_upload_task_id', 'ragflow_upload_error'])
+
+            data = self._upload_status(request, doc)
+            data["kb_name"] = kb_name
+            data["message"] = "已加入 RAGFlow 上传队列" if created else "文档已在 RAGFlow 上传队列中"
+            data["enqueued"] = created
+            return Response(data, status=status.HTTP_202_ACCEPTED)
+
+        except OcrDocument.DoesNotExist:
+            return Response({"error": "文档未找到"}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error(f"上传文档 {pk} 到 RAGFlow 失败: {e}", exc_info=True)
+            return Response({
+                "error": f"上传失败: {str(e)}"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class PushToLabelStudioView(APIView):
     """
     手动推送文档到 Label Studio
     支持检查是否已推送和强制重新推送
+    推送在 Label Studio 队列中异步执行: POST 返回 202 和任务 ID, GET 查询推送状态
     """
+    def _push_status(self, request, doc):
+        return {
+            "push_status": doc.label_studio_push_status,
+            "task_id": doc.label_studio_push_task_id,
+            "error": doc.label_studio_push_error,
+            "synced": doc.label_studio_synced,
+            "task_ids": doc.label_studio_task_ids,
+            "sync_time": doc.label_studio_sync_time,
+            "status_url": request.build_absolute_uri(reverse('push_to_labelstudio', args=[doc.id])),
+        }
+
+    def get(self, request, pk, *args, **kwargs):
+        try:
+            doc = OcrDocument.objects.only(
+                'id', 'label_studio_push_status', 'label_studio_push_task_id', 'label_studio_push_error',
+                'label_studio_synced', 'label_studio_task_ids', 'label_studio_sync_time'
+            ).get(id=pk)
+            return Response(self._push_status(request, doc), status=status.HTTP_200_OK)
+        except OcrDocument.DoesNotExist:
+            return Response({"error": "文档未找到"}, status=status.HTTP_404_NOT_FOUND)
+
     def post(self, request, pk, *args, **kwargs):
         try:
-            doc = OcrDocument.objects.get(id=pk)
+            doc = OcrDocument.objects.defer('raw_ocr_json', 'corrected_label_studio_json').get(id=pk)
             
             # 检查文档是否已处理完成
             if doc.status not in ['processed', 'corrected', 'ingested']:
@@ -451,8 +697,6 @@ class PushToLabelStudioView(APIView):
                     "hint": "如需重新推送,请设置 force=true"
                 }, status=status.HTTP_200_OK)
             
-            # 执行推送
-            from django.utils import timezone
             ls_client = LabelStudioClient()
             
             if not ls_client.is_configured():
@@ -460,61 +704,24 @@ class PushToLabelStudioView(APIView):
                     "error": "Label Studio 未配置,请设置 LABEL_STUDIO_API_KEY"
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # 读取 MinerU JSON 并生成包含预标注的任务
             if not doc.mineru_json_path:
                 return Response({
                     "error": "未找到处理结果文件"
                 }, status=status.HTTP_404_NOT_FOUND)
             
-            mineru_json_path = Path(doc.mineru_json_path)
-            
-            if not mineru_json_path.exists():
+            if not doc.has_raw_ocr_json() and not Path(doc.mineru_json_path).exists():
                 return Response({
                     "error": "处理结果文件不存在"
                 }, status=status.HTTP_404_NOT_FOUND)
             
-            # 读取 MinerU JSON 数据
-            try:
-                with open(mineru_json_path, 'r', encoding='utf-8') as f:
-                    mineru_data = json.load(f)
-            except Exception as e:
-                logger.error(f"读取 MinerU JSON 失败: {e}")
-                return Response({
-                    "error": f"读取处理结果失败: {str(e)}"
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-            # 使用 _generate_ls_tasks 生成包含预标注的任务
-            output_dir = mineru_json_path.parents[2]
-            unique_folder_name = output_dir.name
-            
-            try:
-                tasks_data = _generate_ls_tasks(mineru_data, doc, unique_folder_name)
-            except Exception as e:
-                logger.error(f"生成 Label Studio 任务失败: {e}", exc_info=True)
-                return Response({
-                    "error": f"生成任务失败: {str(e)}"
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-            # 批量创建任务
-            result = ls_client.create_tasks_batch(tasks_data)
+            # 加入推送队列 (force=true 时只重新推送有变化的页面); 已有推送在排队时返回该任务
+            task_id, created = enqueue_label_studio_push(doc.id, force=bool(force))
+            doc.refresh_from_db(fields=['label_studio_push_status', 'label_studio_push_task_id', 'label_studio_push_error'])
             
-            if result:
-                task_ids = result.get('task_ids', [])
-                doc.label_studio_synced = True
-                doc.label_studio_task_ids = task_ids
-                doc.label_studio_sync_time = timezone.now()
-                doc.save(update_fields=['label_studio_synced', 'label_studio_task_ids', 'label_studio_sync_time'])
-                
-                return Response({
-                    "message": f"成功推送 {len(tasks_data)} 个任务到 Label Studio",
-                    "task_count": len(tasks_data),
-                    "task_ids": task_ids,
-                    "sync_time": doc.label_studio_sync_time
-                }, status=status.HTTP_200_OK)
-            else:
-                return Response({
-                    "error": "推送到 Label Studio 失败,请检查配置和日志"
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            data = self._push_status(request, doc)
+            data["message"] = "已加入 Label Studio 推送队列" if created else "文档已在 Label Studio 推送队列中"
+            data["enqueued"] = created
+            return Response(data, status=status.HTTP_202_ACCEPTED)
                 
         except OcrDocument.DoesNotExist:
             return Response({"error": "文档未找到"}, status=status.HTTP_404_NOT_FOUND)
@@ -525,6 +732,93 @@ class PushToLabelStudioView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class LabelStudioWebhookView(APIView):
+    """
+    Label Studio webhook 接收端
+    POST /api/webhooks/label-studio/
+    处理 ANNOTATION_CREATED / ANNOTATION_UPDATED 事件: 按任务数据中的 doc_id / page_num 找到对应页面,
+    只更新该页的校对结果和分块文本; 复用了该任务的重复文档 (见 dedup) 同时更新;
+    请求头 X-Webhook-Secret 必须与 LABEL_STUDIO_WEBHOOK_SECRET 一致
+    """
+    HANDLED_ACTIONS = ('ANNOTATION_CREATED', 'ANNOTATION_UPDATED')
+
+    @staticmethod
+    def _is_document_task(doc, task_id, page_num):
+        page_task_id = OcrPage.objects.filter(document=doc, page_num=page_num).values_list(
+            'label_studio_task_id', flat=True).first()
+        if page_task_id:
+            return page_task_id == task_id
+        return task_id in (doc.label_studio_task_ids or [])
+
+    @staticmethod
+    def _shared_documents(task_id, page_num, exclude_id):
+        """复用了同一任务的其他文档 (内容重复的 PDF 共用 Label Studio 任务)"""
+        return list(
+            OcrDocument.objects.only('id', 'status', 'label_studio_task_ids')
+            .filter(pages__page_num=page_num, pages__label_studio_task_id=task_id)
+            .exclude(id=exclude_id)
+        )
+
+    def post(self, request, *args, **kwargs):
+        secret = settings.LABEL_STUDIO_WEBHOOK_SECRET
+        if not secret:
+            return Response({"error": "Webhook 未配置,请设置 LABEL_STUDIO_WEBHOOK_SECRET"}, status=status.HTTP_403_FORBIDDEN)
+        if not hmac.compare_digest(request.headers.get('X-Webhook-Secret', ''), secret):
+            return Response({"error": "Webhook 密钥无效"}, status=status.HTTP_403_FORBIDDEN)
+
+        payload = request.data
+        if not isinstance(payload, dict):
+            return Response({"error": "Invalid JSON format. Expected an object."}, status=status.HTTP_400_BAD_REQUEST)
+
+        action = payload.get('action')
+        if action not in self.HANDLED_ACTIONS:
+            return Response({"ignored": True, "action": action}, status=status.HTTP_200_OK)
+
+        task = payload.get('task') or {}
+        annotation = payload.get('annotation') or {}
+        task_id = task.get('id') or annotation.get('task')
+        data = task.get('data') or {}
+        doc_id, page_num = data.get('doc_id'), data.get('page_num')
+        if not task_id or doc_id is None or page_num is None or not annotation.get('id'):
+            logger.warning(f"Label Studio webhook ({action}) 缺少任务或标注数据: task={task_id}, data={data}")
+            return Response({"error": "缺少任务或标注数据"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            task_id, doc_id, page_num = int(task_id), int(doc_id), int(page_num)
+        except (TypeError, ValueError):
+            logger.warning(f"Label Studio webhook ({action}) 的任务数据格式错误: task={task_id}, data={data}")
+            return Response({"error": "任务 ID / doc_id / page_num 必须是整数"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # 无法对应到文档页面的事件返回 200, 避免 Label Studio 反复重发
+            doc = OcrDocument.objects.only('id', 'status', 'label_studio_task_ids').filter(id=doc_id).first()
+            documents = [doc] if doc is not None and self._is_document_task(doc, task_id, page_num) else []
+            # 任务数据中的 doc_id 是推送任务的原文档, 复用任务的重复文档 (以及原文档删除后的接管者) 同时更新
+            documents += self._shared_documents(task_id, page_num, exclude_id=doc_id)
+            if not documents:
+                reason = "文档不存在" if doc is None else "任务不属于该文档"
+                return Response({"ignored": True, "reason": reason}, status=status.HTTP_200_OK)
+            if annotation.get('was_cancelled'):
+                return Response({"ignored": True, "reason": "标注已取消"}, status=status.HTTP_200_OK)
+
+            updated_pages = []
+            for target in documents:
+                pages = save_page_annotations(target, [(page_num, {'id': task_id, 'data': data}, annotation)])
+                if pages:
+                    logger.info(f"Label Studio webhook ({action}): 文档 {target.id} 第 {page_num} 页已更新")
+                if target.id == documents[0].id:
+                    updated_pages = pages
+            return Response({
+                "document_id": documents[0].id,
+                "page_num": page_num,
+                "updated_pages": updated_pages,
+                "shared_document_ids": [target.id for target in documents[1:]],
+            }, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            logger.error(f"处理 Label Studio webhook 失败: {e}", exc_info=True)
+            return Response({"error": f"处理失败: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class ServeImageView(APIView):
     """
     静态图片服务
@@ -107,27 +107,148 @@ CORS_ALLOW_HEADERS = [
     'x-csrftoken',
     'x-requested-with',
     'range',
+    'if-none-match',
+    'if-range',
 ]
 CORS_EXPOSE_HEADERS = [
     'content-length',
     'content-type',
     'content-disposition',
+    'content-range',
+    'accept-ranges',
+    'etag',
 ]
 
 # --- 核心改动：从环境变量读取Redis主机 ---
 REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
 CELERY_BROKER_URL = f'redis://{REDIS_HOST}:6379/0'
 CELERY_RESULT_BACKEND = f'redis://{REDIS_HOST}:6379/0'
+# 文档处理事件 (Redis pub/sub), 供 SSE 端点推送实时进度
+REDIS_URL = os.getenv('REDIS_URL', f'redis://{REDIS_HOST}:6379/0')
 # --- 结束改动 ---
 
+# DRF: JSON 请求/响应使用 json_codec (有 orjson 时使用 orjson)
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 
 DATA_ROOT_PATH = Path(os.getenv('LOCAL_DATA_PATH')) if os.getenv('LOCAL_DATA_PATH') else BASE_DIR.parent
 DATA_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024
+# 上传的文件一律直接写入临时文件 (同时计算 SHA-256 用于去重), 批量上传大量 PDF / ZIP 时不占用内存
+FILE_UPLOAD_HANDLERS = ['api.dedup.HashingUploadHandler']
+# 批量上传单个请求允许的最大文件数
+DATA_UPLOAD_MAX_NUMBER_FILES = int(os.getenv('UPLOAD_MAX_FILES', '1000'))
 
 # Label Studio 配置
 LABEL_STUDIO_URL = os.getenv('LABEL_STUDIO_URL', 'http://label-studio:8080')
 LABEL_STUDIO_API_KEY = os.getenv('LABEL_STUDIO_API_KEY', '')  # 需要在 Label Studio 中生成
 LABEL_STUDIO_PROJECT_ID = os.getenv('LABEL_STUDIO_PROJECT_ID', '1')  # 默认项目 ID
-
+# 批量导入任务时按任务数 / 请求体大小拆分请求, 并发发送
+LABEL_STUDIO_IMPORT_CHUNK_TASKS = int(os.getenv('LABEL_STUDIO_IMPORT_CHUNK_TASKS', '50'))
+LABEL_STUDIO_IMPORT_CHUNK_BYTES = int(os.getenv('LABEL_STUDIO_IMPORT_CHUNK_BYTES', str(8 * 1024 * 1024)))
+LABEL_STUDIO_IMPORT_WORKERS = int(os.getenv('LABEL_STUDIO_IMPORT_WORKERS', '4'))
+LABEL_STUDIO_IMPORT_RETRIES = int(os.getenv('LABEL_STUDIO_IMPORT_RETRIES', '3'))
+# Label Studio HTTP 连接池大小 (应不小于并发导入/更新的线程数) 和幂等请求的自动重试次数
+LABEL_STUDIO_HTTP_POOL_SIZE = int(os.getenv('LABEL_STUDIO_HTTP_POOL_SIZE', '16'))
+LABEL_STUDIO_HTTP_RETRIES = int(os.getenv('LABEL_STUDIO_HTTP_RETRIES', '3'))
+# Label Studio 推送作为独立的 Celery 任务在单独队列中执行, 网络错误时按指数退避重试
+LABEL_STUDIO_PUSH_QUEUE = os.getenv('LABEL_STUDIO_PUSH_QUEUE', 'labelstudio')
+LABEL_STUDIO_PUSH_MAX_RETRIES = int(os.getenv('LABEL_STUDIO_PUSH_MAX_RETRIES', '5'))
+LABEL_STUDIO_PUSH_RETRY_BACKOFF = int(os.getenv('LABEL_STUDIO_PUSH_RETRY_BACKOFF', '10'))
+LABEL_STUDIO_PUSH_RETRY_BACKOFF_MAX = int(os.getenv('LABEL_STUDIO_PUSH_RETRY_BACKOFF_MAX', '600'))
+# 定时从 Label Studio 拉取校对结果的间隔 (秒), 0 表示关闭; 拉取锁的超时时间 (秒)
+LABEL_STUDIO_PULL_INTERVAL = int(os.getenv('LABEL_STUDIO_PULL_INTERVAL', '300'))
+LABEL_STUDIO_PULL_LOCK_TIMEOUT = int(os.getenv('LABEL_STUDIO_PULL_LOCK_TIMEOUT', '600'))
+# Label Studio webhook 共享密钥, 在 Label Studio 中配置 webhook 时添加请求头 X-Webhook-Secret; 未设置时拒绝所有 webhook
+LABEL_STUDIO_WEBHOOK_SECRET = os.getenv('LABEL_STUDIO_WEBHOOK_SECRET', '')
+CELERY_TASK_ROUTES = {
+    'api.tasks.push_document_to_label_studio': {'queue': LABEL_STUDIO_PUSH_QUEUE},
+    'api.tasks.pull_label_studio_annotations': {'queue': LABEL_STUDIO_PUSH_QUEUE},
+    'api.tasks.pull_all_label_studio_annotations': {'queue': LABEL_STUDIO_PUSH_QUEUE},
+}
+CELERY_BEAT_SCHEDULE = {
+    'pull-label-studio-annotations': {
+        'task': 'api.tasks.pull_all_label_studio_annotations',
+        'schedule': LABEL_STUDIO_PULL_INTERVAL,
+    },
+} if LABEL_STUDIO_PULL_INTERVAL > 0 else {}
+# 后端对外地址, Label Studio 通过它访问页面图片
+BACKEND_EXTERNAL_URL = os.getenv('BACKEND_EXTERNAL_URL', 'http://localhost:8010').rstrip('/')
+
+# RAGFlow 分块配置
+# 每个分块的近似 token 上限, 以及正文切分时相邻分块的重叠 token 数
+RAGFLOW_CHUNK_MAX_TOKENS = max(16, int(os.getenv('RAGFLOW_CHUNK_MAX_TOKENS', '512')))
+RAGFLOW_CHUNK_OVERLAP_TOKENS = max(0, int(os.getenv('RAGFLOW_CHUNK_OVERLAP_TOKENS', '64')))
+
+# RAGFlow 集成配置
+RAGFLOW_URL = os.getenv('RAGFLOW_URL', 'http://ragflow:9380').rstrip('/')
+RAGFLOW_API_KEY = os.getenv('RAGFLOW_API_KEY', '')  # 需要在 RAGFlow 中生成
+RAGFLOW_KB_NAME = os.getenv('RAGFLOW_KB_NAME', 'test_kb')  # 默认上传到的知识库 (不存在时自动创建)
+# RAGFlow HTTP 连接池大小 (应不小于并发上传的线程数) 和幂等请求的自动重试次数
+RAGFLOW_HTTP_POOL_SIZE = int(os.getenv('RAGFLOW_HTTP_POOL_SIZE', '8'))
+RAGFLOW_HTTP_RETRIES = int(os.getenv('RAGFLOW_HTTP_RETRIES', '3'))
+# 分块按批上传, 每批内并发发送; 每批完成后记录进度, 重试时跳过已上传的分块
+RAGFLOW_UPLOAD_BATCH_SIZE = max(1, int(os.getenv('RAGFLOW_UPLOAD_BATCH_SIZE', '64')))
+RAGFLOW_UPLOAD_CONCURRENCY = max(1, int(os.getenv('RAGFLOW_UPLOAD_CONCURRENCY', '4')))
+# 上传任务默认与 Label Studio 推送共用队列 (celery_labelstudio 服务), 失败时指数退避重试
+RAGFLOW_UPLOAD_QUEUE = os.getenv('RAGFLOW_UPLOAD_QUEUE', LABEL_STUDIO_PUSH_QUEUE)
+RAGFLOW_UPLOAD_MAX_RETRIES = int(os.getenv('RAGFLOW_UPLOAD_MAX_RETRIES', '5'))
+RAGFLOW_UPLOAD_RETRY_BACKOFF = int(os.getenv('RAGFLOW_UPLOAD_RETRY_BACKOFF', '10'))
+RAGFLOW_UPLOAD_RETRY_BACKOFF_MAX = int(os.getenv('RAGFLOW_UPLOAD_RETRY_BACKOFF_MAX', '600'))
+CELERY_TASK_ROUTES['api.tasks.upload_document_to_ragflow'] = {'queue': RAGFLOW_UPLOAD_QUEUE}
+
+
+# MinerU 分页并行配置
+# 开启后, 页数不少于 MINERU_PARALLEL_MIN_PAGES 的文档会按 MINERU_CHUNK_PAGES 页拆分,
+# 由多个 Celery worker 并行处理后再合并结果
+MINERU_PAGE_PARALLEL = os.getenv('MINERU_PAGE_PARALLEL', 'false').lower() in ('1', 'true', 'yes')
+MINERU_CHUNK_PAGES = max(1, int(os.getenv('MINERU_CHUNK_PAGES', '50')))
+MINERU_PARALLEL_MIN_PAGES = int(os.getenv('MINERU_PARALLEL_MIN_PAGES', '100'))
+
+# 上传的 PDF 与已处理的文档内容相同 (SHA-256 一致) 时, 复用其 OCR 结果、页面图片和 Label Studio 任务
+# 上传接口的 reuse 参数和 ingest_pdfs --no-reuse 可以按请求覆盖
+OCR_REUSE_DUPLICATES = os.getenv('OCR_REUSE_DUPLICATES', 'true').lower() in ('1', 'true', 'yes')
+
+# MinerU 执行引擎
+# auto: 优先使用 worker 常驻的 in-process 引擎, 不可用时回退到 CLI
+# inprocess: 强制使用 in-process 引擎
+# cli: 每个文档启动一个 mineru 子进程 (旧行为)
+MINERU_ENGINE = os.getenv('MINERU_ENGINE', 'auto').lower()
+# worker 进程启动时预加载 MinerU 模型; 只消费 Label Studio 推送队列的 worker 应关闭
+MINERU_PRELOAD = os.getenv('MINERU_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+
+# 页面图片生成配置 (供 Label Studio 标注使用)
+# 每批转换 PAGE_RASTER_BATCH_SIZE 页并直接写入磁盘, 峰值内存不随页数增长
+PAGE_IMAGE_DPI = int(os.getenv('PAGE_IMAGE_DPI', '200'))
+PAGE_IMAGE_QUALITY = int(os.getenv('PAGE_IMAGE_QUALITY', '75'))
+PAGE_RASTER_BATCH_SIZE = max(1, int(os.getenv('PAGE_RASTER_BATCH_SIZE', '8')))
+
+# 大 JSON (OCR 结果 / 校对结果) 存储
+# local: 存放在 BLOB_STORE_ROOT 目录下; minio: 存放在 S3/MinIO 兼容的对象存储中
+BLOB_STORE_BACKEND = os.getenv('BLOB_STORE_BACKEND', 'local').lower()
+BLOB_STORE_ROOT = DATA_ROOT_PATH / 'data' / 'blobs'
+MINIO_ENDPOINT = os.getenv('MINIO_ENDPOINT', 'minio:9000')
+MINIO_ACCESS_KEY = os.getenv('MINIO_ACCESS_KEY', '')
+MINIO_SECRET_KEY = os.getenv('MINIO_SECRET_KEY', '')
+MINIO_BUCKET = os.getenv('MINIO_BUCKET', 'ocr-blobs')
+MINIO_PREFIX = os.getenv('MINIO_PREFIX', 'json/')
+MINIO_SECURE = os.getenv('MINIO_SECURE', 'false').lower() in ('1', 'true', 'yes')
+
+# 派生文件缓存 (RAGFlow payload 等), 按输入指纹缓存在本地磁盘, 超过上限 (MB) 时按最近访问时间淘汰
+PAYLOAD_CACHE_ROOT = DATA_ROOT_PATH / 'data' / 'cache' / 'payloads'
+PAYLOAD_CACHE_MAX_BYTES = int(os.getenv('PAYLOAD_CACHE_MAX_MB', '512')) * 1024 * 1024
+
+# OCR JSON 压缩格式 (磁盘上的 _middle.json 和 blob 存储)
+# auto: 安装了 zstandard 时使用 zstd, 否则使用 gzip; 也可显式指定 zstd / gzip
+OCR_JSON_COMPRESSION = os.getenv('OCR_JSON_COMPRESSION', 'auto').lower()
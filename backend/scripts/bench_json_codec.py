@@ -0,0 +1,113 @@
+"""
+JSON 编解码基准测试
+生成一个接近真实 MinerU 输出的 200 页 _middle.json, 对比标准库 json 与 json_codec (orjson) 的
+序列化 / 解析耗时, 以及压缩存储 (compression.py) 的完整读写耗时
+
+用法 (在 backend 目录下):
+    python scripts/bench_json_codec.py [--pages 200] [--repeat 5]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+import django
+django.setup()
+
+from api import json_codec
+from api.compression import dump_ocr_json, load_ocr_json, get_codec
+
+BLOCK_TYPES = ['text', 'title', 'table', 'image', 'list']
+SAMPLE_TEXT = '光学字符识别结果示例文本, 包含中英文混排 OCR sample line 12345。'
+
+
+def make_page(page_idx, rng):
+    """生成一页 MinerU 风格的数据: 约 30 个块, 每块若干行, 每行若干 span"""
+    blocks = []
+    for block_idx in range(30):
+        x0, y0 = rng.uniform(0, 500), rng.uniform(0, 780)
+        lines = []
+        for line_idx in range(rng.randint(2, 6)):
+            ly = y0 + line_idx * 12.5
+            lines.append({
+                'bbox': [x0, ly, x0 + 80.25, ly + 11.75],
+                'spans': [{
+                    'bbox': [x0 + i * 20.5, ly, x0 + i * 20.5 + 19.75, ly + 11.75],
+                    'type': 'text',
+                    'content': SAMPLE_TEXT[:rng.randint(8, len(SAMPLE_TEXT))],
+                    'score': round(rng.random(), 6),
+                } for i in range(3)],
+            })
+        blocks.append({
+            'type': rng.choice(BLOCK_TYPES),
+            'bbox': [x0, y0, x0 + 90.5, y0 + 80.25],
+            'lines': lines,
+            'index': block_idx,
+        })
+    return {
+        'page_idx': page_idx,
+        'page_size': [595.0, 842.0],
+        'preproc_blocks': blocks,
+        'para_blocks': blocks,
+        'discarded_blocks': [],
+    }
+
+
+def make_document(pages):
+    rng = random.Random(42)
+    return {'pdf_info': [make_page(i, rng) for i in range(pages)], '_backend': 'pipeline', '_version_name': '2.0'}
+
+
+def bench(label, func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    print(f"  {label:<40} {best * 1000:9.1f} ms")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    document = make_document(args.pages)
+    stdlib_bytes = json.dumps(document, ensure_ascii=False, indent=4).encode('utf-8')
+    compact_bytes = json_codec.dumps(document)
+    print(f"文档: {args.pages} 页, 缩进 JSON {len(stdlib_bytes) / 1024 / 1024:.1f} MB, "
+          f"紧凑 JSON {len(compact_bytes) / 1024 / 1024:.1f} MB")
+    print(f"json_codec 后端: {json_codec.BACKEND}, 压缩格式: {get_codec()}")
+
+    print("序列化:")
+    old_dump = bench('json.dumps(indent=4)  (原下载接口)', lambda: json.dumps(document, ensure_ascii=False, indent=4).encode('utf-8'), args.repeat)
+    bench('json.dumps(紧凑)', lambda: json.dumps(document, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), args.repeat)
+    new_dump = bench('json_codec.dumps(indent=True)', lambda: json_codec.dumps(document, indent=True), args.repeat)
+    bench('json_codec.dumps', lambda: json_codec.dumps(document), args.repeat)
+
+    print("解析:")
+    old_load = bench('json.loads', lambda: json.loads(stdlib_bytes), args.repeat)
+    new_load = bench('json_codec.loads', lambda: json_codec.loads(stdlib_bytes), args.repeat)
+
+    print("压缩文件读写 (compression.py):")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'doc_middle.json')
+        written = {}
+        bench('dump_ocr_json', lambda: written.setdefault('path', dump_ocr_json(document, path)), args.repeat)
+        bench('load_ocr_json', lambda: load_ocr_json(written['path']), args.repeat)
+        print(f"  压缩后大小: {os.path.getsize(written['path']) / 1024 / 1024:.2f} MB")
+
+    print(f"加速比: 序列化 {old_dump / new_dump:.1f}x, 解析 {old_load / new_load:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
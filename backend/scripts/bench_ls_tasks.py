@@ -0,0 +1,136 @@
+"""
+Label Studio 任务生成基准测试
+对比逐区域标量计算的旧实现与按页 NumPy 批量换算 (含内容哈希区域 ID) 的 generate_ls_tasks,
+并校验两者结果一致 (区域 ID 除外)
+
+用法 (在 backend 目录下):
+    python scripts/bench_ls_tasks.py [--pages 500] [--repeat 3]
+"""
+import os
+import sys
+import time
+import uuid
+import argparse
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(SCRIPTS_DIR))
+sys.path.insert(0, SCRIPTS_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+import django
+django.setup()
+
+from api import ls_tasks
+from bench_json_codec import make_document
+
+
+def _legacy_create_ls_region(bbox, page_dims, label, text_content=None):
+    page_width, page_height = page_dims
+    x1, y1, x2, y2 = bbox
+    if page_width == 0 or page_height == 0: return []
+    x = (x1 / page_width) * 100; y = (y1 / page_height) * 100
+    width = ((x2 - x1) / page_width) * 100; height = ((y2 - y1) / page_height) * 100
+    region_id = f"ls_{uuid.uuid4().hex[:10]}"
+    results = [{"id": region_id, "from_name": "bbox", "to_name": "image", "type": "rectanglelabels", "value": {"x": x, "y": y, "width": width, "height": height, "rotation": 0, "rectanglelabels": [label]}}]
+    if text_content and text_content.strip():
+        results.append({"id": region_id, "from_name": "transcription", "to_name": "image", "type": "textarea", "value": {"text": [text_content.strip()]}})
+    return results
+
+
+def legacy_generate_ls_tasks(mineru_data, doc, unique_folder_name):
+    """重构前 views._generate_ls_tasks 的实现 (保留用于对比)"""
+    ls_tasks = []
+    task_output_dir = ls_tasks_module.BASE_OUTPUT_DIR / unique_folder_name
+    pdf_info = mineru_data.get('pdf_info', [])
+    total_pages = len(pdf_info)
+    for page_data in pdf_info:
+        type_mapping = dict(ls_tasks_module.LS_TYPE_MAPPING)
+        page_num = page_data.get('page_idx', 0) + 1
+        page_size = page_data.get('page_size')
+        page_dims = (page_size[0], page_size[1])
+        page_filename = f"page-{str(page_num).zfill(4)}.jpg"
+        if not (task_output_dir / "pages" / page_filename).exists():
+            continue
+        backend_url = os.getenv('BACKEND_EXTERNAL_URL', 'http://localhost:8010')
+        task = {
+            "data": {
+                "image": f"{backend_url}/api/images/{unique_folder_name}/{page_filename}",
+                "doc_id": doc.id, "page_num": page_num, "total_pages": total_pages,
+                "filename": Path(doc.original_pdf_path).name
+            },
+            "predictions": [{"result": []}]
+        }
+        for block in page_data.get('para_blocks', []) + page_data.get('preproc_blocks', []):
+            block_type = block.get('type')
+            label = type_mapping.get(block_type, 'Unknown')
+            result = task["predictions"][0]["result"]
+            if block_type == 'figure':
+                if 'bbox' in block: result.extend(_legacy_create_ls_region(block['bbox'], page_dims, 'Figure'))
+                for line in block.get('lines', []):
+                    if 'bbox' in line: result.extend(_legacy_create_ls_region(line['bbox'], page_dims, 'Text', ''.join(s.get('content', '') for s in line.get('spans', []))))
+            elif block_type in ['text', 'title', 'list', 'foot', 'head']:
+                for line in block.get('lines', []):
+                    if 'bbox' in line: result.extend(_legacy_create_ls_region(line['bbox'], page_dims, label, ''.join(s.get('content', '') for s in line.get('spans', []))))
+            elif 'bbox' in block:
+                result.extend(_legacy_create_ls_region(block['bbox'], page_dims, label))
+        if task["predictions"][0]["result"]: ls_tasks.append(task)
+    return ls_tasks
+
+
+ls_tasks_module = ls_tasks
+
+
+def strip_ids(tasks):
+    for task in tasks:
+        for region in task['predictions'][0]['result']:
+            region.pop('id', None)
+    return tasks
+
+
+def bench(label, func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    print(f"  {label:<36} {best * 1000:9.1f} ms")
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    document = make_document(args.pages)
+    doc = SimpleNamespace(id=1, original_pdf_path='/data/pdfs_to_process/sample.pdf')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 任务生成会检查页面图片是否存在, 在临时目录中创建空文件
+        ls_tasks.BASE_OUTPUT_DIR = Path(tmp)
+        folder = 'bench'
+        pages_dir = Path(tmp) / folder / 'pages'
+        pages_dir.mkdir(parents=True)
+        for page_num in range(1, args.pages + 1):
+            (pages_dir / ls_tasks.page_image_filename(page_num)).touch()
+
+        region_count = sum(len(ls_tasks._collect_page_regions(page)[0]) for page in document['pdf_info'])
+        print(f"文档: {args.pages} 页, {region_count} 个区域")
+        old_time, old_tasks = bench('旧实现 (逐区域标量 + uuid4)', lambda: legacy_generate_ls_tasks(document, doc, folder), args.repeat)
+        new_time, new_tasks = bench('generate_ls_tasks (按页 NumPy)', lambda: ls_tasks.generate_ls_tasks(document, doc, folder), args.repeat)
+
+    same = strip_ids(old_tasks) == strip_ids(new_tasks)
+    print(f"结果一致 (忽略区域 ID): {same}")
+    print(f"加速比: {old_time / new_time:.1f}x")
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
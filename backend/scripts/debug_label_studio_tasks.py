@@ -11,7 +11,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 django.setup()
 
 from api.models import OcrDocument
-from api.views import _generate_ls_tasks
+from api.ls_tasks import generate_ls_tasks
 import json
 
 def check_task_generation():
@@ -89,7 +89,7 @@ def check_task_generation():
                 continue
             
             print(f"\n生成任务数据 (folder: {unique_folder_name})...")
-            tasks_data = _generate_ls_tasks(ocr_data, doc, unique_folder_name)
+            tasks_data = generate_ls_tasks(ocr_data, doc, unique_folder_name)
             
             print(f"✅ 生成了 {len(tasks_data)} 个任务")
             
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+本地模拟的 RAGFlow HTTP API, 用于在没有 RAGFlow 的环境中测试分块上传
+
+    python fake_ragflow_server.py --port 9380 --api-key fake-key --fail-rate 0.1 --delay 0.05
+
+然后为 backend / celery 设置 RAGFLOW_URL=http://<宿主机>:9380, RAGFLOW_API_KEY=fake-key;
+只实现上传用到的接口 (知识库 / 文档的查找和创建, 分块的添加、列出和删除), 数据只保存在内存中,
+按 Ctrl+C 退出时打印每个文档的分块数和请求统计; --fail-rate 按比例对添加分块返回 503, 用于测试重试;
+不依赖 Django, 可以在宿主机上直接运行
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+DATASETS_RE = re.compile(r'^/api/v1/datasets$')
+DOCUMENTS_RE = re.compile(r'^/api/v1/datasets/(?P<dataset>[^/]+)/documents$')
+CHUNKS_RE = re.compile(r'^/api/v1/datasets/(?P<dataset>[^/]+)/documents/(?P<document>[^/]+)/chunks$')
+
+
+class FakeRagflow:
+    """内存中的知识库 / 文档 / 分块"""
+
+    def __init__(self, fail_rate=0.0, delay=0.0):
+        self.lock = threading.Lock()
+        self.datasets = {}  # {id: {"id", "name"}}
+        self.documents = {}  # {id: {"id", "name", "dataset_id", "size"}}
+        self.chunks = {}  # {document_id: {chunk_id: content}}
+        self.fail_rate = fail_rate
+        self.delay = delay
+        self.stats = {'requests': 0, 'chunks_added': 0, 'chunks_deleted': 0, 'injected_failures': 0, 'max_in_flight': 0}
+        self.in_flight = 0
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = 'FakeRAGFlow/0.1'
+    state = None
+    api_key = ''
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, payload, status=200):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _ok(self, data=None):
+        self._send({'code': 0, 'data': data})
+
+    def _error(self, message, code=102):
+        self._send({'code': code, 'message': message})
+
+    def _json_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}') if length else {}
+
+    def _dispatch(self, method):
+        state = self.state
+        with state.lock:
+            state.stats['requests'] += 1
+            state.in_flight += 1
+            state.stats['max_in_flight'] = max(state.stats['max_in_flight'], state.in_flight)
+        try:
+            if self.api_key and self.headers.get('Authorization') != f'Bearer {self.api_key}':
+                return self._error('Authentication error: API key is invalid!', code=109)
+            if state.delay:
+                time.sleep(state.delay)
+            url = urlparse(self.path)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            for pattern, handler in ((DATASETS_RE, self.datasets), (DOCUMENTS_RE, self.documents),
+                                     (CHUNKS_RE, self.chunks)):
+                match = pattern.match(url.path)
+                if match:
+                    return handler(method, query, **match.groupdict())
+            self._send({'code': 100, 'message': 'Not found'}, status=404)
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def datasets(self, method, query):
+        state = self.state
+        if method == 'POST':
+            name = self._json_body().get('name')
+            with state.lock:
+                if any(dataset['name'] == name for dataset in state.datasets.values()):
+                    return self._error(f"Dataset name '{name}' already exists")
+                dataset = {'id': uuid.uuid4().hex, 'name': name}
+                state.datasets[dataset['id']] = dataset
+            return self._ok(dataset)
+        datasets = [d for d in state.datasets.values() if not query.get('name') or d['name'] == query['name']]
+        if query.get('name') and not datasets:
+            return self._error(f"You don't own the dataset {query['name']}")
+        return self._ok(datasets)
+
+    def documents(self, method, query, dataset):
+        state = self.state
+        if dataset not in state.datasets:
+            return self._error(f"You don't own the dataset {dataset}")
+        if method == 'POST':
+            # multipart 请求体不解析, 只从 filename 中取文档名
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length)
+            match = re.search(rb'filename="([^"]+)"', body)
+            name = match.group(1).decode('utf-8') if match else 'unnamed'
+            document = {'id': uuid.uuid4().hex, 'name': name, 'dataset_id': dataset, 'size': length}
+            with state.lock:
+                state.documents[document['id']] = document
+                state.chunks[document['id']] = {}
+            return self._ok([document])
+        docs = [d for d in state.documents.values()
+                if d['dataset_id'] == dataset and (not query.get('name') or d['name'] == query['name'])
+                and (not query.get('id') or d['id'] == query['id'])]
+        if (query.get('name') or query.get('id')) and not docs:
+            return self._error(f"You don't own the document {query.get('name') or query['id']}")
+        return self._ok({'docs': docs, 'total': len(docs)})
+
+    def chunks(self, method, query, dataset, document):
+        state = self.state
+        if state.documents.get(document, {}).get('dataset_id') != dataset:
+            return self._error(f"You don't own the document {document}")
+        chunks = state.chunks[document]
+        if method == 'POST':
+            if state.fail_rate and random.random() < state.fail_rate:
+                with state.lock:
+                    state.stats['injected_failures'] += 1
+                return self._send({'code': 100, 'message': 'Service Unavailable'}, status=503)
+            content = self._json_body().get('content', '')
+            chunk_id = uuid.uuid4().hex[:16]
+            with state.lock:
+                chunks[chunk_id] = content
+                state.stats['chunks_added'] += 1
+            return self._ok({'chunk': {'id': chunk_id, 'content': content, 'document_id': document}})
+        if method == 'DELETE':
+            chunk_ids = self._json_body().get('chunk_ids') or []
+            with state.lock:
+                for chunk_id in chunk_ids:
+                    if chunks.pop(chunk_id, None) is not None:
+                        state.stats['chunks_deleted'] += 1
+            return self._ok()
+        page, page_size = int(query.get('page', 1)), int(query.get('page_size', 30))
+        items = [{'id': chunk_id, 'content': content} for chunk_id, content in list(chunks.items())]
+        return self._ok({'chunks': items[(page - 1) * page_size:page * page_size], 'total': len(items),
+                         'doc': state.documents[document]})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟的 RAGFlow API')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=9380)
+    parser.add_argument('--api-key', default='', help='要求的 Bearer API key, 留空表示不校验')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='添加分块请求返回 503 的比例')
+    parser.add_argument('--delay', type=float, default=0.0, help='每个请求的模拟延迟 (秒)')
+    args = parser.parse_args()
+
+    Handler.state = FakeRagflow(fail_rate=args.fail_rate, delay=args.delay)
+    Handler.api_key = args.api_key
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f"Fake RAGFlow 监听 http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        state = Handler.state
+        for document in state.documents.values():
+            dataset = state.datasets[document['dataset_id']]['name']
+            print(f"{dataset}/{document['name']}: {len(state.chunks[document['id']])} 个分块")
+        print(json.dumps(state.stats, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
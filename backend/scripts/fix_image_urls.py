@@ -2,9 +2,14 @@
 """
 修复 Label Studio 中的图片 URL
 将 host.docker.internal 替换为 localhost
+
+任务更新通过共享连接池并发发送:
+    python fix_image_urls.py [--workers 8]
 """
 import os
 import sys
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import django
 
 # 设置 Django 环境
@@ -13,42 +18,56 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 django.setup()
 
 from api.label_studio_utils import LabelStudioClient
-from api.models import OcrDocument
-import json
 
-def fix_image_urls():
+
+def _fix_task(ls_client, task_id, data, new_url):
+    # PATCH 会整体替换 data 字段, 需要带上其余字段
+    return ls_client.update_task(task_id, {'data': {**data, 'image': new_url}})
+
+
+def fix_image_urls(workers=8):
     """修复所有任务的图片 URL"""
     ls_client = LabelStudioClient()
-    
+
     # 获取项目中的所有任务
     tasks = ls_client.get_tasks()
     print(f"找到 {len(tasks)} 个任务")
-    
-    fixed_count = 0
+
+    to_fix = []
     for task in tasks:
-        task_id = task['id']
         data = task.get('data', {})
-        
+        old_url = data.get('image', '')
         # 检查并修复图片 URL
-        if 'image' in data:
-            old_url = data['image']
-            if 'host.docker.internal' in old_url:
-                # 替换为 localhost
-                new_url = old_url.replace('host.docker.internal', 'localhost')
-                
-                print(f"\n任务 #{task_id}:")
-                print(f"  旧 URL: {old_url}")
-                print(f"  新 URL: {new_url}")
-                
-                # 更新任务
-                try:
-                    ls_client.update_task(task_id, {'data': {'image': new_url}})
-                    print(f"  ✓ 已更新")
-                    fixed_count += 1
-                except Exception as e:
-                    print(f"  ✗ 更新失败: {e}")
-    
+        if 'host.docker.internal' in old_url:
+            # 替换为 localhost
+            new_url = old_url.replace('host.docker.internal', 'localhost')
+            to_fix.append((task['id'], data, old_url, new_url))
+    print(f"需要修复 {len(to_fix)} 个任务")
+
+    fixed_count = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(_fix_task, ls_client, task_id, data, new_url): (task_id, old_url, new_url)
+            for task_id, data, old_url, new_url in to_fix
+        }
+        for future in as_completed(futures):
+            task_id, old_url, new_url = futures[future]
+            try:
+                ok = future.result()
+            except Exception as e:
+                ok = False
+                print(f"任务 #{task_id}: ✗ 更新失败: {e}")
+            if ok:
+                fixed_count += 1
+                print(f"任务 #{task_id}: ✓ {old_url} -> {new_url}")
+            else:
+                print(f"任务 #{task_id}: ✗ 更新失败")
+
     print(f"\n总共修复了 {fixed_count} 个任务的图片 URL")
 
+
 if __name__ == '__main__':
-    fix_image_urls()
+    parser = argparse.ArgumentParser(description='修复 Label Studio 任务中的图片 URL')
+    parser.add_argument('--workers', type=int, default=8, help='并发请求数')
+    args = parser.parse_args()
+    fix_image_urls(args.workers)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+模拟 Label Studio 发送标注 webhook, 用于本地测试 /api/webhooks/label-studio/
+
+    python send_fake_ls_webhook.py --doc-id 12 --page 3 --task-id 456 --text "校对后的第一行" --text "第二行"
+
+任务 ID 需与文档推送时记录的一致 (见文档详情中的 label_studio_task_ids), 否则事件会被忽略;
+不依赖 Django, 可以在宿主机上直接运行
+"""
+import os
+import argparse
+import random
+from datetime import datetime, timezone
+import requests
+
+
+def build_payload(action, doc_id, page_num, task_id, texts, annotation_id=None, cancelled=False):
+    """按 Label Studio webhook 的格式构造事件"""
+    result = []
+    for index, text in enumerate(texts):
+        region_id = f"fake_{page_num}_{index}"
+        result.append({
+            "id": region_id, "from_name": "bbox", "to_name": "image", "type": "rectanglelabels",
+            "value": {"x": 5, "y": 5 + index * 4, "width": 90, "height": 3, "rotation": 0, "rectanglelabels": ["Text"]},
+        })
+        result.append({
+            "id": region_id, "from_name": "transcription", "to_name": "image", "type": "textarea",
+            "value": {"text": [text]},
+        })
+    now = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+    return {
+        "action": action,
+        "project": {"id": int(os.getenv('LABEL_STUDIO_PROJECT_ID', '1'))},
+        "task": {"id": task_id, "data": {"doc_id": doc_id, "page_num": page_num}},
+        "annotation": {
+            "id": annotation_id or random.randint(1, 10 ** 9),
+            "task": task_id,
+            "result": result,
+            "was_cancelled": cancelled,
+            "created_at": now,
+            "updated_at": now,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='发送模拟的 Label Studio 标注 webhook')
+    parser.add_argument('--url', default=os.getenv('WEBHOOK_URL', 'http://localhost:8010/api/webhooks/label-studio/'))
+    parser.add_argument('--secret', default=os.getenv('LABEL_STUDIO_WEBHOOK_SECRET', ''), help='X-Webhook-Secret 请求头')
+    parser.add_argument('--action', default='ANNOTATION_UPDATED', choices=['ANNOTATION_CREATED', 'ANNOTATION_UPDATED'])
+    parser.add_argument('--doc-id', type=int, required=True)
+    parser.add_argument('--page', type=int, required=True, help='页码 (从 1 开始)')
+    parser.add_argument('--task-id', type=int, required=True)
+    parser.add_argument('--annotation-id', type=int, help='标注 ID, 默认随机')
+    parser.add_argument('--text', action='append', default=[], help='校对后的文本行, 可重复')
+    parser.add_argument('--cancelled', action='store_true', help='模拟被跳过的标注')
+    args = parser.parse_args()
+
+    payload = build_payload(args.action, args.doc_id, args.page, args.task_id, args.text or ['(空)'],
+                            annotation_id=args.annotation_id, cancelled=args.cancelled)
+    response = requests.post(args.url, json=payload, headers={'X-Webhook-Secret': args.secret}, timeout=10)
+    print(f"HTTP {response.status_code}")
+    print(response.text)
+
+
+if __name__ == '__main__':
+    main()
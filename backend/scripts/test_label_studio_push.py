@@ -13,7 +13,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 django.setup()
 
 from api.models import OcrDocument
-from api.views import _generate_ls_tasks
+from api.ls_tasks import generate_ls_tasks
 from api.label_studio_utils import LabelStudioClient
 
 def test_label_studio_push():
@@ -57,7 +57,7 @@ def test_label_studio_push():
             return
         unique_folder_name = match.group(1)
         
-        tasks_data = _generate_ls_tasks(ocr_data, doc, unique_folder_name)
+        tasks_data = generate_ls_tasks(ocr_data, doc, unique_folder_name)
         if not tasks_data:
             print("❌ 没有生成任务数据")
             return
@@ -28,9 +28,19 @@ apiClient.interceptors.response.use(
 );
 
 export default {
-    // 获取所有文档列表
-    getDocuments() {
-        return apiClient.get('/documents/');
+    // 获取文档列表 (游标分页, 返回 { next, previous, results })
+    getDocuments(params = {}) {
+        return apiClient.get('/documents/', { params });
+    },
+    
+    // 按分页返回的 next 链接获取下一页
+    getDocumentsPage(url) {
+        return apiClient.get(url);
+    },
+    
+    // 获取处理日志 (after 为上次读取到的行 ID)
+    getDocumentLog(docId, after = 0) {
+        return apiClient.get(`/documents/${docId}/log/`, { params: { after } });
     },
     
     // 上传PDF文档
@@ -74,5 +84,15 @@ export default {
     // 推送到 Label Studio
     pushToLabelStudio(docId, force = false) {
         return apiClient.post(`/documents/${docId}/push-to-labelstudio/`, { force });
+    },
+    
+    // 查询 Label Studio 推送状态 (推送在后台队列中异步执行)
+    getLabelStudioPushStatus(docId) {
+        return apiClient.get(`/documents/${docId}/push-to-labelstudio/`);
+    },
+    
+    // 订阅文档处理进度 (SSE), 推送 log / status / progress / end 事件
+    subscribeDocumentEvents(docId) {
+        return new EventSource(`${apiClient.defaults.baseURL}/documents/${docId}/events/`);
     }
 };